@@ -20,10 +20,17 @@ from funciones.cuadrilla_functions import (
 )
 from funciones.chat_functions import (
     crear_canal, listar_canales, obtener_canal, editar_canal, eliminar_canal,
-    enviar_mensaje, obtener_mensajes, editar_mensaje, eliminar_mensaje, actualizar_estado_mensaje
+    enviar_mensaje, obtener_mensajes, editar_mensaje, eliminar_mensaje, actualizar_estado_mensaje,
+    actualizar_estado_mensajes, stream_mensajes, inicializar_contadores_actividad
 )
+from funciones.identidades_functions import inicializar_identidades
+from funciones.busqueda_functions import inicializar_busqueda, api_busqueda
+from funciones.asignaciones_functions import inicializar_asignaciones
+from funciones.lecturas_functions import avanzar_lectura, obtener_lectura, listar_lecturas, resumen_canales
+from funciones.eventos_functions import iniciar_broadcaster
 from funciones.utils_functions import (
-    format_date, pagina_inicio, verificar_conexion, api_auth_status, api_channels_list
+    format_date, pagina_inicio, verificar_conexion, api_auth_status, api_channels_list,
+    healthz, readyz, estadisticas
 )
 from funciones.reports_functions import (
     generar_reporte_moderadores, listar_reportes_moderadores, eliminar_reporte_moderadores,
@@ -33,9 +40,14 @@ from funciones.reports_functions import (
 # NUEVO v8.0: Sistema de Autenticación y Niveles de Acceso
 from funciones.auth_functions import (
     login_admin_moderador, login_obrero, verificar_sesion_activa, cambiar_password,
-    middleware_verificar_autenticacion, middleware_verificar_permisos,
-    crear_usuario_admin_inicial, sincronizar_usuarios_con_personal, log_security_event
+    middleware_acceso,
+    crear_usuario_admin_inicial, sincronizar_usuarios_con_personal, log_security_event,
+    revocar_token, ServidorOcupadoError, respuesta_servidor_ocupado, calibrar_costo_bcrypt,
+    respuesta_limite_excedido
 )
+from funciones.metrics_functions import api_metricas
+from funciones.rate_limit_functions import middleware_limitar_tasa
+from funciones.mantenimiento_functions import iniciar_mantenimiento, api_estado_mantenimiento
 
 # Configuración básica de logging
 logging.basicConfig(level=logging.INFO)
@@ -57,15 +69,61 @@ client = None
 init_db()
 db, client = get_db_refs()
 
+# Contadores de actividad por canal y globales (solo calcula la primera vez)
+inicializar_contadores_actividad()
+
+# Índice de identidades (cédula/email/teléfono) del personal existente (solo la primera vez)
+inicializar_identidades()
+
+# Términos de búsqueda normalizados del personal existente (solo la primera vez)
+inicializar_busqueda()
+
+# Obreros asignados a las cuadrillas activas existentes (solo la primera vez)
+inicializar_asignaciones()
+
+# Costo de bcrypt según la velocidad de este servidor (BCRYPT_COSTO lo fija)
+calibrar_costo_bcrypt()
+
+# Broadcaster de eventos en tiempo real (por worker, EVENTOS_BACKEND)
+iniciar_broadcaster()
+
+# Tareas periódicas (las ejecuta el worker que tenga el lease); los índices TTL los crea init_db
+iniciar_mantenimiento()
+
 # ==================== RUTAS MODULARIZADAS ====================
 # Todas las rutas ahora usan funciones de módulos externos
 
 # Utility routes - información del sistema
 app.route('/', methods=['GET'])(pagina_inicio)
 app.route('/verificar', methods=['GET'])(verificar_conexion)
+app.route('/healthz', methods=['GET'])(healthz)
+app.route('/readyz', methods=['GET'])(readyz)
+app.route('/estadisticas', methods=['GET'])(estadisticas)
 app.route('/api/auth/status', methods=['GET'])(api_auth_status)
 app.route('/api/channels/', methods=['GET'])(api_channels_list)
 
+# ==================== MÉTRICAS Y MANTENIMIENTO ====================
+
+# Métricas internas del worker (pool de bcrypt, etc.) - solo admin
+@app.route('/metricas', methods=['GET'])
+@middleware_acceso(['admin'], 'lectura')
+def secured_api_metricas():
+    return api_metricas()
+
+# Estado del mantenimiento periódico (líder y última ejecución de cada tarea) - solo admin
+@app.route('/api/mantenimiento/estado', methods=['GET'])
+@middleware_acceso(['admin'], 'lectura')
+def secured_api_estado_mantenimiento():
+    return api_estado_mantenimiento()
+
+# ==================== BÚSQUEDA ====================
+
+# Búsqueda de personal (admin y moderadores) y de mensajes (todos)
+@app.route('/api/search', methods=['GET'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'lectura')
+def secured_api_busqueda():
+    return api_busqueda()
+
 # ==================== ENDPOINTS DE AUTENTICACIÓN v8.0 ====================
 
 @app.route('/api/auth/login/admin-moderador', methods=['POST'])
@@ -96,6 +154,9 @@ def api_login_admin_moderador():
         # Procesar login
         resultado = login_admin_moderador(username, password)
 
+        if resultado.get('code') == 'SERVER_BUSY':
+            return respuesta_servidor_ocupado(resultado)
+
         if resultado['success']:
             # Log evento de seguridad exitoso
             log_security_event('login_success', {
@@ -110,6 +171,8 @@ def api_login_admin_moderador():
                 'error_code': resultado.get('code', 'UNKNOWN'),
                 'error_message': resultado.get('message', 'Error desconocido')
             })
+            if resultado.get('retry_after'):
+                return respuesta_limite_excedido(resultado)
             return jsonify(resultado), 401
 
     except Exception as e:
@@ -155,6 +218,9 @@ def api_login_obrero():
         # Procesar login
         resultado = login_obrero(cedula)
 
+        if resultado.get('retry_after'):
+            return respuesta_limite_excedido(resultado)
+
         if resultado['success']:
             # Log evento de seguridad exitoso
             log_security_event('login_success', {
@@ -173,6 +239,7 @@ def api_login_obrero():
         }), 500
 
 @app.route('/api/auth/initialize-system', methods=['POST'])
+@middleware_limitar_tasa('sensible')
 def api_initialize_system():
     """
     Endpoint temporal para inicializar el sistema de autenticación
@@ -222,6 +289,7 @@ def api_initialize_system():
         }), 500
 
 @app.route('/api/auth/debug-admin', methods=['GET'])
+@middleware_limitar_tasa('sensible')
 def api_debug_admin():
     """
     Endpoint temporal para debuggear usuario admin
@@ -263,6 +331,7 @@ def api_debug_admin():
         }), 500
 
 @app.route('/api/auth/test-password', methods=['POST'])
+@middleware_limitar_tasa('sensible')
 def api_test_password():
     """
     Endpoint temporal para probar verificación de contraseña y JWT
@@ -323,6 +392,7 @@ def api_test_password():
         }), 500
 
 @app.route('/api/auth/fix-admin-password', methods=['POST'])
+@middleware_limitar_tasa('sensible')
 def api_fix_admin_password():
     """
     Endpoint temporal para cambiar contraseña admin a una sin caracteres especiales problemáticos
@@ -364,15 +434,20 @@ def api_fix_admin_password():
         }), 500
 
 @app.route('/api/auth/verificar-sesion', methods=['GET'])
-@middleware_verificar_autenticacion()
+@middleware_acceso(presupuesto='lectura')
 def api_verificar_sesion():
     """
     Endpoint para verificar si la sesión actual es válida
     Requiere token JWT en header Authorization
     """
     try:
-        # El middleware ya verificó el token, user_data está disponible
-        user_data = request.user_data
+        # El middleware ya verificó el token; aquí se confirma además que el usuario siga activo
+        token = request.headers.get('Authorization', '').split(' ')[-1]
+        resultado = verificar_sesion_activa(token)
+        if not resultado['success']:
+            return jsonify(resultado), 401
+
+        user_data = resultado['user_data']
 
         return jsonify({
             'success': True,
@@ -396,7 +471,7 @@ def api_verificar_sesion():
         }), 500
 
 @app.route('/api/auth/logout', methods=['POST'])
-@middleware_verificar_autenticacion()
+@middleware_acceso(presupuesto='escritura')
 def api_logout():
     """
     Endpoint para cerrar sesión
@@ -405,12 +480,15 @@ def api_logout():
     try:
         user_data = request.user_data
 
+        # El token deja de aceptarse en todos los workers hasta su expiración
+        revocado = revocar_token(user_data)
+
         # Log evento de logout
         log_security_event('logout', {
             'user_id': user_data.get('user_id'),
             'username': user_data.get('username'),
             'tipo_usuario': user_data.get('tipo_usuario')
-        })
+        }, {'token_revocado': revocado})
 
         return jsonify({
             'success': True,
@@ -426,8 +504,7 @@ def api_logout():
         }), 500
 
 @app.route('/api/auth/cambiar-password', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'sensible')
 def api_cambiar_password():
     """
     Endpoint para cambiar contraseña
@@ -461,6 +538,9 @@ def api_cambiar_password():
             password_nueva
         )
 
+        if resultado.get('code') == 'SERVER_BUSY':
+            return respuesta_servidor_ocupado(resultado)
+
         if resultado['success']:
             # Log evento de seguridad
             log_security_event('password_change', {
@@ -479,6 +559,7 @@ def api_cambiar_password():
         }), 500
 
 @app.route('/api/auth/inicializar-sistema', methods=['POST'])
+@middleware_limitar_tasa('sensible')
 def api_inicializar_sistema():
     """
     Endpoint para inicializar el sistema de autenticación
@@ -511,219 +592,215 @@ def api_inicializar_sistema():
 # Obreros pueden LEER, Admin/Moderador pueden TODO
 
 @app.route('/crear_canal', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_crear_canal():
     return crear_canal()
 
 @app.route('/canales', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador', 'obrero'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'lectura')
 def secured_listar_canales():
     return listar_canales()
 
+@app.route('/canales/resumen', methods=['GET'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'lectura')
+def secured_resumen_canales():
+    return resumen_canales()
+
 @app.route('/canal/<nombre>', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador', 'obrero'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'lectura')
 def secured_obtener_canal(nombre):
     return obtener_canal(nombre)
 
 @app.route('/canal/<nombre>', methods=['PUT'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_editar_canal(nombre):
     return editar_canal(nombre)
 
 @app.route('/canal/<nombre>', methods=['DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_eliminar_canal(nombre):
     return eliminar_canal(nombre)
 
 @app.route('/enviar', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_enviar_mensaje():
     return enviar_mensaje()
 
 @app.route('/mensajes/<canal>', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador', 'obrero'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'lectura')
 def secured_obtener_mensajes(canal):
     return obtener_mensajes(canal)
 
+@app.route('/stream/<canal>', methods=['GET'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'stream')
+def secured_stream_mensajes(canal):
+    return stream_mensajes(canal)
+
 @app.route('/mensaje/<mensaje_id>', methods=['PUT'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_editar_mensaje(mensaje_id):
     return editar_mensaje(mensaje_id)
 
 @app.route('/mensaje/<mensaje_id>', methods=['DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_eliminar_mensaje(mensaje_id):
     return eliminar_mensaje(mensaje_id)
 
 @app.route('/mensaje/<mensaje_id>/estado', methods=['PUT'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_actualizar_estado_mensaje(mensaje_id):
     return actualizar_estado_mensaje(mensaje_id)
 
+@app.route('/mensajes/estado', methods=['PUT'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
+def secured_actualizar_estado_mensajes():
+    return actualizar_estado_mensajes()
+
+# Lecturas - marca de último mensaje leído por usuario y canal
+@app.route('/lecturas', methods=['GET'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'lectura')
+def secured_listar_lecturas():
+    return listar_lecturas()
+
+@app.route('/lecturas/<canal>', methods=['GET'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'lectura')
+def secured_obtener_lectura(canal):
+    return obtener_lectura(canal)
+
+@app.route('/lecturas/<canal>', methods=['PUT'])
+@middleware_acceso(['admin', 'moderador', 'obrero'], 'escritura')
+def secured_avanzar_lectura(canal):
+    return avanzar_lectura(canal)
+
 # Personnel routes - gestión de personal CON AUTENTICACIÓN v8.0
 # Moderadores - GET permite admin+moderador (para cuadrillas), resto solo admin
 @app.route('/api/personnel/moderadores/', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_api_personnel_moderadores():
     return api_personnel_moderadores()
 
 @app.route('/api/personnel/moderadores/', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin'])
+@middleware_acceso(['admin'], 'escritura')
 def secured_api_personnel_moderadores_create():
     return api_personnel_moderadores_create()
 
 @app.route('/api/personnel/moderadores/', methods=['PUT'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin'])
+@middleware_acceso(['admin'], 'escritura')
 def secured_api_personnel_moderadores_update():
     return api_personnel_moderadores_update()
 
 @app.route('/api/personnel/moderadores/', methods=['DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin'])
+@middleware_acceso(['admin'], 'escritura')
 def secured_api_personnel_moderadores_delete():
     return api_personnel_moderadores_delete()
 
 @app.route('/api/personnel/moderadores/debug', methods=['GET', 'POST', 'PUT', 'DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin'])
+@middleware_acceso(['admin'], 'escritura')
 def secured_api_personnel_moderadores_debug():
     return api_personnel_moderadores_debug()
 
 # Check duplicates route - validación de duplicados (Admin + Moderador)
 @app.route('/api/personnel/check-duplicates/', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_api_personnel_check_duplicates():
     return api_personnel_check_duplicates()
 
 # Obreros routes - gestión de obreros (Admin + Moderador)
 @app.route('/api/personnel/obreros/', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_api_personnel_obreros():
     return api_personnel_obreros()
 
 @app.route('/api/personnel/obreros/', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_api_personnel_obreros_create():
     return api_personnel_obreros_create()
 
 @app.route('/api/personnel/obreros/', methods=['PUT'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_api_personnel_obreros_update():
     return api_personnel_obreros_update()
 
 @app.route('/api/personnel/obreros/', methods=['DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_api_personnel_obreros_delete():
     return api_personnel_obreros_delete()
 
 @app.route('/api/personnel/obreros/debug', methods=['GET', 'POST', 'PUT', 'DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_api_personnel_obreros_debug():
     return api_personnel_obreros_debug()
 
 # Cuadrillas routes - gestión de cuadrillas (Admin + Moderador)
 @app.route('/api/personnel/cuadrillas/', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_get_cuadrillas():
     return get_cuadrillas()
 
 @app.route('/api/personnel/cuadrillas/', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_create_cuadrilla():
     return create_cuadrilla()
 
 @app.route('/api/personnel/cuadrillas/<cuadrilla_id>', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_get_cuadrilla_by_id(cuadrilla_id):
     return get_cuadrilla_by_id(cuadrilla_id)
 
 @app.route('/api/personnel/cuadrillas/<cuadrilla_id>', methods=['PUT'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_update_cuadrilla(cuadrilla_id):
     return update_cuadrilla(cuadrilla_id)
 
 @app.route('/api/personnel/cuadrillas/<cuadrilla_id>', methods=['DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def secured_delete_cuadrilla(cuadrilla_id):
     return delete_cuadrilla(cuadrilla_id)
 
 @app.route('/api/personnel/cuadrillas/next-number/', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_get_next_cuadrilla_number_api():
     return get_next_cuadrilla_number_api()
 
 @app.route('/api/personnel/obreros/disponibles/', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_get_obreros_disponibles():
     return get_obreros_disponibles()
 
 # NUEVO: Endpoints para información personal de obreros (Solo obreros)
 @app.route('/api/personnel/mi-informacion/', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['obrero'])
+@middleware_acceso(['obrero'], 'lectura')
 def secured_api_personnel_mi_informacion():
     return api_personnel_mi_informacion()
 
 @app.route('/api/personnel/mi-cuadrilla/', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['obrero'])
+@middleware_acceso(['obrero'], 'lectura')
 def secured_api_personnel_mi_cuadrilla():
     return api_personnel_mi_cuadrilla()
 
 # Reports routes - gestión de reportes (Admin + Moderador)
 @app.route('/api/reports/moderadores/generar', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'reportes')
 def secured_generar_reporte_moderadores():
     return generar_reporte_moderadores()
 
 @app.route('/api/reports/moderadores/listar', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_listar_reportes_moderadores():
     return listar_reportes_moderadores()
 
 @app.route('/api/reports/obreros/generar', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'reportes')
 def secured_generar_reporte_obreros():
     return generar_reporte_obreros()
 
 @app.route('/api/reports/obreros/listar', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_listar_reportes_obreros():
     return listar_reportes_obreros()
 
 @app.route('/api/reports/moderadores/<reporte_id>', methods=['DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def api_eliminar_reporte_moderadores(reporte_id):
     """Endpoint para eliminar reportes de moderadores por ID"""
     try:
@@ -743,8 +820,7 @@ def api_eliminar_reporte_moderadores(reporte_id):
         }), 500
 
 @app.route('/api/reports/obreros/<reporte_id>', methods=['DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def api_eliminar_reporte_obreros(reporte_id):
     """Endpoint para eliminar reportes de obreros por ID"""
     try:
@@ -765,8 +841,7 @@ def api_eliminar_reporte_obreros(reporte_id):
 
 # Endpoints de reportes generales (Admin + Moderador)
 @app.route('/api/reports/generales/generar', methods=['POST'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'reportes')
 def api_generar_reporte_general():
     """Endpoint para generar reportes generales de cuadrillas"""
     try:
@@ -787,14 +862,12 @@ def api_generar_reporte_general():
         }), 500
 
 @app.route('/api/reports/generales/listar', methods=['GET'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'lectura')
 def secured_listar_reportes_generales():
     return listar_reportes_generales()
 
 @app.route('/api/reports/generales/<reporte_id>', methods=['DELETE'])
-@middleware_verificar_autenticacion()
-@middleware_verificar_permisos(['admin', 'moderador'])
+@middleware_acceso(['admin', 'moderador'], 'escritura')
 def api_eliminar_reporte_general(reporte_id):
     """Endpoint para eliminar reportes generales por ID"""
     try:
@@ -824,6 +897,10 @@ def internal_error(error):
     logger.error(f"Error 500: {error}")
     return jsonify({"error": "Error interno del servidor"}), 500
 
+@app.errorhandler(ServidorOcupadoError)
+def servidor_ocupado(error):
+    return respuesta_servidor_ocupado()
+
 # ==================== PUNTO DE ENTRADA ====================
 
 if __name__ == '__main__':
@@ -37,6 +37,7 @@ class ChatChannelScreen(MDScreen):
         super().__init__(**kwargs)
         self.name = "chat_channel"
         self.channel_name = None
+        self.reset_message_state()
         self.setup_ui()
         
     def setup_ui(self):
@@ -100,6 +101,7 @@ class ChatChannelScreen(MDScreen):
     def set_channel(self, channel_name):
         self.channel_name = channel_name
         self.top_bar.title = f"# {channel_name}"
+        self.reset_message_state()
         self.load_messages()
         # Auto-actualizar cada 10 segundos para mejor rendimiento
         self.auto_update_event = Clock.schedule_interval(self.auto_load_messages, 10)
@@ -122,7 +124,13 @@ class ChatChannelScreen(MDScreen):
         if hasattr(self, 'messages_layout'):
             self.messages_layout.clear_widgets()
         self.channel_name = None
-        self._last_message_count = 0
+        self.reset_message_state()
+
+    def reset_message_state(self):
+        """Olvidar mensajes y cursor incremental del canal anterior"""
+        self._messages = {}
+        self._changes_cursor = None
+        self._etag = None
         
     def auto_load_messages(self, dt):
         self.load_messages()
@@ -132,41 +140,73 @@ class ChatChannelScreen(MDScreen):
             return
             
         try:
-            response = requests.get(f"{API_BASE_URL}/mensajes/{self.channel_name}", timeout=3)
+            # Si nada cambió desde el último sondeo el servidor responde 304 sin cuerpo
+            headers = {"If-None-Match": self._etag} if self._etag else {}
+            # Primera carga: página más reciente. Luego solo cambios desde el cursor
+            if self._changes_cursor is None:
+                response = requests.get(f"{API_BASE_URL}/mensajes/{self.channel_name}", headers=headers, timeout=3)
+            else:
+                response = requests.get(
+                    f"{API_BASE_URL}/mensajes/{self.channel_name}",
+                    params={"since": self._changes_cursor},
+                    headers=headers,
+                    timeout=3
+                )
+            if response.status_code == 304:
+                return
             if response.status_code == 200:
+                self._etag = response.headers.get('ETag')
                 data = response.json()
-                messages = data.get('mensajes', [])
-                
-                # Solo actualizar si hay cambios reales para mejorar rendimiento
-                if not hasattr(self, '_last_message_count') or len(messages) != self._last_message_count:
-                    self._last_message_count = len(messages)
-                    self.messages_layout.clear_widgets()
-                    
-                    if not messages:
-                        no_messages_label = MDLabel(
-                            text="No hay mensajes en este canal",
-                            theme_text_color="Secondary",
-                            halign="center",
-                            size_hint_y=None,
-                            height="40dp"
-                        )
-                        self.messages_layout.add_widget(no_messages_label)
-                    else:
-                        for msg in messages:
-                            message_text = f"{msg.get('usuario', 'Usuario')}: {msg.get('mensaje', '')}"
-                            message_label = MDLabel(
-                                text=message_text,
-                                size_hint_y=None,
-                                height="35dp",
-                                theme_text_color="Primary",
-                                text_size=(None, None),
-                                halign="left"
-                            )
-                            self.messages_layout.add_widget(message_label)
-                            
-                    self.scroll_to_bottom()
+                first_load = self._changes_cursor is None
+                changed = self.apply_message_changes(data)
+                self._changes_cursor = data.get('cursor_cambios', data.get('cursor', self._changes_cursor))
+
+                # Solo redibujar si hay cambios reales para mejorar rendimiento
+                if first_load or changed:
+                    self.render_messages()
         except Exception as e:
             print(f"Error loading messages: {e}")
+
+    def apply_message_changes(self, data):
+        """Aplicar mensajes nuevos/editados y eliminaciones; retorna True si hubo cambios"""
+        changed = False
+        for msg in data.get('mensajes', []):
+            # Los cambios recientes se repiten hasta que el cursor los supera
+            if self._messages.get(msg.get('_id')) != msg:
+                self._messages[msg.get('_id')] = msg
+                changed = True
+        for deleted in data.get('eliminados', []):
+            if self._messages.pop(deleted.get('_id'), None) is not None:
+                changed = True
+        return changed
+
+    def render_messages(self):
+        self.messages_layout.clear_widgets()
+        messages = list(self._messages.values())
+
+        if not messages:
+            no_messages_label = MDLabel(
+                text="No hay mensajes en este canal",
+                theme_text_color="Secondary",
+                halign="center",
+                size_hint_y=None,
+                height="40dp"
+            )
+            self.messages_layout.add_widget(no_messages_label)
+        else:
+            for msg in messages:
+                message_text = f"{msg.get('usuario', 'Usuario')}: {msg.get('mensaje', '')}"
+                message_label = MDLabel(
+                    text=message_text,
+                    size_hint_y=None,
+                    height="35dp",
+                    theme_text_color="Primary",
+                    text_size=(None, None),
+                    halign="left"
+                )
+                self.messages_layout.add_widget(message_label)
+
+        self.scroll_to_bottom()
             
     def scroll_to_bottom(self):
         if self.messages_layout.children:
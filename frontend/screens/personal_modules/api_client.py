@@ -90,9 +90,9 @@ class PersonalAPIClient:
     # MÉTODOS PARA MODERADORES
     # ===========================================
 
-    def get_moderadores(self):
-        """Obtener lista de todos los moderadores"""
-        return self._make_request('GET', '/api/personnel/moderadores/')
+    def get_moderadores(self, **filtros):
+        """Obtener lista de moderadores (todos, o una página con page/limit/q/activo/fields)"""
+        return self._make_request('GET', '/api/personnel/moderadores/', params=filtros or None)
 
     def create_moderador(self, moderador_data):
         """Crear nuevo moderador"""
@@ -111,9 +111,9 @@ class PersonalAPIClient:
     # MÉTODOS PARA OBREROS
     # ===========================================
 
-    def get_obreros(self):
-        """Obtener lista de todos los obreros"""
-        return self._make_request('GET', '/api/personnel/obreros/')
+    def get_obreros(self, **filtros):
+        """Obtener lista de obreros (todos, o una página con page/limit/q/activo/fields)"""
+        return self._make_request('GET', '/api/personnel/obreros/', params=filtros or None)
 
     def create_obrero(self, obrero_data):
         """Crear nuevo obrero"""
@@ -166,6 +166,14 @@ class PersonalAPIClient:
         except:
             return None
 
+    # ===========================================
+    # MÉTODOS DE BÚSQUEDA
+    # ===========================================
+
+    def search_personal(self, q, tipo='personal', page=1, limit=20):
+        """Buscar moderadores y obreros por nombre, apellidos, cédula o email (sin tildes)"""
+        return self._make_request('GET', '/api/search', params={'q': q, 'tipo': tipo, 'page': page, 'limit': limit})
+
     # ===========================================
     # MÉTODOS DE VALIDACIÓN
     # ===========================================
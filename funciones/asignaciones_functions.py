@@ -0,0 +1,213 @@
+"""
+Funciones de Asignaciones
+Índice de obreros asignados a cuadrillas activas: un documento por obrero en
+'asignaciones' con _id = id del obrero, así MongoDB impide asignarlo a dos
+cuadrillas a la vez. Se escribe junto con la cuadrilla (en una transacción
+cuando el servidor la admite).
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+from funciones.database_functions import get_db
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+COLECCION_ASIGNACIONES = 'asignaciones'
+
+# Documento de 'contadores' que marca el backfill como hecho
+CLAVE_INICIALIZACION = "asignaciones"
+
+# Sin transacción la asignación se escribe antes que la cuadrilla: una más
+# reciente que esto puede ser de una creación en curso y no se considera huérfana
+ASIGNACIONES_HUERFANAS_ANTIGUEDAD_SEGUNDOS = int(os.getenv('ASIGNACIONES_HUERFANAS_ANTIGUEDAD_SEGUNDOS', '3600'))
+
+class ObrerosAsignadosError(Exception):
+    """Algún obrero ya pertenece a otra cuadrilla activa; no se reservó ninguno"""
+
+    def __init__(self, asignaciones):
+        super().__init__("Obreros ya asignados a otra cuadrilla")
+        self.asignaciones = asignaciones
+
+def ids_obreros(obreros_ids):
+    """ObjectId de cada id válido (los inválidos los rechaza luego la búsqueda del obrero)"""
+    ids = []
+    for obrero_id in obreros_ids:
+        try:
+            ids.append(ObjectId(obrero_id))
+        except (InvalidId, TypeError):
+            continue
+    return ids
+
+def obreros_asignados(obreros_ids, excluir_cuadrilla_id=None):
+    """
+    Asignaciones vigentes de los obreros indicados (una consulta por _id)
+
+    Args:
+        obreros_ids (list): Ids de obreros (str u ObjectId)
+        excluir_cuadrilla_id: Cuadrilla que se está editando (sus obreros no cuentan)
+
+    Returns:
+        list: Documentos de 'asignaciones' ocupados
+    """
+    filtro = {"_id": {"$in": ids_obreros(obreros_ids)}}
+    if excluir_cuadrilla_id:
+        filtro["cuadrilla_id"] = {"$ne": ObjectId(excluir_cuadrilla_id)}
+    return list(get_db()[COLECCION_ASIGNACIONES].find(filtro))
+
+def mensaje_asignados(asignaciones):
+    """Mensaje de error con nombre, cédula y cuadrilla de cada obrero ocupado"""
+    obreros = {
+        obrero["_id"]: obrero
+        for obrero in get_db().obreros.find(
+            {"_id": {"$in": [a["_id"] for a in asignaciones]}},
+            {"nombre": 1, "apellidos": 1, "cedula": 1}
+        )
+    }
+    lineas = []
+    for asignacion in asignaciones:
+        obrero = obreros.get(asignacion["_id"], {})
+        obrero_info = f"{obrero.get('nombre')} {obrero.get('apellidos')} (CI: {obrero.get('cedula')})"
+        lineas.append(f"• {obrero_info} en {asignacion.get('numero_cuadrilla', 'N/A')}")
+    return "Los siguientes obreros ya están asignados a cuadrillas activas:\n" + "\n".join(lineas)
+
+def asignar_obreros(cuadrilla_id, numero_cuadrilla, obreros_ids, session=None):
+    """
+    Reservar los obreros para la cuadrilla; los que ya son suyos se ignoran
+
+    Returns:
+        list: _id de las asignaciones creadas
+
+    Raises:
+        ObrerosAsignadosError: Si alguno pertenece a otra cuadrilla (sin
+            transacción se liberan las recién creadas; con ella se aborta)
+    """
+    coleccion = get_db()[COLECCION_ASIGNACIONES]
+    ids = ids_obreros(obreros_ids)
+    propios = {
+        doc["_id"] for doc in coleccion.find(
+            {"_id": {"$in": ids}, "cuadrilla_id": cuadrilla_id}, {"_id": 1}, session=session
+        )
+    }
+    ahora = datetime.utcnow()
+    documentos = [
+        {"_id": obrero_id, "cuadrilla_id": cuadrilla_id, "numero_cuadrilla": numero_cuadrilla, "asignado_en": ahora}
+        for obrero_id in ids if obrero_id not in propios
+    ]
+    if not documentos:
+        return []
+
+    try:
+        coleccion.insert_many(documentos, ordered=False, session=session)
+        return [doc["_id"] for doc in documentos]
+    except BulkWriteError as e:
+        errores = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errores):
+            raise
+        if session is None:
+            fallidos = {documentos[error["index"]]["_id"] for error in errores}
+            liberar_asignaciones(claves=[doc["_id"] for doc in documentos if doc["_id"] not in fallidos])
+
+    # Fuera de la sesión: la transacción ya quedó abortada por el error
+    raise ObrerosAsignadosError(obreros_asignados(ids, excluir_cuadrilla_id=cuadrilla_id))
+
+def liberar_asignaciones(cuadrilla_id=None, claves=None, conservar=None, session=None):
+    """
+    Liberar asignaciones de una cuadrilla o por _id de obrero
+
+    Args:
+        cuadrilla_id: Cuadrilla cuyas asignaciones se liberan
+        claves (list): Ids de obreros a liberar
+        conservar (list): Ids de obreros de la cuadrilla que siguen asignados
+    """
+    filtro = {}
+    if cuadrilla_id is not None:
+        filtro["cuadrilla_id"] = cuadrilla_id
+    if claves is not None:
+        if not claves:
+            return
+        filtro["_id"] = {"$in": list(claves)}
+    if conservar is not None:
+        filtro.setdefault("_id", {})["$nin"] = ids_obreros(conservar)
+    if filtro:
+        get_db()[COLECCION_ASIGNACIONES].delete_many(filtro, session=session)
+
+def limpiar_asignaciones_huerfanas():
+    """
+    Liberar asignaciones de cuadrillas que ya no existen o de obreros eliminados
+    (escrituras sin transacción interrumpidas)
+
+    Solo se revisan las asignaciones con más de ASIGNACIONES_HUERFANAS_ANTIGUEDAD_SEGUNDOS.
+    """
+    db = get_db()
+    coleccion = db[COLECCION_ASIGNACIONES]
+    antiguas = {"asignado_en": {"$lt": datetime.utcnow() - timedelta(seconds=ASIGNACIONES_HUERFANAS_ANTIGUEDAD_SEGUNDOS)}}
+    liberadas = 0
+
+    cuadrillas = coleccion.distinct("cuadrilla_id", antiguas)
+    existentes = {c["_id"] for c in db.cuadrillas.find({"_id": {"$in": cuadrillas}, "activo": True}, {"_id": 1})}
+    huerfanas = [c for c in cuadrillas if c not in existentes]
+    if huerfanas:
+        liberadas += coleccion.delete_many({**antiguas, "cuadrilla_id": {"$in": huerfanas}}).deleted_count
+
+    obreros = coleccion.distinct("_id", antiguas)
+    existentes = {o["_id"] for o in db.obreros.find({"_id": {"$in": obreros}}, {"_id": 1})}
+    huerfanos = [o for o in obreros if o not in existentes]
+    if huerfanos:
+        liberadas += coleccion.delete_many({**antiguas, "_id": {"$in": huerfanos}}).deleted_count
+    return {"liberadas": liberadas}
+
+def inicializar_asignaciones():
+    """Cargar las asignaciones de las cuadrillas activas existentes (una sola vez)
+
+    Un obrero que ya estaba en dos cuadrillas activas queda asignado a la
+    primera y se avisa en el log para corregirlo a mano.
+    """
+    db = get_db()
+    if db is None:
+        return False
+    try:
+        if db.contadores.find_one({"_id": CLAVE_INICIALIZACION, "inicializado": True}):
+            return True
+
+        documentos = []
+        ahora = datetime.utcnow()
+        for cuadrilla in db.cuadrillas.find({"activo": True}, {"numero_cuadrilla": 1, "obreros.id": 1}):
+            for obrero in cuadrilla.get("obreros", []):
+                if obrero.get("id"):
+                    documentos.append({
+                        "_id": obrero["id"],
+                        "cuadrilla_id": cuadrilla["_id"],
+                        "numero_cuadrilla": cuadrilla.get("numero_cuadrilla"),
+                        "asignado_en": ahora
+                    })
+
+        repetidos = 0
+        if documentos:
+            try:
+                db[COLECCION_ASIGNACIONES].insert_many(documentos, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") != 11000:
+                        raise
+                    repetidos += 1
+                    documento = documentos[error["index"]]
+                    # Puede ser la misma cuadrilla si un arranque anterior se interrumpió
+                    logger.warning(
+                        f"Obrero {documento['_id']} ya asignado, también en {documento['numero_cuadrilla']}"
+                    )
+
+        db.contadores.update_one(
+            {"_id": CLAVE_INICIALIZACION},
+            {"$set": {"inicializado": True, "total": len(documentos), "repetidos": repetidos}},
+            upsert=True
+        )
+        logger.info(f"Asignaciones inicializadas: {len(documentos)} obreros, {repetidos} repetidos")
+        return True
+    except Exception as e:
+        logger.error(f"Error inicializando asignaciones: {e}")
+        return False
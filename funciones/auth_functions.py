@@ -11,13 +11,29 @@ FUNCIONES DE AUTENTICACIÓN:
 """
 
 import os
+import math
+import time
+import uuid
 import bcrypt
 import jwt
+import hashlib
+import logging
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeoutError
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g, has_app_context
 from bson import ObjectId
 from funciones.database_functions import get_db
+from funciones.eventos_functions import registrar_oyente_invalidacion
+from funciones.metrics_functions import incrementar, establecer, observar
+from funciones.security_log_functions import encolar_evento
+from funciones.rate_limit_functions import VentanaDeslizante, ip_cliente, consumir_presupuesto, PRESUPUESTOS
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
 
 # Configuración JWT desde variables de entorno
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'CorpoTachira_Secret_Key_Ultra_Segura_2024_!@#$%^&*()')
@@ -26,6 +42,52 @@ JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
 MAX_LOGIN_ATTEMPTS = int(os.getenv('MAX_LOGIN_ATTEMPTS', '5'))
 LOCKOUT_DURATION_MINUTES = int(os.getenv('LOCKOUT_DURATION_MINUTES', '5'))
 
+# Límites de login con ventana deslizante, comprobados antes de tocar la BD o bcrypt:
+# fallos por IP y por cuenta (username o cédula); los logins correctos no cuentan
+LOGIN_LIMITE_IP = int(os.getenv('LOGIN_LIMITE_IP', '20'))
+LOGIN_VENTANA_IP_SEGUNDOS = int(os.getenv('LOGIN_VENTANA_IP_SEGUNDOS', '60'))
+_limite_login_ip = VentanaDeslizante('login_ip', LOGIN_LIMITE_IP, LOGIN_VENTANA_IP_SEGUNDOS)
+_limite_login_cuenta = VentanaDeslizante('login_cuenta', MAX_LOGIN_ATTEMPTS, LOCKOUT_DURATION_MINUTES * 60)
+
+# Pool acotado para bcrypt: como máximo BCRYPT_CONCURRENCIA hashes a la vez y
+# BCRYPT_COLA_MAXIMA esperando; el resto recibe 503 SERVER_BUSY de inmediato
+BCRYPT_CONCURRENCIA = int(os.getenv('BCRYPT_CONCURRENCIA', str(max(1, (os.cpu_count() or 2) // 2))))
+BCRYPT_COLA_MAXIMA = int(os.getenv('BCRYPT_COLA_MAXIMA', '8'))
+BCRYPT_ESPERA_MAXIMA_SEGUNDOS = float(os.getenv('BCRYPT_ESPERA_MAXIMA_SEGUNDOS', '5'))
+BCRYPT_REINTENTAR_SEGUNDOS = int(os.getenv('BCRYPT_REINTENTAR_SEGUNDOS', '2'))
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_CONCURRENCIA, thread_name_prefix='bcrypt')
+_bcrypt_pendientes = 0
+_bcrypt_lock = threading.Lock()
+
+# Costo (work factor) de bcrypt: BCRYPT_COSTO fija el valor; si no, se calibra al
+# arrancar para que un hash tarde cerca de BCRYPT_OBJETIVO_MS en este servidor
+BCRYPT_COSTO = os.getenv('BCRYPT_COSTO')
+BCRYPT_OBJETIVO_MS = float(os.getenv('BCRYPT_OBJETIVO_MS', '250'))
+# Nunca por debajo del costo fijo anterior (12), aunque el servidor mida lento
+BCRYPT_COSTO_MINIMO = 12
+BCRYPT_COSTO_MAXIMO = 16
+_bcrypt_costo = int(BCRYPT_COSTO) if BCRYPT_COSTO else 12
+
+# Caché LRU de tokens ya verificados: {sha256(token): (payload, exp)}
+TOKEN_CACHE_MAXIMO = int(os.getenv('TOKEN_CACHE_MAXIMO', '1024'))
+_tokens_verificados = OrderedDict()
+_tokens_lock = threading.Lock()
+
+# Tokens revocados (logout): colección TTL 'tokens_revocados' replicada en memoria
+# y sincronizada de forma incremental; el solape cubre escrituras tardías de otros workers
+REVOCACIONES_INTERVALO_SEGUNDOS = float(os.getenv('REVOCACIONES_INTERVALO_SEGUNDOS', '5'))
+REVOCACIONES_SOLAPE_SEGUNDOS = 30
+_revocados = {}
+_revocados_lock = threading.Lock()
+# ('desde' es None hasta la primera sincronización correcta; 'intentado' espacía los reintentos)
+_revocados_estado = {"desde": None, "intentado": None, "refrescando": False}
+
+# Estado activo por usuario para verificar_sesion_activa:
+# {user_id: {"activo": bool, "personal_id": str, "expira": monotonic}}
+ESTADO_ACTIVO_TTL_SEGUNDOS = float(os.getenv('ESTADO_ACTIVO_TTL_SEGUNDOS', '30'))
+_estado_usuarios = {}
+_estado_usuarios_lock = threading.Lock()
+
 def generar_credenciales_moderador(nombre, apellidos, cedula):
     """
     Genera automáticamente credenciales para un moderador según las reglas:
@@ -58,6 +120,201 @@ def generar_credenciales_moderador(nombre, apellidos, cedula):
         print(f"Error generando credenciales: {e}")
         return None, None
 
+class ServidorOcupadoError(Exception):
+    """El pool de bcrypt está saturado; el cliente debe reintentar más tarde"""
+
+def resultado_servidor_ocupado():
+    """Resultado estándar cuando no hay capacidad para procesar contraseñas"""
+    return {
+        'success': False,
+        'message': 'Servidor ocupado, intente de nuevo en unos segundos',
+        'code': 'SERVER_BUSY'
+    }
+
+def _comprobar_limite_login(cuenta):
+    """
+    Rechazar el intento si la IP o la cuenta superaron su límite de fallos
+
+    Returns:
+        dict: Resultado con 'retry_after' si se rechaza, None si puede continuar
+    """
+    ip = ip_cliente()
+    espera_cuenta = _limite_login_cuenta.espera(cuenta)
+    if espera_cuenta:
+        incrementar('login_limitados')
+        return {
+            'success': False,
+            'message': f'Cuenta bloqueada por múltiples intentos fallidos. Intenta en {math.ceil(espera_cuenta / 60)} minutos',
+            'code': 'ACCOUNT_LOCKED',
+            'retry_after': espera_cuenta
+        }
+
+    espera_ip = _limite_login_ip.espera(ip)
+    if espera_ip:
+        incrementar('login_limitados')
+        return {
+            'success': False,
+            'message': f'Demasiados intentos de inicio de sesión. Intenta en {espera_ip} segundos',
+            'code': 'RATE_LIMITED',
+            'retry_after': espera_ip
+        }
+
+    return None
+
+def _registrar_fallo_login(cuenta):
+    """
+    Contar un intento fallido para la IP del cliente y para la cuenta
+
+    Returns:
+        int: Intentos que le quedan a la cuenta
+    """
+    _limite_login_ip.registrar(ip_cliente())
+    return _limite_login_cuenta.registrar(cuenta)
+
+def respuesta_limite_excedido(resultado):
+    """Respuesta HTTP 429 con Retry-After para un login rechazado por límite"""
+    respuesta = jsonify(resultado)
+    respuesta.status_code = 429
+    respuesta.headers['Retry-After'] = str(resultado['retry_after'])
+    return respuesta
+
+def respuesta_servidor_ocupado(resultado=None):
+    """Respuesta HTTP 503 con Retry-After para SERVER_BUSY"""
+    respuesta = jsonify(resultado or resultado_servidor_ocupado())
+    respuesta.status_code = 503
+    respuesta.headers['Retry-After'] = str(BCRYPT_REINTENTAR_SEGUNDOS)
+    return respuesta
+
+def _enviar_bcrypt(funcion, *args):
+    """
+    Encola una operación bcrypt en el pool acotado y retorna su futuro
+
+    Raises:
+        ServidorOcupadoError: Si la cola está llena
+    """
+    global _bcrypt_pendientes
+    with _bcrypt_lock:
+        if _bcrypt_pendientes >= BCRYPT_CONCURRENCIA + BCRYPT_COLA_MAXIMA:
+            incrementar('bcrypt_rechazados')
+            raise ServidorOcupadoError()
+        _bcrypt_pendientes += 1
+        establecer('bcrypt_pendientes', _bcrypt_pendientes)
+
+    encolado = time.perf_counter()
+
+    def tarea():
+        inicio = time.perf_counter()
+        observar('bcrypt_espera_cola', inicio - encolado)
+        try:
+            return funcion(*args)
+        finally:
+            observar('bcrypt_duracion', time.perf_counter() - inicio)
+
+    def liberar(_futuro):
+        global _bcrypt_pendientes
+        with _bcrypt_lock:
+            _bcrypt_pendientes -= 1
+            establecer('bcrypt_pendientes', _bcrypt_pendientes)
+
+    try:
+        futuro = _bcrypt_executor.submit(tarea)
+    except Exception:
+        liberar(None)
+        raise
+    futuro.add_done_callback(liberar)
+    return futuro
+
+def _ejecutar_bcrypt(funcion, *args):
+    """
+    Ejecuta una operación bcrypt en el pool acotado y espera su resultado
+
+    Raises:
+        ServidorOcupadoError: Si la cola está llena o la espera supera el máximo
+    """
+    futuro = _enviar_bcrypt(funcion, *args)
+    try:
+        return futuro.result(timeout=BCRYPT_ESPERA_MAXIMA_SEGUNDOS)
+    except FuturoTimeoutError:
+        # La tarea sigue y libera su cupo al terminar; la request no espera más
+        incrementar('bcrypt_tiempo_agotado')
+        raise ServidorOcupadoError()
+
+def calibrar_costo_bcrypt():
+    """
+    Elige el costo de bcrypt según la velocidad de este servidor
+
+    Mide el costo mínimo y duplica el tiempo por cada punto de costo (así
+    escala bcrypt) hasta el mayor costo que no supere BCRYPT_OBJETIVO_MS.
+    Con BCRYPT_COSTO definido se usa ese valor sin medir.
+
+    Returns:
+        int: Costo en uso
+    """
+    global _bcrypt_costo
+    if BCRYPT_COSTO:
+        _bcrypt_costo = int(BCRYPT_COSTO)
+    else:
+        salt = bcrypt.gensalt(rounds=BCRYPT_COSTO_MINIMO)
+        medidas = []
+        for _ in range(3):
+            inicio = time.perf_counter()
+            bcrypt.hashpw(b'calibracion-bcrypt', salt)
+            medidas.append((time.perf_counter() - inicio) * 1000)
+        estimado = min(medidas)
+
+        costo = BCRYPT_COSTO_MINIMO
+        while costo < BCRYPT_COSTO_MAXIMO and estimado * 2 <= BCRYPT_OBJETIVO_MS:
+            costo += 1
+            estimado *= 2
+        _bcrypt_costo = costo
+        logger.info(f"bcrypt calibrado: costo {costo} (~{estimado:.0f} ms, objetivo {BCRYPT_OBJETIVO_MS:.0f} ms)")
+
+    establecer('bcrypt_costo', _bcrypt_costo)
+    return _bcrypt_costo
+
+def costo_hash(hash_almacenado):
+    """Costo con el que se generó un hash bcrypt ($2b$<costo>$...) o None"""
+    try:
+        return int(hash_almacenado.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def actualizar_hash_si_necesario(usuario, password):
+    """
+    Rehashea en segundo plano una contraseña guardada con un costo menor al actual
+
+    Se llama tras un login correcto (único momento en que se conoce la
+    contraseña). Solo sube el costo: un hash más fuerte que el actual (otro
+    servidor calibró más alto) se conserva. Solo reemplaza el hash si no
+    cambió entretanto.
+
+    Returns:
+        bool: True si se programó la actualización
+    """
+    hash_anterior = usuario.get('password')
+    costo_anterior = costo_hash(hash_anterior)
+    if costo_anterior is None or costo_anterior >= _bcrypt_costo:
+        return False
+
+    def guardar(futuro):
+        try:
+            nuevo_hash = futuro.result().decode('utf-8')
+            get_db()['usuarios'].update_one(
+                {'_id': usuario['_id'], 'password': hash_anterior},
+                {'$set': {'password': nuevo_hash}}
+            )
+            incrementar('bcrypt_rehash')
+        except Exception as e:
+            logger.error(f"Error actualizando hash de {usuario.get('username')}: {e}")
+
+    try:
+        futuro = _enviar_bcrypt(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=_bcrypt_costo))
+    except ServidorOcupadoError:
+        # Pool saturado: se reintentará en el próximo login
+        return False
+    futuro.add_done_callback(guardar)
+    return True
+
 def hash_password(password):
     """
     Hashea una contraseña usando bcrypt
@@ -67,13 +324,18 @@ def hash_password(password):
 
     Returns:
         str: Hash de la contraseña
+
+    Raises:
+        ServidorOcupadoError: Si el pool de bcrypt está saturado
     """
     try:
-        # Generar salt y hashear
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+        # Generar salt y hashear con el costo calibrado
+        salt = bcrypt.gensalt(rounds=_bcrypt_costo)
+        hashed = _ejecutar_bcrypt(bcrypt.hashpw, password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
 
+    except ServidorOcupadoError:
+        raise
     except Exception as e:
         print(f"Error hasheando contraseña: {e}")
         return None
@@ -88,10 +350,15 @@ def verificar_password(password, hash_almacenado):
 
     Returns:
         bool: True si coinciden, False si no
+
+    Raises:
+        ServidorOcupadoError: Si el pool de bcrypt está saturado
     """
     try:
-        return bcrypt.checkpw(password.encode('utf-8'), hash_almacenado.encode('utf-8'))
+        return _ejecutar_bcrypt(bcrypt.checkpw, password.encode('utf-8'), hash_almacenado.encode('utf-8'))
 
+    except ServidorOcupadoError:
+        raise
     except Exception as e:
         print(f"Error verificando contraseña: {e}")
         return False
@@ -131,7 +398,8 @@ def generar_token_jwt(user_data):
             'cedula': user_data.get('cedula', ''),
             'activo': user_data.get('activo', True),
             'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS),
-            'iat': datetime.utcnow()
+            'iat': datetime.utcnow(),
+            'jti': uuid.uuid4().hex
         }
 
 # Debug removido: payload creado correctamente
@@ -151,12 +419,169 @@ def verificar_token_jwt(token):
     """
     Verifica y decodifica un token JWT
 
+    Un mismo token se verifica una sola vez por request (memo en flask.g) y
+    una sola vez por proceso hasta su expiración (caché LRU por hash).
+
     Args:
         token (str): Token JWT
 
     Returns:
         dict: Datos del usuario o None si inválido
     """
+    if not token:
+        return None
+
+    memo = None
+    if has_app_context():
+        memo = g.setdefault('_tokens_verificados', {})
+        if token in memo:
+            return memo[token]
+
+    payload = _obtener_token_cacheado(token)
+    if payload is None:
+        payload = _decodificar_token_jwt(token)
+        if payload is not None:
+            _guardar_token_cacheado(token, payload)
+
+    if memo is not None:
+        memo[token] = payload
+    return payload
+
+def _clave_token(token):
+    """Clave del token en la caché (no se guarda el token en claro)"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def _obtener_token_cacheado(token):
+    """Payload verificado del token si sigue en caché y no ha expirado"""
+    clave = _clave_token(token)
+    with _tokens_lock:
+        entrada = _tokens_verificados.get(clave)
+        if entrada is None:
+            return None
+        payload, expira = entrada
+        if expira <= time.time():
+            del _tokens_verificados[clave]
+            return None
+        _tokens_verificados.move_to_end(clave)
+    return dict(payload)
+
+def _guardar_token_cacheado(token, payload):
+    """Guardar un payload verificado hasta su 'exp' (descarta el menos usado si está lleno)"""
+    expira = payload.get('exp')
+    if not isinstance(expira, (int, float)):
+        return
+    clave = _clave_token(token)
+    with _tokens_lock:
+        _tokens_verificados[clave] = (dict(payload), expira)
+        _tokens_verificados.move_to_end(clave)
+        while len(_tokens_verificados) > TOKEN_CACHE_MAXIMO:
+            _tokens_verificados.popitem(last=False)
+
+def revocar_token(payload):
+    """
+    Revoca un token hasta su expiración (logout)
+
+    Args:
+        payload (dict): Payload verificado del token
+
+    Returns:
+        bool: True si se revocó, False si el token no tiene jti
+    """
+    jti = payload.get('jti')
+    expira = payload.get('exp')
+    if not jti or not isinstance(expira, (int, float)):
+        return False
+
+    db = get_db()
+    db['tokens_revocados'].update_one(
+        {'_id': jti},
+        {'$setOnInsert': {
+            'user_id': payload.get('user_id'),
+            'revocado_en': datetime.utcnow(),
+            # El índice TTL elimina la revocación cuando el token ya no sería válido
+            'expira': datetime.utcfromtimestamp(expira)
+        }},
+        upsert=True
+    )
+    with _revocados_lock:
+        _revocados[jti] = expira
+    return True
+
+def token_revocado(payload):
+    """
+    Indica si el token fue revocado, consultando la réplica en memoria
+
+    Mientras la réplica no se haya sincronizado nunca (la BD falló al
+    arrancar) se consulta la colección en cada request; si esa consulta
+    también falla el error se propaga y el token se rechaza.
+
+    Args:
+        payload (dict): Payload verificado del token
+
+    Returns:
+        bool: True si está revocado
+    """
+    jti = payload.get('jti')
+    if not jti:
+        return False
+    _programar_sincronizacion_revocaciones()
+    with _revocados_lock:
+        if _revocados_estado["desde"] is not None:
+            return jti in _revocados
+    return get_db()['tokens_revocados'].find_one({'_id': jti}, {'_id': 1}) is not None
+
+def _programar_sincronizacion_revocaciones():
+    """Hasta la primera sincronización correcta en línea; luego en segundo plano al vencer el intervalo"""
+    with _revocados_lock:
+        intentado = _revocados_estado["intentado"]
+        if _revocados_estado["refrescando"]:
+            return
+        if intentado is not None and time.monotonic() - intentado < REVOCACIONES_INTERVALO_SEGUNDOS:
+            return
+        _revocados_estado["refrescando"] = True
+        _revocados_estado["intentado"] = time.monotonic()
+        replica = _revocados_estado["desde"] is not None
+
+    if not replica:
+        # Sin réplica todavía: no se puede aceptar un token sin conocer las revocaciones
+        _sincronizar_revocaciones()
+    else:
+        threading.Thread(target=_sincronizar_revocaciones, name='tokens-revocados', daemon=True).start()
+
+def _sincronizar_revocaciones():
+    """Traer de la BD las revocaciones nuevas y olvidar las de tokens ya expirados"""
+    try:
+        desde = _revocados_estado["desde"]
+        filtro = {}
+        if desde is not None:
+            filtro = {'revocado_en': {'$gte': desde - timedelta(seconds=REVOCACIONES_SOLAPE_SEGUNDOS)}}
+
+        inicio = datetime.utcnow()
+        nuevos = {}
+        db = get_db()
+        for revocado in db['tokens_revocados'].find(filtro, {'expira': 1}):
+            expira = revocado.get('expira')
+            if isinstance(expira, datetime):
+                nuevos[revocado['_id']] = (expira - datetime(1970, 1, 1)).total_seconds()
+
+        ahora = time.time()
+        with _revocados_lock:
+            _revocados.update(nuevos)
+            for jti in [jti for jti, expira in _revocados.items() if expira <= ahora]:
+                del _revocados[jti]
+            _revocados_estado["desde"] = inicio
+
+    except Exception as e:
+        # No se marca como sincronizada: se reintenta al vencer el intervalo y,
+        # sin réplica todavía, token_revocado consulta la BD en cada request
+        logger.error(f"Error sincronizando tokens revocados: {e}")
+        incrementar('revocaciones_sincronizacion_fallida')
+    finally:
+        with _revocados_lock:
+            _revocados_estado["refrescando"] = False
+
+def _decodificar_token_jwt(token):
+    """Verificar firma y expiración del token con PyJWT"""
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
         return payload
@@ -183,6 +608,11 @@ def login_admin_moderador(username, password):
         dict: Resultado del login con token y datos del usuario
     """
     try:
+        cuenta = f"usuario:{username}"
+        limitado = _comprobar_limite_login(cuenta)
+        if limitado:
+            return limitado
+
         db = get_db()
         usuarios_collection = db['usuarios']
 
@@ -193,60 +623,36 @@ def login_admin_moderador(username, password):
         })
 
         if not usuario:
+            # También cuenta como fallo: evita probar nombres de usuario sin límite
+            _registrar_fallo_login(cuenta)
             return {
                 'success': False,
                 'message': 'Usuario no encontrado o inactivo',
                 'code': 'USER_NOT_FOUND'
             }
 
-        # Verificar si está bloqueado
-        if usuario.get('bloqueado_hasta'):
-            bloqueo_hasta = usuario['bloqueado_hasta']
-            if datetime.utcnow() < bloqueo_hasta:
-                tiempo_restante = bloqueo_hasta - datetime.utcnow()
-                minutos_restantes = int(tiempo_restante.total_seconds() / 60)
-                return {
-                    'success': False,
-                    'message': f'Cuenta bloqueada. Intenta en {minutos_restantes} minutos',
-                    'code': 'ACCOUNT_LOCKED'
-                }
-            else:
-                # Desbloquear cuenta
-                usuarios_collection.update_one(
-                    {'_id': usuario['_id']},
-                    {'$unset': {'bloqueado_hasta': ''}, '$set': {'intentos_fallidos': 0}}
-                )
-
         # Verificar contraseña
         if not verificar_password(password, usuario['password']):
-            # Incrementar intentos fallidos
-            intentos = usuario.get('intentos_fallidos', 0) + 1
-            update_data = {'intentos_fallidos': intentos}
-
-            if intentos >= MAX_LOGIN_ATTEMPTS:
-                # Bloquear cuenta
-                update_data['bloqueado_hasta'] = datetime.utcnow() + timedelta(minutes=LOCKOUT_DURATION_MINUTES)
+            # Contar el fallo en memoria (o en el almacén compartido), sin escribir el usuario
+            intentos_restantes = _registrar_fallo_login(cuenta)
 
-            usuarios_collection.update_one(
-                {'_id': usuario['_id']},
-                {'$set': update_data}
-            )
-
-            if intentos >= MAX_LOGIN_ATTEMPTS:
+            if intentos_restantes <= 0:
                 return {
                     'success': False,
                     'message': f'Cuenta bloqueada por {LOCKOUT_DURATION_MINUTES} minutos debido a múltiples intentos fallidos',
-                    'code': 'ACCOUNT_LOCKED'
+                    'code': 'ACCOUNT_LOCKED',
+                    'retry_after': _limite_login_cuenta.espera(cuenta)
                 }
             else:
-                intentos_restantes = MAX_LOGIN_ATTEMPTS - intentos
                 return {
                     'success': False,
                     'message': f'Contraseña incorrecta. {intentos_restantes} intentos restantes',
                     'code': 'INVALID_PASSWORD'
                 }
 
-        # Login exitoso - resetear intentos fallidos y actualizar último acceso
+        # Login exitoso - olvidar fallos previos y actualizar último acceso
+        # (el $unset limpia los campos de bloqueo que guardaban versiones anteriores)
+        _limite_login_cuenta.reiniciar(cuenta)
         usuarios_collection.update_one(
             {'_id': usuario['_id']},
             {
@@ -255,6 +661,9 @@ def login_admin_moderador(username, password):
             }
         )
 
+        # Llevar el hash al costo actual sin esperar (la contraseña se conoce solo aquí)
+        actualizar_hash_si_necesario(usuario, password)
+
         # Generar token
         token = generar_token_jwt(usuario)
         if not token:
@@ -284,6 +693,8 @@ def login_admin_moderador(username, password):
             }
         }
 
+    except ServidorOcupadoError:
+        return resultado_servidor_ocupado()
     except Exception as e:
         print(f"Error en login admin/moderador: {e}")
         import traceback
@@ -309,6 +720,11 @@ def login_obrero(cedula):
         dict: Resultado del login con token y datos del obrero
     """
     try:
+        cuenta = f"cedula:{str(cedula).strip()}"
+        limitado = _comprobar_limite_login(cuenta)
+        if limitado:
+            return limitado
+
         db = get_db()
         obreros_collection = db['obreros']
 
@@ -319,12 +735,16 @@ def login_obrero(cedula):
         })
 
         if not obrero:
+            # Sin contraseña, la cédula es el secreto: limitar los intentos fallidos
+            _registrar_fallo_login(cuenta)
             return {
                 'success': False,
                 'message': 'Cédula no encontrada o trabajador inactivo',
                 'code': 'WORKER_NOT_FOUND'
             }
 
+        _limite_login_cuenta.reiniciar(cuenta)
+
         # Crear datos especiales para token de obrero
         obrero_data = {
             '_id': obrero['_id'],
@@ -398,8 +818,7 @@ def crear_usuario_admin_inicial():
             'personal_id': None,
             'activo': True,
             'fecha_creacion': datetime.utcnow(),
-            'ultimo_acceso': None,
-            'intentos_fallidos': 0
+            'ultimo_acceso': None
         }
 
         resultado = usuarios_collection.insert_one(admin_data)
@@ -476,8 +895,7 @@ def sincronizar_usuarios_con_personal():
                     'personal_id': moderador['_id'],
                     'activo': True,
                     'fecha_creacion': datetime.utcnow(),
-                    'ultimo_acceso': None,
-                    'intentos_fallidos': 0
+                    'ultimo_acceso': None
                 }
 
                 resultado = usuarios_collection.insert_one(usuario_data)
@@ -507,105 +925,184 @@ def sincronizar_usuarios_con_personal():
 
 def middleware_verificar_autenticacion():
     """
+    OBSOLETO: usar middleware_acceso. Ninguna ruta lo usa; se conserva como
+    referencia de scripts/benchmark_permisos.py.
+
     Decorator para verificar autenticación en endpoints
     Extrae token del header Authorization y valida
     """
+    warnings.warn(
+        "middleware_verificar_autenticacion está obsoleto, use middleware_acceso",
+        DeprecationWarning, stacklevel=2
+    )
+
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            try:
-# Obtener token del header
-                auth_header = request.headers.get('Authorization')
-
-                if not auth_header:
-                    return jsonify({
-                        'success': False,
-                        'message': 'Token de autorización requerido',
-                        'code': 'NO_TOKEN'
-                    }), 401
-
-                # Extraer token (formato: "Bearer TOKEN")
-                try:
-                    token = auth_header.split(' ')[1]
-                except IndexError:
-                    return jsonify({
-                        'success': False,
-                        'message': 'Formato de token inválido',
-                        'code': 'INVALID_TOKEN_FORMAT'
-                    }), 401
-
-                # Verificar token
-                user_data = verificar_token_jwt(token)
+            # Obtener token del header
+            auth_header = request.headers.get('Authorization')
 
-                if not user_data:
-                    return jsonify({
-                        'success': False,
-                        'message': 'Token inválido o expirado',
-                        'code': 'INVALID_TOKEN'
-                    }), 401
-
-                # Adjuntar datos del usuario al request
-                request.user_data = user_data
+            if not auth_header:
+                return jsonify({
+                    'success': False,
+                    'message': 'Token de autorización requerido',
+                    'code': 'NO_TOKEN'
+                }), 401
 
-                return f(*args, **kwargs)
+            # Extraer token (formato: "Bearer TOKEN")
+            try:
+                token = auth_header.split(' ')[1]
+            except IndexError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Formato de token inválido',
+                    'code': 'INVALID_TOKEN_FORMAT'
+                }), 401
 
+            # Verificar token
+            try:
+                user_data = verificar_token_jwt(token)
+                revocado = bool(user_data) and token_revocado(user_data)
             except Exception as e:
-                print(f"Error en middleware de autenticación: {e}")
+                logger.error(f"Error en middleware de autenticación: {e}")
                 return jsonify({
                     'success': False,
                     'message': 'Error verificando autenticación',
                     'code': 'AUTH_ERROR'
                 }), 500
 
+            if not user_data:
+                return jsonify({
+                    'success': False,
+                    'message': 'Token inválido o expirado',
+                    'code': 'INVALID_TOKEN'
+                }), 401
+
+            if revocado:
+                return jsonify({
+                    'success': False,
+                    'message': 'Sesión cerrada, inicie sesión nuevamente',
+                    'code': 'TOKEN_REVOKED'
+                }), 401
+
+            # Adjuntar datos del usuario al request
+            request.user_data = user_data
+
+            return f(*args, **kwargs)
+
         return wrapper
     return decorator
 
 def middleware_verificar_permisos(niveles_permitidos):
     """
+    OBSOLETO: usar middleware_acceso. Ninguna ruta lo usa; se conserva como
+    referencia de scripts/benchmark_permisos.py.
+
     Decorator para verificar permisos específicos
 
     Args:
         niveles_permitidos (list): Lista de niveles permitidos ['admin', 'moderador', 'obrero']
     """
+    warnings.warn(
+        "middleware_verificar_permisos está obsoleto, use middleware_acceso",
+        DeprecationWarning, stacklevel=2
+    )
+
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            try:
-                # Verificar que existe user_data (debe aplicarse después de verificar_autenticacion)
-                if not hasattr(request, 'user_data'):
-                    return jsonify({
-                        'success': False,
-                        'message': 'Autenticación requerida',
-                        'code': 'AUTH_REQUIRED'
-                    }), 401
-
-                user_tipo = request.user_data.get('tipo_usuario')
-
-# Verificar permisos del usuario
-
-                # Verificar permisos
-                if user_tipo not in niveles_permitidos:
-                    return jsonify({
-                        'success': False,
-                        'message': 'No tienes permisos para realizar esta acción',
-                        'code': 'INSUFFICIENT_PERMISSIONS',
-                        'required_levels': niveles_permitidos,
-                        'your_level': user_tipo
-                    }), 403
-
-                return f(*args, **kwargs)
+            # Verificar que existe user_data (debe aplicarse después de verificar_autenticacion)
+            if not hasattr(request, 'user_data'):
+                return jsonify({
+                    'success': False,
+                    'message': 'Autenticación requerida',
+                    'code': 'AUTH_REQUIRED'
+                }), 401
 
-            except Exception as e:
-                print(f"Error en middleware de permisos: {e}")
+            user_tipo = request.user_data.get('tipo_usuario')
+
+            # Verificar permisos
+            if user_tipo not in niveles_permitidos:
                 return jsonify({
                     'success': False,
-                    'message': 'Error verificando permisos',
-                    'code': 'PERMISSIONS_ERROR'
-                }), 500
+                    'message': 'No tienes permisos para realizar esta acción',
+                    'code': 'INSUFFICIENT_PERMISSIONS',
+                    'required_levels': niveles_permitidos,
+                    'your_level': user_tipo
+                }), 403
+
+            return f(*args, **kwargs)
 
         return wrapper
     return decorator
 
+def _error_acceso(mensaje, codigo, estado, **extra):
+    """Respuesta de error de autenticación/autorización"""
+    cuerpo = {'success': False, 'message': mensaje, 'code': codigo}
+    cuerpo.update(extra)
+    return jsonify(cuerpo), estado
+
+def middleware_acceso(niveles_permitidos=None, presupuesto=None):
+    """
+    Decorator combinado de autenticación, permisos y límite de tasa
+
+    Equivale a middleware_verificar_autenticacion + middleware_verificar_permisos
+    + middleware_limitar_tasa, pero con un solo wrapper: una verificación del
+    token (cacheada) y una búsqueda en el frozenset de niveles de la ruta,
+    construido una vez al decorarla.
+
+    Args:
+        niveles_permitidos (list): Niveles permitidos; None acepta cualquier usuario autenticado
+        presupuesto (str): Clave de PRESUPUESTOS para limitar la tasa, o None
+    """
+    niveles = frozenset(niveles_permitidos) if niveles_permitidos is not None else None
+    requeridos = sorted(niveles) if niveles is not None else None
+    if presupuesto is not None and presupuesto not in PRESUPUESTOS:
+        raise ValueError(f"Presupuesto de tasa desconocido: '{presupuesto}'")
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            # Resolver el proxy de Flask una sola vez por solicitud
+            solicitud = request._get_current_object()
+            auth_header = solicitud.headers.get('Authorization')
+            if not auth_header:
+                return _error_acceso('Token de autorización requerido', 'NO_TOKEN', 401)
+
+            partes = auth_header.split(' ')
+            if len(partes) < 2:
+                return _error_acceso('Formato de token inválido', 'INVALID_TOKEN_FORMAT', 401)
+
+            try:
+                user_data = verificar_token_jwt(partes[1])
+                revocado = bool(user_data) and token_revocado(user_data)
+            except Exception as e:
+                logger.error(f"Error en middleware de acceso: {e}")
+                return _error_acceso('Error verificando autenticación', 'AUTH_ERROR', 500)
+
+            if not user_data:
+                return _error_acceso('Token inválido o expirado', 'INVALID_TOKEN', 401)
+            if revocado:
+                return _error_acceso('Sesión cerrada, inicie sesión nuevamente', 'TOKEN_REVOKED', 401)
+
+            user_tipo = user_data.get('tipo_usuario')
+            if niveles is not None and user_tipo not in niveles:
+                return _error_acceso(
+                    'No tienes permisos para realizar esta acción', 'INSUFFICIENT_PERMISSIONS', 403,
+                    required_levels=requeridos, your_level=user_tipo
+                )
+
+            solicitud.user_data = user_data
+
+            if presupuesto is not None:
+                limitado = consumir_presupuesto(presupuesto, f"usuario:{user_data.get('user_id')}", solicitud.endpoint)
+                if limitado is not None:
+                    return limitado
+
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
 def verificar_sesion_activa(token):
     """
     Verifica si una sesión está activa y es válida
@@ -618,42 +1115,20 @@ def verificar_sesion_activa(token):
     """
     try:
         user_data = verificar_token_jwt(token)
-        if not user_data:
+        if not user_data or token_revocado(user_data):
             return {
                 'success': False,
                 'message': 'Sesión expirada o inválida',
                 'code': 'SESSION_INVALID'
             }
 
-        # Verificar que el usuario sigue activo en BD
-        db = get_db()
-
-        if user_data['tipo_usuario'] == 'obrero':
-            # Para obreros, verificar en colección obreros
-            obreros_collection = db['obreros']
-            obrero = obreros_collection.find_one({
-                '_id': ObjectId(user_data['user_id']),
-                'activo': True
-            })
-            if not obrero:
-                return {
-                    'success': False,
-                    'message': 'Usuario inactivo',
-                    'code': 'USER_INACTIVE'
-                }
-        else:
-            # Para admin y moderadores, verificar en colección usuarios
-            usuarios_collection = db['usuarios']
-            usuario = usuarios_collection.find_one({
-                '_id': ObjectId(user_data['user_id']),
-                'activo': True
-            })
-            if not usuario:
-                return {
-                    'success': False,
-                    'message': 'Usuario inactivo',
-                    'code': 'USER_INACTIVE'
-                }
+        # Verificar que el usuario sigue activo (caché con TTL corto e invalidación explícita)
+        if not usuario_activo(user_data):
+            return {
+                'success': False,
+                'message': 'Usuario inactivo',
+                'code': 'USER_INACTIVE'
+            }
 
         return {
             'success': True,
@@ -668,6 +1143,69 @@ def verificar_sesion_activa(token):
             'code': 'SESSION_ERROR'
         }
 
+def usuario_activo(user_data):
+    """
+    Indica si el usuario del token sigue activo en BD, con caché por user_id
+
+    Args:
+        user_data (dict): Payload verificado del token
+
+    Returns:
+        bool: True si el usuario existe y está activo
+    """
+    user_id = user_data['user_id']
+    with _estado_usuarios_lock:
+        entrada = _estado_usuarios.get(user_id)
+        if entrada and entrada['expira'] > time.monotonic():
+            return entrada['activo']
+
+    db = get_db()
+    if user_data['tipo_usuario'] == 'obrero':
+        # Para obreros, verificar en colección obreros
+        documento = db['obreros'].find_one({'_id': ObjectId(user_id)}, {'activo': 1})
+    else:
+        # Para admin y moderadores, verificar en colección usuarios
+        documento = db['usuarios'].find_one({'_id': ObjectId(user_id)}, {'activo': 1, 'personal_id': 1})
+
+    activo = bool(documento and documento.get('activo') is True)
+    personal_id = documento.get('personal_id') if documento else None
+    with _estado_usuarios_lock:
+        _estado_usuarios[user_id] = {
+            'activo': activo,
+            'personal_id': str(personal_id) if personal_id else None,
+            'expira': time.monotonic() + ESTADO_ACTIVO_TTL_SEGUNDOS
+        }
+    return activo
+
+def invalidar_estado_usuario(user_id=None, personal_id=None):
+    """
+    Descarta el estado activo cacheado de un usuario (sin argumentos, de todos)
+
+    Args:
+        user_id (str): ID del token (usuarios._id, u obreros._id para obreros)
+        personal_id (str): ID del moderador en la colección moderadores
+    """
+    user_id = str(user_id) if user_id else None
+    personal_id = str(personal_id) if personal_id else None
+    with _estado_usuarios_lock:
+        if user_id is None and personal_id is None:
+            _estado_usuarios.clear()
+            return
+        for clave in [clave for clave, entrada in _estado_usuarios.items()
+                      if clave == user_id or (personal_id and entrada['personal_id'] == personal_id)]:
+            del _estado_usuarios[clave]
+
+def _oyente_estado_usuarios(coleccion, clave):
+    """Invalidar el estado cacheado cuando otro worker modifica usuarios u obreros (change stream)"""
+    if coleccion in ('usuarios', 'obreros', None):
+        with _estado_usuarios_lock:
+            if clave is None:
+                _estado_usuarios.clear()
+            else:
+                _estado_usuarios.pop(clave, None)
+
+registrar_oyente_invalidacion(_oyente_estado_usuarios)
+
 def cambiar_password(user_id, password_actual, password_nueva):
     """
     Cambia la contraseña de un usuario admin o moderador
@@ -725,6 +1263,7 @@ def cambiar_password(user_id, password_actual, password_nueva):
         )
 
         if resultado.modified_count > 0:
+            invalidar_estado_usuario(user_id=user_id)
             return {
                 'success': True,
                 'message': 'Contraseña cambiada exitosamente'
@@ -736,6 +1275,8 @@ def cambiar_password(user_id, password_actual, password_nueva):
                 'code': 'UPDATE_ERROR'
             }
 
+    except ServidorOcupadoError:
+        return resultado_servidor_ocupado()
     except Exception as e:
         print(f"Error cambiando contraseña: {e}")
         return {
@@ -749,15 +1290,15 @@ def log_security_event(event_type, user_data, details=None):
     """
     Registra eventos de seguridad
 
+    El evento se arma aquí (necesita la solicitud) y se guarda por lotes en
+    segundo plano, sin esperar a MongoDB dentro del login/logout.
+
     Args:
         event_type (str): Tipo de evento (login, logout, failed_login, etc.)
         user_data (dict): Datos del usuario
         details (dict): Detalles adicionales
     """
     try:
-        db = get_db()
-        security_logs = db['security_logs']
-
         log_entry = {
             'event_type': event_type,
             'timestamp': datetime.utcnow(),
@@ -769,7 +1310,7 @@ def log_security_event(event_type, user_data, details=None):
             'details': details or {}
         }
 
-        security_logs.insert_one(log_entry)
+        encolar_evento(log_entry)
 
     except Exception as e:
         print(f"Error registrando evento de seguridad: {e}")
@@ -777,32 +1318,24 @@ def log_security_event(event_type, user_data, details=None):
 # Función para limpiar tokens expirados (opcional, para mantenimiento)
 def limpiar_tokens_expirados():
     """
-    Limpia logs de seguridad antiguos y realiza mantenimiento
-    """
-    try:
-        db = get_db()
-
-        # Limpiar logs de seguridad mayores a 30 días
-        fecha_limite = datetime.utcnow() - timedelta(days=30)
-        security_logs = db['security_logs']
-        resultado = security_logs.delete_many({'timestamp': {'$lt': fecha_limite}})
+    Ejecuta ahora las tareas de mantenimiento
 
-        print(f"Logs de seguridad limpiados: {resultado.deleted_count}")
-
-        # Desbloquear cuentas con bloqueo expirado
-        usuarios_collection = db['usuarios']
-        resultado_usuarios = usuarios_collection.update_many(
-            {'bloqueado_hasta': {'$lt': datetime.utcnow()}},
-            {'$unset': {'bloqueado_hasta': ''}, '$set': {'intentos_fallidos': 0}}
-        )
-
-        print(f"Cuentas desbloqueadas: {resultado_usuarios.modified_count}")
-
-        return True
-
-    except Exception as e:
-        print(f"Error en limpieza: {e}")
-        return False
+    Los logs de seguridad antiguos los elimina el índice TTL, los bloqueos
+    por intentos fallidos vencen solos en el limitador de login y el resto
+    corre periódicamente en funciones.mantenimiento_functions; se conserva
+    para ejecuciones manuales.
+    """
+    from funciones.mantenimiento_functions import TAREAS, ejecutar_tarea
+
+    exito = True
+    for nombre in TAREAS:
+        estado = ejecutar_tarea(nombre)
+        if estado['error']:
+            print(f"Error en limpieza ({nombre}): {estado['error']}")
+            exito = False
+        else:
+            print(f"{nombre}: {estado['resultado']}")
+    return exito
 
 
 def get_user_from_token():
@@ -816,6 +1349,10 @@ def get_user_from_token():
     try:
         from flask import request
 
+        # El middleware ya verificó el token de esta request
+        if hasattr(request, 'user_data'):
+            return request.user_data
+
         # Obtener token del header Authorization
         auth_header = request.headers.get('Authorization')
         if not auth_header:
@@ -0,0 +1,236 @@
+"""
+Funciones de Búsqueda
+Búsqueda de personal por prefijo sobre términos normalizados (sin tildes ni
+mayúsculas) guardados en el campo 'busqueda' de moderadores y obreros, y de
+mensajes con el índice de texto en español de 'mensajes.mensaje'
+"""
+
+import re
+import logging
+import unicodedata
+from flask import request, jsonify
+from pymongo import UpdateOne
+from funciones.database_functions import get_db
+from funciones.chat_functions import parse_limite, serializar_mensaje, PROYECCION_MENSAJE
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Resultados por página y consultas aceptadas
+BUSQUEDA_LIMITE_DEFECTO = 20
+BUSQUEDA_LIMITE_MAXIMO = 100
+BUSQUEDA_MINIMO_CARACTERES = 2
+BUSQUEDA_MAXIMO_TERMINOS = 5
+
+# El personal se ordena por relevancia en el servidor sobre este máximo de
+# coincidencias por colección, tomadas en orden de apellidos, nombre y _id
+BUSQUEDA_CANDIDATOS_MAXIMO = 500
+ORDEN_CANDIDATOS = [("apellidos", 1), ("nombre", 1), ("_id", 1)]
+
+# Campos del personal incluidos en 'busqueda' y devueltos en los resultados
+CAMPOS_BUSQUEDA = ('nombre', 'apellidos', 'cedula', 'email')
+PROYECCION_PERSONAL = {"nombre": 1, "apellidos": 1, "cedula": 1, "email": 1, "activo": 1, "busqueda": 1}
+
+COLECCIONES_PERSONAL = {'moderador': 'moderadores', 'obrero': 'obreros'}
+TIPOS_PERSONA = {'personal': ['moderador', 'obrero'], 'moderadores': ['moderador'], 'obreros': ['obrero']}
+
+# Tipos de búsqueda y quién puede usarlos (los obreros no ven datos del personal)
+TIPOS_BUSQUEDA = {
+    'personal': ('admin', 'moderador'),
+    'moderadores': ('admin', 'moderador'),
+    'obreros': ('admin', 'moderador'),
+    'mensajes': ('admin', 'moderador', 'obrero')
+}
+
+# Documento de 'contadores' que marca el backfill como hecho
+CLAVE_INICIALIZACION = "busqueda"
+
+# ==================== NORMALIZACIÓN ====================
+
+def normalizar_texto(texto):
+    """Minúsculas y sin tildes: 'José Peña' -> 'jose pena'"""
+    descompuesto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().strip()
+
+def terminos_busqueda(texto):
+    """Palabras normalizadas de un texto (letras y dígitos)"""
+    return [t for t in re.split(r'[^a-z0-9]+', normalizar_texto(texto)) if t]
+
+def tokens_busqueda(persona):
+    """
+    Valor del campo 'busqueda' de una persona
+
+    Cada palabra de nombre y apellidos, la cédula, el email completo y las
+    palabras antes de la @, para buscar por el inicio de cualquiera de ellos.
+    """
+    tokens = set()
+    for campo in ('nombre', 'apellidos', 'cedula'):
+        tokens.update(terminos_busqueda(persona.get(campo)))
+    email = normalizar_texto(persona.get('email'))
+    if email:
+        tokens.add(email)
+        tokens.update(terminos_busqueda(email.split('@')[0]))
+    return sorted(tokens)
+
+def filtro_personal(q):
+    """Filtro para que cada término de 'q' sea el inicio de algún token (recorre el índice de 'busqueda')"""
+    terminos = terminos_busqueda(q)[:BUSQUEDA_MAXIMO_TERMINOS]
+    if not terminos:
+        return {}
+    return {"$and": [{"busqueda": {"$regex": f"^{re.escape(t)}"}} for t in terminos]}
+
+def inicializar_busqueda():
+    """Calcular 'busqueda' del personal existente (una sola vez)"""
+    db = get_db()
+    if db is None:
+        return False
+    try:
+        if db.contadores.find_one({"_id": CLAVE_INICIALIZACION, "inicializado": True}):
+            return True
+
+        total = 0
+        campos = {campo: 1 for campo in CAMPOS_BUSQUEDA}
+        for coleccion in COLECCIONES_PERSONAL.values():
+            operaciones = [
+                UpdateOne({"_id": persona["_id"]}, {"$set": {"busqueda": tokens_busqueda(persona)}})
+                for persona in db[coleccion].find({}, campos)
+            ]
+            if operaciones:
+                db[coleccion].bulk_write(operaciones, ordered=False)
+                total += len(operaciones)
+
+        db.contadores.update_one(
+            {"_id": CLAVE_INICIALIZACION},
+            {"$set": {"inicializado": True, "total": total}},
+            upsert=True
+        )
+        logger.info(f"Términos de búsqueda calculados para {total} personas")
+        return True
+    except Exception as e:
+        logger.error(f"Error inicializando búsqueda: {e}")
+        return False
+
+# ==================== BÚSQUEDA ====================
+
+def _puntaje(tokens, terminos):
+    """Relevancia: 2 por término igual a un token, 1 si solo es su inicio"""
+    puntaje = 0
+    for termino in terminos:
+        if termino in tokens:
+            puntaje += 2
+        elif any(token.startswith(termino) for token in tokens):
+            puntaje += 1
+    return puntaje
+
+def buscar_personal(q, tipos, inicio, limite):
+    """
+    Personal cuyo nombre, apellidos, cédula o email empiezan por los términos de 'q'
+
+    Solo se ordenan por relevancia los primeros BUSQUEDA_CANDIDATOS_MAXIMO de
+    cada colección (en orden alfabético); el total y las páginas se limitan a
+    ellos y 'total_coincidencias' indica cuántos hay en realidad.
+
+    Returns:
+        tuple: (resultados de la página, total ordenado, total de coincidencias)
+    """
+    db = get_db()
+    terminos = terminos_busqueda(q)[:BUSQUEDA_MAXIMO_TERMINOS]
+    filtro = filtro_personal(q)
+
+    candidatos = []
+    coincidencias = 0
+    for tipo in tipos:
+        coleccion = COLECCIONES_PERSONAL[tipo]
+        encontrados = list(
+            db[coleccion].find(filtro, PROYECCION_PERSONAL)
+            .sort(ORDEN_CANDIDATOS)
+            .limit(BUSQUEDA_CANDIDATOS_MAXIMO)
+        )
+        coincidencias += (
+            len(encontrados) if len(encontrados) < BUSQUEDA_CANDIDATOS_MAXIMO
+            else db[coleccion].count_documents(filtro)
+        )
+        for persona in encontrados:
+            persona["tipo"] = tipo
+            persona["puntaje"] = _puntaje(set(persona.pop("busqueda", [])), terminos)
+            persona["_id"] = str(persona["_id"])
+            candidatos.append(persona)
+
+    candidatos.sort(key=lambda p: (-p["puntaje"], p.get("apellidos", ""), p.get("nombre", ""), p["_id"]))
+    return candidatos[inicio:inicio + limite], len(candidatos), coincidencias
+
+def buscar_mensajes(q, canal, inicio, limite):
+    """
+    Mensajes que contienen los términos de 'q' (índice de texto en español:
+    sin distinguir tildes y con raíces, 'limpiezas' encuentra 'limpieza')
+
+    Returns:
+        tuple: (resultados de la página, total, total de coincidencias)
+    """
+    db = get_db()
+    filtro = {"$text": {"$search": q}}
+    if canal:
+        filtro["canal"] = canal
+
+    proyeccion = {**PROYECCION_MENSAJE, "puntaje": {"$meta": "textScore"}}
+    mensajes = list(
+        db.mensajes.find(filtro, proyeccion)
+        .sort([("puntaje", {"$meta": "textScore"}), ("timestamp", -1)])
+        .skip(inicio)
+        .limit(limite)
+    )
+    total = db.mensajes.count_documents(filtro)
+    return [serializar_mensaje(mensaje) for mensaje in mensajes], total, total
+
+def api_busqueda():
+    """
+    Buscar personal o mensajes
+
+    Parámetros: q (obligatorio), tipo (personal, moderadores, obreros o
+    mensajes), canal (solo mensajes), page y limit.
+    """
+    try:
+        q = request.args.get('q', '').strip()
+        if len(normalizar_texto(q)) < BUSQUEDA_MINIMO_CARACTERES:
+            return jsonify({"error": f"La búsqueda debe tener al menos {BUSQUEDA_MINIMO_CARACTERES} caracteres"}), 400
+
+        tipo_usuario = request.user_data.get('tipo_usuario')
+        tipo = request.args.get('tipo', '').strip().lower()
+        if not tipo:
+            tipo = 'personal' if tipo_usuario in TIPOS_BUSQUEDA['personal'] else 'mensajes'
+        if tipo not in TIPOS_BUSQUEDA:
+            return jsonify({"error": f"Tipo de búsqueda inválido. Use: {', '.join(TIPOS_BUSQUEDA)}"}), 400
+        if tipo_usuario not in TIPOS_BUSQUEDA[tipo]:
+            return jsonify({"error": "No tiene permisos para esta búsqueda"}), 403
+
+        try:
+            pagina = int(request.args.get('page') or 1)
+        except ValueError:
+            return jsonify({"error": "El parámetro page debe ser un número entero"}), 400
+        if pagina < 1:
+            return jsonify({"error": "El parámetro page debe ser mayor que 0"}), 400
+        limite, error = parse_limite(request.args.get('limit'), BUSQUEDA_LIMITE_DEFECTO, BUSQUEDA_LIMITE_MAXIMO)
+        if error:
+            return jsonify({"error": error}), 400
+        inicio = (pagina - 1) * limite
+
+        if tipo == 'mensajes':
+            resultados, total, coincidencias = buscar_mensajes(q, request.args.get('canal', '').strip(), inicio, limite)
+        else:
+            resultados, total, coincidencias = buscar_personal(q, TIPOS_PERSONA[tipo], inicio, limite)
+
+        return jsonify({
+            "success": True,
+            "q": q,
+            "tipo": tipo,
+            "resultados": resultados,
+            "count": len(resultados),
+            "total": total,
+            "total_coincidencias": coincidencias,
+            "page": pagina,
+            "limit": limite,
+            "pages": (total + limite - 1) // limite
+        })
+    except Exception as e:
+        logger.error(f"Error en búsqueda: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
@@ -0,0 +1,106 @@
+"""
+Funciones de Caché HTTP
+Versiones por colección/canal mantenidas en cada escritura y GET condicional con ETag/304
+"""
+
+import hashlib
+import logging
+import threading
+from functools import wraps
+from flask import request, make_response
+from funciones.database_functions import siguiente_secuencia, obtener_secuencia
+from funciones.eventos_functions import get_broadcaster, registrar_oyente_invalidacion
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Versiones leídas de 'contadores'; solo se usan si el broadcaster propaga invalidaciones
+_versiones = {}
+_generacion = 0
+_lock = threading.Lock()
+
+def clave_version(coleccion):
+    """Clave del contador de versión de una colección en 'contadores'"""
+    return f"version:{coleccion}"
+
+def incrementar_version(coleccion):
+    """Registrar una escritura en la colección (invalida sus ETags)"""
+    try:
+        return siguiente_secuencia(clave_version(coleccion))
+    except Exception as e:
+        logger.error(f"Error incrementando versión de '{coleccion}': {e}")
+        return None
+
+def obtener_version(clave):
+    """Versión actual de un contador; en memoria si los cambios de otros workers llegan por el broadcaster"""
+    global _generacion
+    usar_cache = get_broadcaster().propaga_invalidaciones()
+    if usar_cache:
+        with _lock:
+            if clave in _versiones:
+                return _versiones[clave]
+            generacion = _generacion
+
+    version = obtener_secuencia(clave)
+
+    if usar_cache:
+        with _lock:
+            # Si llegó una invalidación durante la lectura, no guardar un valor quizá viejo
+            if generacion == _generacion:
+                _versiones[clave] = version
+    return version
+
+def _invalidar_versiones(coleccion, clave):
+    """Oyente del broadcaster: descartar versiones cacheadas cuando cambia 'contadores'"""
+    global _generacion
+    if coleccion not in ("contadores", None):
+        return
+    with _lock:
+        _generacion += 1
+        if clave is None:
+            _versiones.clear()
+        else:
+            _versiones.pop(clave, None)
+
+registrar_oyente_invalidacion(_invalidar_versiones)
+
+def calcular_etag(claves):
+    """ETag fuerte a partir de las versiones de 'claves', la ruta y los parámetros de la consulta"""
+    partes = [f"{clave}={obtener_version(clave)}" for clave in claves]
+    partes.append(request.path)
+    partes.append(request.query_string.decode('utf-8', errors='ignore'))
+    return hashlib.sha1("|".join(partes).encode('utf-8')).hexdigest()[:24]
+
+def con_etag(obtener_claves):
+    """
+    Decorator para GET condicionales
+
+    Calcula el ETag antes de construir la respuesta; si coincide con
+    If-None-Match responde 304 sin consultar ni serializar los datos.
+
+    Args:
+        obtener_claves (callable): Recibe los argumentos de la vista y retorna
+            la lista de claves de versión de las que depende la respuesta
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            try:
+                etag = calcular_etag(obtener_claves(*args, **kwargs))
+            except Exception as e:
+                logger.error(f"Error calculando ETag: {e}")
+                return f(*args, **kwargs)
+
+            if request.if_none_match.contains(etag):
+                respuesta = make_response('', 304)
+                respuesta.set_etag(etag)
+                return respuesta
+
+            respuesta = make_response(f(*args, **kwargs))
+            # La vista puede marcar la respuesta como no cacheable (no-store)
+            if respuesta.status_code == 200 and 'no-store' not in respuesta.headers.get('Cache-Control', ''):
+                respuesta.set_etag(etag)
+                respuesta.headers['Cache-Control'] = 'private, no-cache'
+            return respuesta
+        return wrapper
+    return decorator
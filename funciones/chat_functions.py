@@ -3,18 +3,73 @@ Funciones de Chat
 Maneja todas las operaciones relacionadas con canales, mensajes y validaciones
 """
 
+import os
 import re
+import time
+import queue
+import base64
 import logging
-from datetime import datetime
-from flask import request, jsonify
-from pymongo.errors import WriteConcernError, OperationFailure
+from collections import deque
+from datetime import datetime, timedelta
+from flask import request, jsonify, Response, stream_with_context, current_app
+from pymongo import UpdateOne
+from pymongo.errors import WriteConcernError, OperationFailure, BulkWriteError
 from bson import ObjectId
 from bson.errors import InvalidId
-from funciones.database_functions import get_db
+from funciones.database_functions import (
+    get_db, siguiente_secuencia, obtener_secuencia, obtener_contador, CLAVE_ESTADISTICAS
+)
+from funciones.eventos_functions import suscribir, desuscribir, publicar_evento, publicar_invalidacion
+from funciones.cache_functions import con_etag, clave_version, incrementar_version
+from funciones.metrics_functions import incrementar
 
 # Logger para este módulo
 logger = logging.getLogger(__name__)
 
+# Paginación de mensajes
+MENSAJES_LIMITE_DEFECTO = 50
+MENSAJES_LIMITE_MAXIMO = 200
+
+# Streaming SSE: comentario keep-alive y duración máxima antes de forzar reconexión
+SSE_HEARTBEAT_SEGUNDOS = int(os.getenv('SSE_HEARTBEAT_SEGUNDOS', '15'))
+SSE_DURACION_MAXIMA_SEGUNDOS = int(os.getenv('SSE_DURACION_MAXIMA_SEGUNDOS', '600'))
+
+# Cada stream ocupa un hilo del worker: el máximo debe quedar por debajo de
+# los hilos de gunicorn (--threads) para que el resto de rutas siga atendiendo.
+# Al llegar a él se responde 503 y el cliente sondea con ?since= hasta reintentar.
+SSE_MAXIMO_CONEXIONES = int(os.getenv('SSE_MAXIMO_CONEXIONES', '80'))
+SSE_REINTENTAR_SEGUNDOS = int(os.getenv('SSE_REINTENTAR_SEGUNDOS', '30'))
+
+# Secuencias entregadas que recuerda cada stream para descartar repetidas
+SSE_ENTREGAS_RECORDADAS = int(os.getenv('SSE_ENTREGAS_RECORDADAS', '1000'))
+
+# La secuencia se asigna antes de escribir el documento: dos escrituras
+# concurrentes pueden confirmarse en otro orden. Una secuencia asignada hace
+# más de este margen se da por escrita y solo entonces el cursor la supera.
+CAMBIOS_MARGEN_SEGUNDOS = float(os.getenv('CAMBIOS_MARGEN_SEGUNDOS', '5'))
+
+# Estados de entrega de un mensaje
+ESTADOS_MENSAJE = ['enviado', 'entregado', 'leido', 'editado']
+
+# Orden de entrega para las actualizaciones en lote: solo avanzan, nunca
+# devuelven un mensaje a un estado anterior. 'editado' marca una edición, no
+# la entrega: cuenta como 'enviado' y no se asigna en lote.
+ORDEN_ENTREGA = {'enviado': 0, 'editado': 0, 'entregado': 1, 'leido': 2}
+ESTADOS_LOTE = ['enviado', 'entregado', 'leido']
+
+# Máximo de mensajes por actualización de estado en lote
+ESTADO_LOTE_MAXIMO = int(os.getenv('ESTADO_LOTE_MAXIMO', '500'))
+
+# Campos devueltos al listar mensajes
+PROYECCION_MENSAJE = {
+    "_id": 1, "canal": 1, "mensaje": 1, "usuario": 1,
+    "timestamp": 1, "estado": 1, "editado": 1, "fecha_edicion": 1, "seq": 1
+}
+
+# Campos de actividad mantenidos en cada canal; los listados de /canales no los
+# incluyen porque cambian con cada mensaje y su ETag depende solo de version:canales
+PROYECCION_CANAL = {"_id": 0, "total_mensajes": 0, "ultimo_mensaje_id": 0, "ultimo_mensaje_timestamp": 0}
+
 # ==================== FUNCIONES DE VALIDACIÓN ====================
 
 def validate_canal_data(datos):
@@ -55,6 +110,224 @@ def validate_object_id(id_string):
     except (InvalidId, TypeError):
         return None
 
+# ==================== FUNCIONES DE PAGINACIÓN ====================
+
+def codificar_cursor(timestamp, mensaje_id):
+    """Codificar cursor opaco (timestamp + _id) para paginar mensajes"""
+    if not isinstance(timestamp, datetime):
+        return None
+    crudo = f"{timestamp.isoformat()}|{mensaje_id}"
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor):
+    """Decodificar cursor de paginación - retorna (timestamp, ObjectId) o (None, None)"""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        fecha_str, id_str = crudo.split('|', 1)
+        return datetime.fromisoformat(fecha_str), ObjectId(id_str)
+    except (ValueError, TypeError, InvalidId):
+        return None, None
+
+def parse_limite(valor, defecto=MENSAJES_LIMITE_DEFECTO, maximo=MENSAJES_LIMITE_MAXIMO):
+    """Validar parámetro limit - retorna (limite, error)"""
+    if valor is None or valor == '':
+        return defecto, None
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return None, "El parámetro limit debe ser un número entero"
+    if limite < 1:
+        return None, "El parámetro limit debe ser mayor que 0"
+    return min(limite, maximo), None
+
+def corte_cambios():
+    """Instante hasta el cual toda secuencia asignada se considera ya escrita"""
+    return datetime.utcnow() - timedelta(seconds=CAMBIOS_MARGEN_SEGUNDOS)
+
+def secuencia_asentada(fecha, corte):
+    """True si la secuencia se asignó antes del corte (sin fecha: escrita antes de registrarla)"""
+    return fecha is None or fecha <= corte
+
+def cursor_estable(db, canal, corte):
+    """Mayor secuencia tal que ninguna escritura pendiente puede quedar por debajo
+
+    Si el contador del canal no cambió desde el corte es su valor; si no, la
+    mayor secuencia asentada de mensajes y marcas de eliminación (las menores
+    se asignaron antes y ya están escritas).
+    """
+    contador = obtener_contador(clave_secuencia_canal(canal))
+    if secuencia_asentada(contador.get("actualizado"), corte):
+        return contador.get("seq", 0)
+    filtro = {"canal": canal, "seq_fecha": {"$not": {"$gt": corte}}}
+    estable = 0
+    for coleccion in (db.mensajes, db.mensajes_eliminados):
+        documento = coleccion.find_one(filtro, {"seq": 1}, sort=[("seq", -1)])
+        if documento:
+            estable = max(estable, documento.get("seq", 0))
+    return estable
+
+def sin_cache_si_pendiente(respuesta, canal, cursor):
+    """Sin ETag mientras el cursor no alcance al contador: un 304 ocultaría la escritura pendiente"""
+    if cursor < obtener_secuencia(clave_secuencia_canal(canal)):
+        respuesta.headers['Cache-Control'] = 'no-store'
+    return respuesta
+
+def clave_secuencia_canal(canal):
+    """Clave del contador de cambios de un canal en la colección 'contadores'"""
+    return f"mensajes:{canal}"
+
+def parse_cursor_cambios(valor):
+    """Validar cursor incremental (?since=) - retorna (secuencia, error)"""
+    try:
+        secuencia = int(valor)
+    except (TypeError, ValueError):
+        return None, "El parámetro since debe ser un cursor numérico"
+    if secuencia < 0:
+        return None, "El parámetro since no puede ser negativo"
+    return secuencia, None
+
+def serializar_mensaje(mensaje):
+    """Convertir documento de mensaje a formato JSON con campos por defecto"""
+    mensaje.pop("seq_fecha", None)
+    mensaje["cursor"] = codificar_cursor(mensaje.get("timestamp"), mensaje["_id"])
+    mensaje["_id"] = str(mensaje["_id"])
+    mensaje["estado"] = mensaje.get("estado", "enviado")
+    mensaje["editado"] = mensaje.get("editado", False)
+    mensaje["fecha_edicion"] = mensaje.get("fecha_edicion")
+    return mensaje
+
+# ==================== CONTADORES DE ACTIVIDAD ====================
+
+def campos_ultimo_mensaje(mensaje_id, timestamp, canal=None):
+    """Campos del último mensaje para el documento del canal o de estadísticas"""
+    campos = {"ultimo_mensaje_id": mensaje_id, "ultimo_mensaje_timestamp": timestamp}
+    if canal is not None:
+        campos["ultimo_mensaje_canal"] = canal
+    return campos
+
+def _sumar_mensaje(coleccion, filtro, campo_total, ultimo, upsert=False):
+    """Sumar un mensaje al total y registrarlo como último si es el más reciente
+
+    Una sola escritura condicional por documento: si ya hay un último mensaje
+    más reciente (escritura concurrente) solo se incrementa el total.
+    """
+    resultado = coleccion.update_one(
+        {**filtro, "$or": [
+            {"ultimo_mensaje_timestamp": {"$lt": ultimo["ultimo_mensaje_timestamp"]}},
+            {"ultimo_mensaje_timestamp": None}
+        ]},
+        {"$inc": {campo_total: 1}, "$set": ultimo}
+    )
+    if resultado.matched_count == 0:
+        coleccion.update_one(filtro, {"$inc": {campo_total: 1}}, upsert=upsert)
+
+def _recalcular_ultimo_global(db, filtro):
+    """Tomar como último mensaje global el más reciente según los contadores de cada canal"""
+    canal = db.canales.find_one(
+        {"ultimo_mensaje_timestamp": {"$ne": None}},
+        {"nombre": 1, "ultimo_mensaje_id": 1, "ultimo_mensaje_timestamp": 1},
+        sort=[("ultimo_mensaje_timestamp", -1)]
+    )
+    if canal:
+        ultimo = campos_ultimo_mensaje(canal["ultimo_mensaje_id"], canal["ultimo_mensaje_timestamp"], canal["nombre"])
+    else:
+        ultimo = campos_ultimo_mensaje(None, None, None)
+    db.contadores.update_one({"_id": CLAVE_ESTADISTICAS, **filtro}, {"$set": ultimo})
+
+def registrar_mensaje_nuevo(db, canal, mensaje_id, timestamp):
+    """Actualizar contadores del canal y globales tras insertar un mensaje"""
+    _sumar_mensaje(db.canales, {"nombre": canal}, "total_mensajes",
+                   campos_ultimo_mensaje(mensaje_id, timestamp))
+    _sumar_mensaje(db.contadores, {"_id": CLAVE_ESTADISTICAS}, "mensajes",
+                   campos_ultimo_mensaje(mensaje_id, timestamp, canal), upsert=True)
+
+def registrar_mensaje_eliminado(db, canal, mensaje_id):
+    """Actualizar contadores del canal y globales tras eliminar un mensaje"""
+    antes = db.canales.find_one_and_update(
+        {"nombre": canal}, {"$inc": {"total_mensajes": -1}},
+        projection={"ultimo_mensaje_id": 1}
+    )
+    if antes and antes.get("ultimo_mensaje_id") == mensaje_id:
+        # Era el último del canal: pasa a serlo el anterior (índice canal, timestamp, _id)
+        anterior = db.mensajes.find_one(
+            {"canal": canal}, {"_id": 1, "timestamp": 1},
+            sort=[("timestamp", -1), ("_id", -1)]
+        )
+        db.canales.update_one(
+            {"nombre": canal, "ultimo_mensaje_id": mensaje_id},
+            {"$set": campos_ultimo_mensaje(anterior["_id"], anterior["timestamp"]) if anterior
+                     else campos_ultimo_mensaje(None, None)}
+        )
+
+    antes = db.contadores.find_one_and_update(
+        {"_id": CLAVE_ESTADISTICAS}, {"$inc": {"mensajes": -1}},
+        projection={"ultimo_mensaje_id": 1}
+    )
+    if antes and antes.get("ultimo_mensaje_id") == mensaje_id:
+        _recalcular_ultimo_global(db, {"ultimo_mensaje_id": mensaje_id})
+
+def registrar_canal_eliminado(db, canal, mensajes_eliminados):
+    """Descontar el canal y sus mensajes de las estadísticas globales"""
+    antes = db.contadores.find_one_and_update(
+        {"_id": CLAVE_ESTADISTICAS},
+        {"$inc": {"canales": -1, "mensajes": -mensajes_eliminados}},
+        projection={"ultimo_mensaje_canal": 1}
+    )
+    if antes and antes.get("ultimo_mensaje_canal") == canal:
+        _recalcular_ultimo_global(db, {"ultimo_mensaje_canal": canal})
+
+def inicializar_contadores_actividad():
+    """Calcular los contadores a partir de los datos existentes (una sola vez)
+
+    Se ejecuta al arrancar; las escrituras posteriores los mantienen. Las
+    estadísticas quedan marcadas como inicializadas para no repetirlo.
+    """
+    db = get_db()
+    if db is None:
+        return False
+    try:
+        if db.contadores.find_one({"_id": CLAVE_ESTADISTICAS, "inicializado": True}):
+            return True
+
+        # Recorre el índice (canal, timestamp, _id): el primero de cada grupo es el último mensaje
+        grupos = db.mensajes.aggregate([
+            {"$sort": {"canal": 1, "timestamp": -1, "_id": -1}},
+            {"$group": {
+                "_id": "$canal",
+                "total": {"$sum": 1},
+                "ultimo_id": {"$first": "$_id"},
+                "ultimo_timestamp": {"$first": "$timestamp"}
+            }}
+        ])
+        por_canal = {grupo["_id"]: grupo for grupo in grupos}
+
+        for canal in db.canales.find({}, {"nombre": 1}):
+            grupo = por_canal.get(canal["nombre"])
+            db.canales.update_one({"_id": canal["_id"]}, {"$set": {
+                "total_mensajes": grupo["total"] if grupo else 0,
+                **campos_ultimo_mensaje(grupo["ultimo_id"] if grupo else None,
+                                        grupo["ultimo_timestamp"] if grupo else None)
+            }})
+
+        ultimo = max(
+            (g for g in por_canal.values() if isinstance(g.get("ultimo_timestamp"), datetime)),
+            key=lambda g: g["ultimo_timestamp"], default=None
+        )
+        db.contadores.update_one({"_id": CLAVE_ESTADISTICAS}, {"$set": {
+            "canales": db.canales.count_documents({}),
+            "mensajes": sum(g["total"] for g in por_canal.values()),
+            **campos_ultimo_mensaje(ultimo["ultimo_id"] if ultimo else None,
+                                    ultimo["ultimo_timestamp"] if ultimo else None,
+                                    ultimo["_id"] if ultimo else None),
+            "inicializado": True
+        }}, upsert=True)
+        logger.info(f"Contadores de actividad inicializados: {len(por_canal)} canales con mensajes")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error inicializando contadores de actividad: {e}")
+        return False
+
 # ==================== FUNCIONES DE CANALES ====================
 
 def crear_canal():
@@ -84,8 +357,13 @@ def crear_canal():
             "nombre": datos_validados["nombre"],
             "descripcion": datos_validados["descripcion"],
             "creado": datetime.now(),
-            "activo": True
+            "activo": True,
+            "total_mensajes": 0,
+            **campos_ultimo_mensaje(None, None)
         })
+        db.contadores.update_one({"_id": CLAVE_ESTADISTICAS}, {"$inc": {"canales": 1}}, upsert=True)
+        incrementar_version("canales")
+        publicar_invalidacion("canales", datos_validados["nombre"])
         
         return jsonify({
             "mensaje": f"Canal '{datos_validados['nombre']}' creado exitosamente",
@@ -101,6 +379,7 @@ def crear_canal():
         logger.error(f"Error crear_canal: {e}")
         return jsonify({"error": "Error interno del servidor"}), 500
 
+@con_etag(lambda: [clave_version("canales")])
 def listar_canales():
     """Listar todos los canales"""
     try:
@@ -108,7 +387,7 @@ def listar_canales():
         if db is None:
             return jsonify({"error": "Base de datos no disponible"}), 500
         
-        canales = list(db.canales.find({}, {"_id": 0}))
+        canales = list(db.canales.find({}, PROYECCION_CANAL))
         return jsonify({"canales": canales})
         
     except Exception as e:
@@ -145,7 +424,9 @@ def obtener_canal(nombre):
             "nombre": canal.get('nombre', ''),
             "descripcion": canal.get('descripcion', 'Sin descripción'),
             "fecha_creacion": format_date(canal.get('creado', '')),
-            "activo": canal.get('activo', True)
+            "activo": canal.get('activo', True),
+            "total_mensajes": canal.get('total_mensajes', 0),
+            "ultima_actividad": format_date(canal.get('ultimo_mensaje_timestamp') or canal.get('creado', ''))
         }), 200
         
     except Exception as e:
@@ -214,6 +495,31 @@ def editar_canal(nombre):
                 {"$set": {"canal": nuevo_nombre}}
             )
             mensajes_actualizados = resultado_mensajes.modified_count
+            db.mensajes_eliminados.update_many(
+                {"canal": nombre_actual},
+                {"$set": {"canal": nuevo_nombre}}
+            )
+            db.lecturas.update_many(
+                {"canal": nombre_actual},
+                {"$set": {"canal": nuevo_nombre}}
+            )
+            db.contadores.update_one(
+                {"_id": CLAVE_ESTADISTICAS, "ultimo_mensaje_canal": nombre_actual},
+                {"$set": {"ultimo_mensaje_canal": nuevo_nombre}}
+            )
+            # El contador del nuevo nombre continúa desde el anterior para no repetir secuencias
+            db.contadores.update_one(
+                {"_id": clave_secuencia_canal(nuevo_nombre)},
+                {"$max": {"seq": obtener_secuencia(clave_secuencia_canal(nombre_actual))}},
+                upsert=True
+            )
+            # Avanzar ambos contadores invalida los ETags de los dos listados
+            siguiente_secuencia(clave_secuencia_canal(nombre_actual))
+            siguiente_secuencia(clave_secuencia_canal(nuevo_nombre))
+            publicar_invalidacion("mensajes", nombre_actual)
+            publicar_invalidacion("mensajes", nuevo_nombre)
+        incrementar_version("canales")
+        publicar_invalidacion("canales", nuevo_nombre)
         
         return jsonify({
             "mensaje": "Canal actualizado exitosamente",
@@ -252,10 +558,18 @@ def eliminar_canal(nombre):
         
         # Eliminar mensajes y canal
         resultado_mensajes = db.mensajes.delete_many({"canal": nombre_canal})
+        db.mensajes_eliminados.delete_many({"canal": nombre_canal})
+        db.lecturas.delete_many({"canal": nombre_canal})
         resultado_canal = db.canales.delete_one({"nombre": nombre_canal})
         
         if resultado_canal.deleted_count == 0:
             return jsonify({"error": "No se pudo eliminar el canal"}), 500
+
+        registrar_canal_eliminado(db, nombre_canal, resultado_mensajes.deleted_count)
+        siguiente_secuencia(clave_secuencia_canal(nombre_canal))
+        incrementar_version("canales")
+        publicar_invalidacion("canales", nombre_canal)
+        publicar_invalidacion("mensajes", nombre_canal)
         
         return jsonify({
             "mensaje": f"Canal '{nombre_canal}' eliminado exitosamente",
@@ -289,18 +603,30 @@ def enviar_mensaje():
         if error:
             return jsonify({"error": error}), 400
         
+        # BSON guarda milisegundos: truncar para que el cursor del evento coincida con el almacenado
+        ahora = datetime.now()
+        ahora = ahora.replace(microsecond=ahora.microsecond // 1000 * 1000)
+
         # NUEVO: Estructura mejorada con estados
         documento_mensaje = {
             "canal": datos['canal'],
+            "seq": siguiente_secuencia(clave_secuencia_canal(datos['canal'])),
+            "seq_fecha": datetime.utcnow(),
             "mensaje": datos_mensaje['mensaje'],
             "usuario": datos.get('usuario', 'Anónimo'),
-            "timestamp": datetime.now(),
+            "timestamp": ahora,
             "estado": "enviado",        # NUEVO: Estado inicial
             "editado": False,           # NUEVO: Flag de edición
             "fecha_edicion": None       # NUEVO: Fecha de última edición
         }
         
         resultado = db.mensajes.insert_one(documento_mensaje)
+        registrar_mensaje_nuevo(db, documento_mensaje["canal"], resultado.inserted_id, ahora)
+
+        publicar_evento(documento_mensaje["canal"], "mensaje", documento_mensaje["seq"], {
+            "accion": "nuevo",
+            "mensaje": serializar_mensaje(dict(documento_mensaje))
+        })
         
         return jsonify({
             "mensaje": "Mensaje enviado exitosamente",
@@ -313,33 +639,260 @@ def enviar_mensaje():
         logger.error(f"Error enviar mensaje: {e}")
         return jsonify({"error": str(e)}), 500
 
+@con_etag(lambda canal: [clave_secuencia_canal(canal)])
 def obtener_mensajes(canal):
-    """Obtener mensajes de canal - MEJORADO CON ESTADOS"""
+    """Obtener mensajes de canal paginados por cursor (before/after + limit)
+
+    Sin cursor devuelve la página más reciente. Los mensajes siempre se
+    devuelven en orden cronológico; next_cursor permite pedir la página
+    siguiente en la misma dirección.
+    """
     try:
         db = get_db()
         if db is None:
             return jsonify({"error": "Base de datos no disponible"}), 500
-        
-        # NUEVO: Incluir _id para permitir edición/eliminación
-        mensajes = list(db.mensajes.find(
-            {"canal": canal}, 
-            {"_id": 1, "canal": 1, "mensaje": 1, "usuario": 1, 
-             "timestamp": 1, "estado": 1, "editado": 1, "fecha_edicion": 1}
-        ).sort("timestamp", 1))
-        
-        # NUEVO: Convertir ObjectId a string y asegurar campos por defecto
-        for mensaje in mensajes:
-            mensaje["_id"] = str(mensaje["_id"])
-            mensaje["estado"] = mensaje.get("estado", "enviado")
-            mensaje["editado"] = mensaje.get("editado", False)
-            mensaje["fecha_edicion"] = mensaje.get("fecha_edicion")
-        
-        return jsonify({"mensajes": mensajes})
-        
+
+        limite, error = parse_limite(request.args.get('limit'))
+        if error:
+            return jsonify({"error": error}), 400
+
+        since = request.args.get('since', '').strip()
+        if since:
+            return obtener_cambios_mensajes(db, canal, since, limite)
+
+        # Calcular el cursor antes de consultar: un cambio concurrente se reenvía, nunca se pierde
+        cursor_cambios = cursor_estable(db, canal, corte_cambios())
+
+        before = request.args.get('before', '').strip()
+        after = request.args.get('after', '').strip()
+        if before and after:
+            return jsonify({"error": "Use solo uno de los parámetros before o after"}), 400
+
+        filtro = {"canal": canal}
+        hacia_adelante = bool(after)
+        cursor = after or before
+        if cursor:
+            cursor_ts, cursor_id = decodificar_cursor(cursor)
+            if cursor_ts is None:
+                return jsonify({"error": "Cursor inválido"}), 400
+            # Rango sobre el índice (canal, timestamp, _id); _id desempata timestamps iguales
+            op = "$gt" if hacia_adelante else "$lt"
+            filtro["timestamp"] = {"$gte" if hacia_adelante else "$lte": cursor_ts}
+            filtro["$or"] = [{"timestamp": {op: cursor_ts}}, {"_id": {op: cursor_id}}]
+
+        direccion = 1 if hacia_adelante else -1
+        mensajes = list(db.mensajes.find(filtro, PROYECCION_MENSAJE)
+                        .sort([("timestamp", direccion), ("_id", direccion)])
+                        .limit(limite + 1))
+
+        hay_mas = len(mensajes) > limite
+        mensajes = mensajes[:limite]
+        if not hacia_adelante:
+            mensajes.reverse()
+
+        mensajes = [serializar_mensaje(mensaje) for mensaje in mensajes]
+
+        next_cursor = None
+        if hay_mas and mensajes:
+            # Hacia atrás se continúa desde el más antiguo; hacia adelante desde el más nuevo
+            next_cursor = mensajes[-1]["cursor"] if hacia_adelante else mensajes[0]["cursor"]
+
+        return sin_cache_si_pendiente(jsonify({
+            "mensajes": mensajes,
+            "next_cursor": next_cursor,
+            "has_more": hay_mas,
+            "limit": limite,
+            "cursor_cambios": str(cursor_cambios)
+        }), canal, cursor_cambios)
+
     except Exception as e:
         logger.error(f"Error obtener mensajes: {e}")
         return jsonify({"error": str(e)}), 500
 
+def consultar_cambios(db, canal, desde, limite):
+    """Cambios del canal con secuencia mayor a 'desde', ordenados por secuencia
+
+    Cada escritura asigna al mensaje la siguiente secuencia del canal, así que
+    la consulta es un rango sobre (canal, seq) y cuesta O(cambios).
+
+    Returns:
+        tuple: (eventos, hay_mas) donde eventos es una lista de
+               ('mensaje', documento) o ('eliminado', marca)
+    """
+    filtro = {"canal": canal, "seq": {"$gt": desde}}
+    cambios = list(db.mensajes.find(
+        filtro, {**PROYECCION_MENSAJE, "seq_fecha": 1}
+    ).sort("seq", 1).limit(limite + 1))
+    eliminados = list(db.mensajes_eliminados.find(
+        filtro, {"_id": 0, "mensaje_id": 1, "seq": 1, "seq_fecha": 1}
+    ).sort("seq", 1).limit(limite + 1))
+
+    # Mezclar ambas listas por secuencia y cortar en el límite
+    eventos = sorted(
+        [("mensaje", m) for m in cambios] + [("eliminado", e) for e in eliminados],
+        key=lambda evento: evento[1]["seq"]
+    )
+    return eventos[:limite], len(eventos) > limite
+
+def obtener_cambios_mensajes(db, canal, since, limite):
+    """Mensajes creados, editados o con cambio de estado y eliminados después de 'since'
+
+    Se devuelven todos los cambios visibles, pero el cursor solo avanza sobre
+    los asentados: los recientes se repiten en el siguiente sondeo (el cliente
+    los deduplica por _id) y una secuencia menor confirmada tarde no se pierde.
+    """
+    desde, error = parse_cursor_cambios(since)
+    if error:
+        return jsonify({"error": error}), 400
+
+    corte = corte_cambios()
+    eventos, hay_mas = consultar_cambios(db, canal, desde, limite)
+
+    cursor = desde
+    for _, documento in eventos:
+        if not secuencia_asentada(documento.get("seq_fecha"), corte):
+            break
+        cursor = documento["seq"]
+    if not hay_mas:
+        # Sin más cambios, el cursor puede alcanzar secuencias sin documento (renombrar, eliminar canal)
+        cursor = max(cursor, cursor_estable(db, canal, corte))
+
+    mensajes = [serializar_mensaje(m) for tipo, m in eventos if tipo == "mensaje"]
+    marcas = [{"_id": e["mensaje_id"], "seq": e["seq"]} for tipo, e in eventos if tipo == "eliminado"]
+
+    return sin_cache_si_pendiente(jsonify({
+        "mensajes": mensajes,
+        "eliminados": marcas,
+        "cursor": str(cursor),
+        "has_more": hay_mas,
+        "limit": limite
+    }), canal, cursor)
+
+def formatear_evento_sse(id_evento, tipo, datos):
+    """Formatear un evento en el protocolo text/event-stream"""
+    return f"id: {id_evento}\nevent: {tipo}\ndata: {current_app.json.dumps(datos)}\n\n"
+
+class EntregasSSE:
+    """
+    Secuencias entregadas por un stream y punto de reanudación (Last-Event-ID)
+
+    Los eventos llegan en orden de confirmación, no de secuencia: uno con
+    secuencia menor puede llegar después. Por eso se descartan solo los ya
+    entregados (no los menores al último) y el id enviado al cliente es
+    'estable': la mayor secuencia entregada hace más de CAMBIOS_MARGEN_SEGUNDOS,
+    cuando las menores ya tuvieron que llegar. Al reconectar se reenvía desde
+    ahí y el cliente descarta por _id lo repetido.
+    """
+
+    def __init__(self, estable):
+        self.estable = estable
+        self._entregadas = set()
+        self._orden = deque()
+        self._recientes = deque()
+
+    def entregada(self, seq):
+        """True si la secuencia ya se envió en este stream"""
+        return seq in self._entregadas
+
+    def registrar(self, seq, antiguedad=0.0):
+        """Anotar una secuencia enviada hace 'antiguedad' segundos y retornar el id estable"""
+        self._entregadas.add(seq)
+        self._orden.append(seq)
+        if len(self._orden) > SSE_ENTREGAS_RECORDADAS:
+            self._entregadas.discard(self._orden.popleft())
+        self._recientes.append((seq, time.monotonic() - antiguedad))
+        return self.avanzar()
+
+    def avanzar(self):
+        """Avanzar el id estable sobre las entregas que ya superaron el margen"""
+        limite = time.monotonic() - CAMBIOS_MARGEN_SEGUNDOS
+        while self._recientes and self._recientes[0][1] <= limite:
+            seq, _ = self._recientes.popleft()
+            self.estable = max(self.estable, seq)
+        return self.estable
+
+def stream_mensajes(canal):
+    """Stream SSE de cambios del canal con reanudación por Last-Event-ID
+
+    Primero se suscribe al hub y luego reenvía desde la BD lo ocurrido
+    después de Last-Event-ID; los eventos en vivo ya reenviados se descartan.
+    Con SSE_MAXIMO_CONEXIONES streams abiertos en el worker responde 503.
+    """
+    try:
+        db = get_db()
+        if db is None:
+            return jsonify({"error": "Base de datos no disponible"}), 500
+
+        ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        desde = None
+        if ultimo_id:
+            desde, error = parse_cursor_cambios(ultimo_id)
+            if error:
+                return jsonify({"error": "Last-Event-ID inválido"}), 400
+
+        cola = suscribir(canal, maximo=SSE_MAXIMO_CONEXIONES)
+        if cola is None:
+            incrementar('sse_rechazados')
+            respuesta = jsonify({
+                "error": "Demasiados streams abiertos, consulte con ?since= y reintente más tarde",
+                "code": "STREAM_SATURADO"
+            })
+            respuesta.status_code = 503
+            respuesta.headers['Retry-After'] = str(SSE_REINTENTAR_SEGUNDOS)
+            return respuesta
+
+        def generar():
+            corte = corte_cambios()
+            entregas = EntregasSSE(desde if desde is not None else cursor_estable(db, canal, corte))
+            fin = time.monotonic() + SSE_DURACION_MAXIMA_SEGUNDOS
+            try:
+                yield f"retry: 3000\n: conectado a {canal}\n\n"
+
+                # Reenviar lo perdido desde la BD
+                if desde is not None:
+                    siguiente = desde
+                    hay_mas = True
+                    while hay_mas:
+                        eventos, hay_mas = consultar_cambios(db, canal, siguiente, MENSAJES_LIMITE_MAXIMO)
+                        for tipo, doc in eventos:
+                            seq = siguiente = doc["seq"]
+                            asentada = secuencia_asentada(doc.get("seq_fecha"), corte)
+                            estable = entregas.registrar(seq, CAMBIOS_MARGEN_SEGUNDOS if asentada else 0.0)
+                            if tipo == "mensaje":
+                                datos = {"accion": "sincronizacion", "mensaje": serializar_mensaje(doc)}
+                                yield formatear_evento_sse(estable, "mensaje", datos)
+                            else:
+                                datos = {"_id": doc["mensaje_id"], "canal": canal}
+                                yield formatear_evento_sse(estable, "mensaje_eliminado", datos)
+
+                # Eventos en vivo
+                while time.monotonic() < fin and not cola.desbordada:
+                    try:
+                        evento = cola.get(timeout=SSE_HEARTBEAT_SEGUNDOS)
+                    except queue.Empty:
+                        # Un bloque con solo id actualiza Last-Event-ID en el cliente
+                        yield f"id: {entregas.avanzar()}\n: ping\n\n"
+                        continue
+                    if entregas.entregada(evento["id"]):
+                        continue
+                    estable = entregas.registrar(evento["id"])
+                    yield formatear_evento_sse(estable, evento["tipo"], evento["datos"])
+            finally:
+                desuscribir(canal, cola)
+
+        respuesta = Response(
+            stream_with_context(generar()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        # Si el cliente se va antes de iterar el generador su 'finally' no corre
+        respuesta.call_on_close(lambda: desuscribir(canal, cola))
+        return respuesta
+
+    except Exception as e:
+        logger.error(f"Error stream canal '{canal}': {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
 def editar_mensaje(mensaje_id):
     """Editar mensaje propio - NUEVO ENDPOINT"""
     try:
@@ -385,18 +938,24 @@ def editar_mensaje(mensaje_id):
             return jsonify({"error": "El mensaje no ha cambiado"}), 400
         
         # Actualizar mensaje
-        resultado = db.mensajes.update_one(
-            {"_id": obj_id},
-            {"$set": {
-                "mensaje": nuevo_mensaje,
-                "editado": True,
-                "fecha_edicion": datetime.now(),
-                "estado": "editado"  # Cambiar estado
-            }}
-        )
+        cambios = {
+            "mensaje": nuevo_mensaje,
+            "editado": True,
+            "fecha_edicion": datetime.now(),
+            "estado": "editado",  # Cambiar estado
+            "seq": siguiente_secuencia(clave_secuencia_canal(mensaje_original.get('canal'))),
+            "seq_fecha": datetime.utcnow()
+        }
+        resultado = db.mensajes.update_one({"_id": obj_id}, {"$set": cambios})
         
         if resultado.modified_count == 0:
             return jsonify({"error": "No se pudo actualizar el mensaje"}), 500
+
+        mensaje_original.update(cambios)
+        publicar_evento(mensaje_original.get('canal'), "mensaje", cambios["seq"], {
+            "accion": "editado",
+            "mensaje": serializar_mensaje(mensaje_original)
+        })
         
         return jsonify({
             "mensaje": "Mensaje editado exitosamente",
@@ -445,6 +1004,21 @@ def eliminar_mensaje(mensaje_id):
         
         if resultado.deleted_count == 0:
             return jsonify({"error": "No se pudo eliminar el mensaje"}), 500
+        registrar_mensaje_eliminado(db, mensaje.get('canal'), obj_id)
+
+        # Marca de eliminación para clientes incrementales (?since=)
+        marca = {
+            "canal": mensaje.get('canal'),
+            "mensaje_id": mensaje_id,
+            "seq": siguiente_secuencia(clave_secuencia_canal(mensaje.get('canal'))),
+            "seq_fecha": datetime.utcnow(),
+            "eliminado_en": datetime.now()
+        }
+        db.mensajes_eliminados.insert_one(marca)
+        publicar_evento(marca["canal"], "mensaje_eliminado", marca["seq"], {
+            "_id": mensaje_id,
+            "canal": marca["canal"]
+        })
         
         return jsonify({
             "mensaje": "Mensaje eliminado exitosamente",
@@ -477,11 +1051,10 @@ def actualizar_estado_mensaje(mensaje_id):
             return jsonify({"error": "No se recibieron datos"}), 400
         
         nuevo_estado = datos.get('estado', '').strip().lower()
-        estados_validos = ['enviado', 'entregado', 'leido', 'editado']
         
-        if nuevo_estado not in estados_validos:
+        if nuevo_estado not in ESTADOS_MENSAJE:
             return jsonify({
-                "error": f"Estado inválido. Estados válidos: {', '.join(estados_validos)}"
+                "error": f"Estado inválido. Estados válidos: {', '.join(ESTADOS_MENSAJE)}"
             }), 400
         
         # Buscar mensaje
@@ -490,25 +1063,164 @@ def actualizar_estado_mensaje(mensaje_id):
             return jsonify({"error": "Mensaje no encontrado"}), 404
         
         # Actualizar estado
-        resultado = db.mensajes.update_one(
-            {"_id": obj_id},
-            {"$set": {
-                "estado": nuevo_estado,
-                "fecha_actualizacion_estado": datetime.now()
-            }}
-        )
+        estado_anterior = mensaje.get('estado', 'enviado')
+        cambios = {
+            "estado": nuevo_estado,
+            "fecha_actualizacion_estado": datetime.now(),
+            "seq": siguiente_secuencia(clave_secuencia_canal(mensaje.get('canal'))),
+            "seq_fecha": datetime.utcnow()
+        }
+        resultado = db.mensajes.update_one({"_id": obj_id}, {"$set": cambios})
         
         if resultado.modified_count == 0:
             return jsonify({"error": "No se pudo actualizar el estado"}), 500
+
+        mensaje.update(cambios)
+        publicar_evento(mensaje.get('canal'), "mensaje", cambios["seq"], {
+            "accion": "estado",
+            "mensaje": serializar_mensaje(mensaje)
+        })
         
         return jsonify({
             "mensaje": "Estado actualizado exitosamente",
             "mensaje_id": mensaje_id,
-            "estado_anterior": mensaje.get('estado', 'enviado'),
+            "estado_anterior": estado_anterior,
             "estado_nuevo": nuevo_estado,
             "timestamp": datetime.now().isoformat()
         }), 200
         
     except Exception as e:
         logger.error(f"Error actualizar estado {mensaje_id}: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+def actualizar_estado_mensajes():
+    """Actualizar el estado de varios mensajes en una sola operación
+
+    Body JSON:
+        estado (str): Nuevo estado para todos los mensajes
+        ids (list): IDs de los mensajes, o bien
+        canal + hasta: todos los mensajes del canal hasta el cursor de
+            paginación 'hasta' (incluido) que aún no llegaron a ese estado
+
+    Los estados solo avanzan (enviado < entregado < leido): un mensaje que ya
+    está en el estado pedido o más adelante queda como 'sin_cambios'. Cada mensaje recibe su propia secuencia de cambios (reservadas en un solo
+    bloque por canal) y todas las escrituras van en un único bulk_write.
+    """
+    try:
+        db = get_db()
+        if db is None:
+            return jsonify({"error": "Base de datos no disponible"}), 500
+
+        if not request.is_json:
+            return jsonify({"error": "Content-Type debe ser application/json"}), 400
+
+        datos = request.get_json()
+        if not datos:
+            return jsonify({"error": "No se recibieron datos"}), 400
+
+        nuevo_estado = str(datos.get('estado', '')).strip().lower()
+        if nuevo_estado not in ESTADOS_LOTE:
+            return jsonify({
+                "error": f"Estado inválido. Estados válidos: {', '.join(ESTADOS_LOTE)}"
+            }), 400
+        rango = ORDEN_ENTREGA[nuevo_estado]
+
+        ids = datos.get('ids')
+        canal = str(datos.get('canal', '')).strip()
+        hasta = str(datos.get('hasta', '')).strip()
+
+        resultados = {}
+        hay_mas = False
+        if ids is not None:
+            if canal or hasta:
+                return jsonify({"error": "Use ids o canal + hasta, no ambos"}), 400
+            if not isinstance(ids, list) or not ids:
+                return jsonify({"error": "ids debe ser una lista no vacía"}), 400
+            if len(ids) > ESTADO_LOTE_MAXIMO:
+                return jsonify({"error": f"Máximo {ESTADO_LOTE_MAXIMO} mensajes por solicitud"}), 400
+
+            obj_ids = []
+            for mensaje_id in ids:
+                obj_id = validate_object_id(mensaje_id)
+                if obj_id is None:
+                    resultados[str(mensaje_id)] = "id_invalido"
+                else:
+                    obj_ids.append(obj_id)
+                    resultados[str(obj_id)] = "no_encontrado"
+
+            mensajes = list(db.mensajes.find({"_id": {"$in": obj_ids}}, PROYECCION_MENSAJE))
+        else:
+            if not canal or not hasta:
+                return jsonify({"error": "Debe indicar ids, o canal y hasta"}), 400
+            hasta_ts, hasta_id = decodificar_cursor(hasta)
+            if hasta_ts is None:
+                return jsonify({"error": "Cursor inválido"}), 400
+
+            # Rango sobre el índice (canal, timestamp, _id), igual que la paginación;
+            # solo los que están antes en el orden de entrega (sin estado = enviado)
+            anteriores = [estado for estado, orden in ORDEN_ENTREGA.items() if orden < rango]
+            if ORDEN_ENTREGA['enviado'] < rango:
+                anteriores.append(None)
+            filtro = {
+                "canal": canal,
+                "timestamp": {"$lte": hasta_ts},
+                "$or": [{"timestamp": {"$lt": hasta_ts}}, {"_id": {"$lte": hasta_id}}],
+                "estado": {"$in": anteriores}
+            }
+            mensajes = list(db.mensajes.find(filtro, PROYECCION_MENSAJE)
+                            .sort([("timestamp", 1), ("_id", 1)])
+                            .limit(ESTADO_LOTE_MAXIMO + 1))
+            hay_mas = len(mensajes) > ESTADO_LOTE_MAXIMO
+            mensajes = mensajes[:ESTADO_LOTE_MAXIMO]
+
+        # Solo se escriben (y consumen secuencia) los que avanzan de estado
+        pendientes = {}
+        for mensaje in mensajes:
+            if ORDEN_ENTREGA.get(mensaje.get('estado') or 'enviado', 0) >= rango:
+                resultados[str(mensaje["_id"])] = "sin_cambios"
+            else:
+                pendientes.setdefault(mensaje.get('canal'), []).append(mensaje)
+
+        ahora = datetime.now()
+        operaciones = []
+        for canal_mensaje, lista in pendientes.items():
+            ultima = siguiente_secuencia(clave_secuencia_canal(canal_mensaje), cantidad=len(lista))
+            seq_fecha = datetime.utcnow()
+            for seq, mensaje in enumerate(lista, start=ultima - len(lista) + 1):
+                cambios = {
+                    "estado": nuevo_estado,
+                    "fecha_actualizacion_estado": ahora,
+                    "seq": seq,
+                    "seq_fecha": seq_fecha
+                }
+                operaciones.append(UpdateOne({"_id": mensaje["_id"]}, {"$set": cambios}))
+                mensaje.update(cambios)
+
+        if operaciones:
+            db.mensajes.bulk_write(operaciones, ordered=False)
+
+        for canal_mensaje, lista in pendientes.items():
+            for mensaje in lista:
+                seq = mensaje["seq"]
+                mensaje = serializar_mensaje(mensaje)
+                resultados[mensaje["_id"]] = "actualizado"
+                publicar_evento(canal_mensaje, "mensaje", seq, {
+                    "accion": "estado",
+                    "mensaje": mensaje
+                })
+
+        return jsonify({
+            "mensaje": "Estados actualizados",
+            "estado_nuevo": nuevo_estado,
+            "actualizados": len(operaciones),
+            "resultados": resultados,
+            "has_more": hay_mas,
+            "timestamp": datetime.now().isoformat()
+        }), 200
+
+    except BulkWriteError as e:
+        logger.error(f"Error BD actualizar estados: {e.details}")
+        return jsonify({"error": "Error de base de datos"}), 500
+    except Exception as e:
+        logger.error(f"Error actualizar estados: {e}")
         return jsonify({"error": "Error interno del servidor"}), 500
\ No newline at end of file
@@ -7,8 +7,12 @@ import logging
 from datetime import datetime, timezone, timedelta
 from flask import request, jsonify
 from bson import ObjectId
-from funciones.database_functions import get_db
+from funciones.database_functions import get_db, ejecutar_en_transaccion
 from funciones.auth_functions import get_creator_info_from_token
+from funciones.asignaciones_functions import (
+    ObrerosAsignadosError, obreros_asignados, mensaje_asignados, asignar_obreros,
+    liberar_asignaciones, COLECCION_ASIGNACIONES
+)
 
 # Logger para este módulo
 logger = logging.getLogger(__name__)
@@ -79,32 +83,10 @@ def check_obreros_disponibles(obreros_ids, exclude_cuadrilla_id=None):
         exclude_cuadrilla_id: ID de cuadrilla a excluir de la verificación (para edición)
     """
     try:
-        db = get_db()
-        cuadrillas_collection = db.cuadrillas
-
-        # Buscar cuadrillas activas que contengan alguno de estos obreros
-        cuadrillas_activas = cuadrillas_collection.find({"activo": True})
-
-        obreros_ya_asignados = []
-
-        for cuadrilla in cuadrillas_activas:
-            cuadrilla_id = str(cuadrilla.get("_id"))
-
-            # Si es la cuadrilla que estamos editando, la excluimos de la verificación
-            if exclude_cuadrilla_id and cuadrilla_id == str(exclude_cuadrilla_id):
-                continue
-
-            for obrero in cuadrilla.get("obreros", []):
-                obrero_id = str(obrero.get("id"))
-                if obrero_id in obreros_ids:
-                    obrero_info = f"{obrero.get('nombre')} {obrero.get('apellidos')} (CI: {obrero.get('cedula')})"
-                    cuadrilla_info = cuadrilla.get('numero_cuadrilla', 'N/A')
-                    obreros_ya_asignados.append(f"{obrero_info} en {cuadrilla_info}")
-
-        if obreros_ya_asignados:
-            error_msg = "Los siguientes obreros ya están asignados a cuadrillas activas:\n"
-            error_msg += "\n".join([f"• {info}" for info in obreros_ya_asignados])
-            return False, error_msg
+        # Consulta por _id a 'asignaciones' (la cuadrilla en edición no cuenta)
+        asignados = obreros_asignados(obreros_ids, exclude_cuadrilla_id)
+        if asignados:
+            return False, mensaje_asignados(asignados)
 
         return True, None
 
@@ -188,7 +170,9 @@ def create_cuadrilla():
             obreros_snapshots.append(obrero_snapshot)
 
         # Crear documento de cuadrilla
+        cuadrilla_id = ObjectId()
         cuadrilla_doc = {
+            "_id": cuadrilla_id,
             "numero_cuadrilla": numero_cuadrilla,
             "actividad": data["actividad"].strip(),
             "activo": True,
@@ -201,9 +185,21 @@ def create_cuadrilla():
             "modificado_por": get_creator_info_from_token()
         }
 
-        # Insertar en base de datos
-        cuadrillas_collection = db.cuadrillas
-        result = cuadrillas_collection.insert_one(cuadrilla_doc)
+        # Reservar los obreros y guardar la cuadrilla juntos: dos creaciones
+        # simultáneas no pueden quedarse con el mismo obrero
+        def guardar(session):
+            asignados = asignar_obreros(cuadrilla_id, numero_cuadrilla, data["obreros_ids"], session)
+            try:
+                return db.cuadrillas.insert_one(cuadrilla_doc, session=session)
+            except Exception:
+                if session is None:
+                    liberar_asignaciones(claves=asignados)
+                raise
+
+        try:
+            result = ejecutar_en_transaccion(guardar)
+        except ObrerosAsignadosError as e:
+            return jsonify({"error": mensaje_asignados(e.asignaciones)}), 409
 
         if result.inserted_id:
             logger.info(f"Cuadrilla creada exitosamente: {numero_cuadrilla}")
@@ -324,11 +320,30 @@ def update_cuadrilla(cuadrilla_id):
             "modificado_por": data.get("creado_por", "sistema")  # Usar creado_por como modificado_por
         }
 
+        # Reservar los obreros nuevos, actualizar y liberar los que salieron, juntos
+        def guardar(session):
+            asignados = asignar_obreros(
+                existing_cuadrilla["_id"], existing_cuadrilla.get("numero_cuadrilla"),
+                data["obreros_ids"], session
+            )
+            try:
+                resultado = cuadrillas_collection.update_one(
+                    {"_id": existing_cuadrilla["_id"]},
+                    {"$set": update_data},
+                    session=session
+                )
+            except Exception:
+                if session is None:
+                    liberar_asignaciones(claves=asignados)
+                raise
+            liberar_asignaciones(existing_cuadrilla["_id"], conservar=data["obreros_ids"], session=session)
+            return resultado
+
         # Actualizar en base de datos
-        result = cuadrillas_collection.update_one(
-            {"_id": ObjectId(cuadrilla_id)},
-            {"$set": update_data}
-        )
+        try:
+            result = ejecutar_en_transaccion(guardar)
+        except ObrerosAsignadosError as e:
+            return jsonify({"error": mensaje_asignados(e.asignaciones)}), 409
 
         if result.modified_count > 0:
             logger.info(f"Cuadrilla {cuadrilla_id} actualizada exitosamente")
@@ -354,8 +369,13 @@ def delete_cuadrilla(cuadrilla_id):
         if not existing_cuadrilla:
             return jsonify({"error": "Cuadrilla no encontrada"}), 404
 
-        # Eliminar completamente de la base de datos (hard delete)
-        result = cuadrillas_collection.delete_one({"_id": ObjectId(cuadrilla_id)})
+        # Eliminar completamente de la base de datos (hard delete) y liberar sus obreros
+        def eliminar(session):
+            resultado = cuadrillas_collection.delete_one({"_id": existing_cuadrilla["_id"]}, session=session)
+            liberar_asignaciones(existing_cuadrilla["_id"], session=session)
+            return resultado
+
+        result = ejecutar_en_transaccion(eliminar)
 
         if result.deleted_count > 0:
             logger.info(f"Cuadrilla {cuadrilla_id} eliminada completamente de la base de datos")
@@ -388,38 +408,26 @@ def get_obreros_disponibles():
     try:
         db = get_db()
         obreros_collection = db.obreros
-        cuadrillas_collection = db.cuadrillas
-
-        # Obtener todos los obreros
-        todos_obreros = list(obreros_collection.find())
-
-        # Obtener obreros asignados a cuadrillas activas
-        cuadrillas_activas = cuadrillas_collection.find({"activo": True})
-        obreros_asignados_ids = set()
 
-        for cuadrilla in cuadrillas_activas:
-            for obrero in cuadrilla.get("obreros", []):
-                # Usar el ObjectId del obrero asignado
-                obrero_id = obrero.get("id")
-                if obrero_id:
-                    obreros_asignados_ids.add(str(obrero_id))
+        # Obreros asignados a cuadrillas activas: los _id de 'asignaciones'
+        obreros_asignados_ids = [doc["_id"] for doc in db[COLECCION_ASIGNACIONES].find({}, {"_id": 1})]
 
-        # Filtrar obreros disponibles (no asignados)
-        obreros_disponibles = []
-        for obrero in todos_obreros:
-            obrero_id_str = str(obrero["_id"])
-            if obrero_id_str not in obreros_asignados_ids:
-                # Convertir ObjectId a string para JSON
-                obrero["_id"] = obrero_id_str
-                obreros_disponibles.append(obrero)
+        # Obreros disponibles (no asignados)
+        obreros_disponibles = list(obreros_collection.find(
+            {"_id": {"$nin": obreros_asignados_ids}}, {"busqueda": 0}
+        ))
+        for obrero in obreros_disponibles:
+            # Convertir ObjectId a string para JSON
+            obrero["_id"] = str(obrero["_id"])
+        total_obreros = obreros_collection.count_documents({})
 
-        logger.info(f"Obreros disponibles: {len(obreros_disponibles)} de {len(todos_obreros)} totales")
+        logger.info(f"Obreros disponibles: {len(obreros_disponibles)} de {total_obreros} totales")
 
         return jsonify({
             "success": True,
             "obreros": obreros_disponibles,
             "count": len(obreros_disponibles),
-            "total_obreros": len(todos_obreros),
+            "total_obreros": total_obreros,
             "asignados": len(obreros_asignados_ids)
         }), 200
 
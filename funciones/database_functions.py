@@ -4,8 +4,11 @@ Maneja toda la conexión y operaciones con MongoDB Atlas
 """
 
 import os
+import time
 import logging
-from pymongo import MongoClient
+import threading
+from datetime import datetime
+from pymongo import MongoClient, ReturnDocument
 from pymongo.errors import ConnectionFailure, OperationFailure, WriteConcernError
 
 # Variables globales para conexión
@@ -15,6 +18,21 @@ client = None
 # Logger para este módulo
 logger = logging.getLogger(__name__)
 
+# Días que se conservan las marcas de mensajes eliminados para clientes incrementales
+RETENCION_ELIMINADOS_DIAS = int(os.getenv('RETENCION_ELIMINADOS_DIAS', '7'))
+
+# Documento de 'contadores' con las estadísticas globales (canales, mensajes, último mensaje)
+CLAVE_ESTADISTICAS = "estadisticas"
+
+# Caché del estado de la BD: se refresca en segundo plano al vencer el TTL y
+# una instantánea más vieja que el máximo ya no cuenta como "lista"
+ESTADO_BD_TTL_SEGUNDOS = float(os.getenv('ESTADO_BD_TTL_SEGUNDOS', '10'))
+ESTADO_BD_MAXIMO_SEGUNDOS = float(os.getenv('ESTADO_BD_MAXIMO_SEGUNDOS', '60'))
+
+_estado_bd = {"datos": None, "obtenido": 0.0}
+_estado_bd_lock = threading.Lock()
+_estado_bd_refrescando = False
+
 def init_db():
     """Inicializa la conexión a MongoDB"""
     global db, client
@@ -36,18 +54,11 @@ def init_db():
         client.admin.command('ping')
         db = client.chat_db
         
-        # Crear índices si no existen
-        try:
-            db.canales.create_index("nombre", unique=True)
-            db.mensajes.create_index([("canal", 1), ("timestamp", -1)])
-            # NUEVO: Índice para buscar mensajes por usuario y estado
-            db.mensajes.create_index([("usuario", 1), ("_id", 1)])
-            # NUEVO: Índice para moderadores por email (único)
-            db.moderadores.create_index("email", unique=True)
-            # NUEVO: Índice para obreros por email (único)
-            db.obreros.create_index("email", unique=True)
-        except:
-            pass
+        # Crear los índices del registro que falten (cada fallo queda en el log)
+        from funciones.indices_functions import aplicar_indices
+        resultado = aplicar_indices(db)
+        if resultado["errores"]:
+            logger.warning(f"{len(resultado['errores'])} índices no se pudieron crear")
             
         logger.info("Base de datos inicializada correctamente")
         return True
@@ -62,18 +73,100 @@ def get_db_status():
         return {"status": "no_disponible"}
     try:
         client.admin.command('ping')
+        # Contadores mantenidos en cada escritura: una lectura por _id en vez de contar colecciones
+        estadisticas = db.contadores.find_one({"_id": CLAVE_ESTADISTICAS}) or {}
+        ultima_actividad = estadisticas.get("ultimo_mensaje_timestamp")
         return {
             "status": "conectada",
-            "canales": db.canales.count_documents({}),
-            "mensajes": db.mensajes.count_documents({})
+            "canales": estadisticas.get("canales", 0),
+            "mensajes": estadisticas.get("mensajes", 0),
+            "ultima_actividad": ultima_actividad.isoformat() if ultima_actividad else None
         }
     except:
         return {"status": "error"}
 
+def siguiente_secuencia(clave, cantidad=1):
+    """Incrementar atómicamente el contador 'clave' y retornar el nuevo valor
+
+    'actualizado' guarda cuándo se asignó la última secuencia: hasta que pasa
+    un margen puede haber escrituras con secuencias menores aún sin confirmar.
+    """
+    contador = db.contadores.find_one_and_update(
+        {"_id": clave},
+        {"$inc": {"seq": cantidad}, "$set": {"actualizado": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return contador["seq"]
+
+def obtener_secuencia(clave):
+    """Obtener el valor actual del contador 'clave' (0 si no existe)"""
+    return obtener_contador(clave).get("seq", 0)
+
+def obtener_contador(clave):
+    """Documento del contador 'clave' (seq y actualizado) o {} si no existe"""
+    return db.contadores.find_one({"_id": clave}) or {}
+
+def _refrescar_estado_bd():
+    """Consultar el estado de la BD y guardarlo en la caché"""
+    global _estado_bd_refrescando
+    try:
+        datos = get_db_status()
+        with _estado_bd_lock:
+            _estado_bd["datos"] = datos
+            _estado_bd["obtenido"] = time.monotonic()
+    finally:
+        with _estado_bd_lock:
+            _estado_bd_refrescando = False
+
+def obtener_estado_bd():
+    """Estado de la BD desde la caché - retorna (datos, antigüedad en segundos)
+
+    Solo la primera llamada espera a MongoDB. Después, si la instantánea
+    venció, se lanza un único refresco en segundo plano y se responde con la
+    anterior; así el costo no crece con la frecuencia de las sondas.
+    """
+    global _estado_bd_refrescando
+    with _estado_bd_lock:
+        datos = _estado_bd["datos"]
+        edad = time.monotonic() - _estado_bd["obtenido"]
+        refrescar = datos is not None and edad > ESTADO_BD_TTL_SEGUNDOS and not _estado_bd_refrescando
+        if refrescar:
+            _estado_bd_refrescando = True
+
+    if datos is None:
+        _refrescar_estado_bd()
+        with _estado_bd_lock:
+            return _estado_bd["datos"], 0.0
+
+    if refrescar:
+        threading.Thread(target=_refrescar_estado_bd, name='estado-bd', daemon=True).start()
+    return datos, edad
+
 def get_db():
     """Obtener referencia a la base de datos"""
     return db
 
 def get_client():
     """Obtener referencia al cliente MongoDB"""
-    return client
\ No newline at end of file
+    return client
+
+# Topologías donde MongoDB admite transacciones (Atlas siempre es un replica set)
+TOPOLOGIAS_CON_TRANSACCIONES = ('ReplicaSetWithPrimary', 'Sharded', 'LoadBalanced')
+
+def transacciones_disponibles():
+    """True si el servidor conectado admite transacciones multi-documento"""
+    descripcion = getattr(client, 'topology_description', None)
+    return descripcion is not None and descripcion.topology_type_name in TOPOLOGIAS_CON_TRANSACCIONES
+
+def ejecutar_en_transaccion(funcion):
+    """
+    Ejecutar funcion(session) en una transacción, reintentando los errores transitorios
+
+    En un servidor sin transacciones (standalone) se llama con session=None:
+    la función debe dejar los datos consistentes por sí misma si falla.
+    """
+    if not transacciones_disponibles():
+        return funcion(None)
+    with client.start_session() as session:
+        return session.with_transaction(funcion)
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""
+Funciones de Eventos en Tiempo Real
+Hub en proceso que reparte los cambios de cada canal a los clientes suscritos (SSE)
+y broadcaster intercambiable que decide cómo llegan esos cambios a cada worker:
+
+- memoria: los eventos se entregan solo en el proceso que hizo la escritura
+  (un único proceso o pruebas)
+- change_stream: cada worker observa un change stream de MongoDB sobre
+  mensajes/canales/contadores/usuarios/obreros, así las escrituras de cualquier
+  worker o nodo llegan a todos
+"""
+
+import os
+import queue
+import logging
+import threading
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Eventos pendientes por cliente; si se llena, el cliente se desconecta y reanuda con Last-Event-ID
+TAMANO_COLA_SUSCRIPTOR = int(os.getenv('SSE_TAMANO_COLA', '100'))
+
+# Backend del broadcaster: 'memoria' o 'change_stream'
+EVENTOS_BACKEND = os.getenv('EVENTOS_BACKEND', 'memoria').strip().lower()
+
+# Colecciones observadas por el change stream
+COLECCIONES_OBSERVADAS = ['mensajes', 'mensajes_eliminados', 'canales', 'contadores', 'usuarios', 'obreros']
+
+# Suscriptores por canal: {canal: set(colas)}
+_suscriptores = {}
+_lock = threading.Lock()
+
+# Funciones llamadas con (coleccion, clave) cuando cambian datos cacheables
+_oyentes_invalidacion = []
+
+# ==================== HUB LOCAL ====================
+
+def suscribir(canal, maximo=None):
+    """Registrar un suscriptor en el canal y retornar su cola de eventos
+
+    Con 'maximo' retorna None si este proceso ya tiene esa cantidad de
+    suscriptores (la comprobación y el registro son atómicos).
+    """
+    cola = queue.Queue(maxsize=TAMANO_COLA_SUSCRIPTOR)
+    cola.desbordada = False
+    with _lock:
+        if maximo is not None and sum(len(colas) for colas in _suscriptores.values()) >= maximo:
+            return None
+        _suscriptores.setdefault(canal, set()).add(cola)
+    return cola
+
+def desuscribir(canal, cola):
+    """Eliminar un suscriptor del canal"""
+    with _lock:
+        colas = _suscriptores.get(canal)
+        if colas is None:
+            return
+        colas.discard(cola)
+        if not colas:
+            del _suscriptores[canal]
+
+def entregar_evento_local(canal, tipo, seq, datos):
+    """Entregar un evento a los suscriptores de este proceso y avisar a los oyentes"""
+    evento = {"id": seq, "tipo": tipo, "datos": datos}
+    with _lock:
+        colas = list(_suscriptores.get(canal, ()))
+
+    for cola in colas:
+        try:
+            cola.put_nowait(evento)
+        except queue.Full:
+            # Cliente lento: se corta su stream y al reconectar recupera lo perdido desde la BD
+            cola.desbordada = True
+            desuscribir(canal, cola)
+            logger.warning(f"Suscriptor desbordado en canal '{canal}', desconectando")
+
+    notificar_invalidacion_local("mensajes", canal)
+
+def total_suscriptores():
+    """Número de suscriptores conectados a este proceso"""
+    with _lock:
+        return sum(len(colas) for colas in _suscriptores.values())
+
+# ==================== INVALIDACIÓN DE CACHÉS ====================
+
+def registrar_oyente_invalidacion(funcion):
+    """Registrar funcion(coleccion, clave) para enterarse de cambios en cualquier worker
+
+    coleccion None significa que cualquier dato cacheado pudo cambiar.
+    """
+    _oyentes_invalidacion.append(funcion)
+
+def notificar_invalidacion_local(coleccion, clave=None):
+    """Avisar a los oyentes de este proceso"""
+    for oyente in list(_oyentes_invalidacion):
+        try:
+            oyente(coleccion, clave)
+        except Exception as e:
+            logger.error(f"Error en oyente de invalidación: {e}")
+
+# ==================== BROADCASTERS ====================
+
+class BroadcasterMemoria:
+    """Entrega los eventos directamente en el proceso que escribe"""
+
+    nombre = 'memoria'
+    distribuido = False
+
+    def iniciar(self):
+        pass
+
+    def detener(self):
+        pass
+
+    def propaga_invalidaciones(self):
+        # Solo ve las escrituras de su propio proceso
+        return False
+
+    def publicar_evento(self, canal, tipo, seq, datos):
+        entregar_evento_local(canal, tipo, seq, datos)
+
+    def publicar_invalidacion(self, coleccion, clave=None):
+        notificar_invalidacion_local(coleccion, clave)
+
+
+class BroadcasterChangeStream:
+    """Reparte los cambios observados en un change stream de MongoDB
+
+    Publicar es una operación vacía: la propia escritura en MongoDB es el
+    mensaje, y el hilo observador de cada worker la recibe y la entrega a sus
+    suscriptores locales. Requiere replica set (MongoDB Atlas lo es).
+    """
+
+    nombre = 'change_stream'
+    distribuido = True
+
+    def __init__(self, colecciones=None):
+        self.colecciones = colecciones or COLECCIONES_OBSERVADAS
+        self._resume_token = None
+        self._detener = threading.Event()
+        self._hilo = None
+        self._conectado = False
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._observar, name='eventos-change-stream', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def propaga_invalidaciones(self):
+        # Mientras el stream esté caído se podrían perder cambios de otros workers
+        return self._conectado
+
+    def publicar_evento(self, canal, tipo, seq, datos):
+        pass
+
+    def publicar_invalidacion(self, coleccion, clave=None):
+        pass
+
+    def _observar(self):
+        """Bucle del hilo observador con reconexión y reanudación por resume token"""
+        from pymongo.errors import PyMongoError
+        from funciones.database_functions import get_db
+
+        espera = 1
+        while not self._detener.is_set():
+            db = get_db()
+            if db is None:
+                self._detener.wait(espera)
+                continue
+            try:
+                pipeline = [{"$match": {"ns.coll": {"$in": self.colecciones}}}]
+                with db.watch(pipeline, full_document='updateLookup',
+                              resume_after=self._resume_token,
+                              max_await_time_ms=1000) as stream:
+                    logger.info("Change stream de eventos conectado")
+                    espera = 1
+                    # Lo cacheado antes de conectar pudo perderse cambios
+                    notificar_invalidacion_local(None)
+                    self._conectado = True
+                    while not self._detener.is_set() and stream.alive:
+                        cambio = stream.try_next()
+                        if cambio is None:
+                            continue
+                        self._resume_token = stream.resume_token
+                        self._despachar(cambio)
+                self._conectado = False
+            except PyMongoError as e:
+                self._conectado = False
+                # Si el token ya no está en el oplog, se reanuda desde ahora
+                if getattr(e, 'code', None) == 286:
+                    self._resume_token = None
+                logger.error(f"Error en change stream de eventos: {e}. Reintentando en {espera}s")
+                self._detener.wait(espera)
+                espera = min(espera * 2, 30)
+            except Exception as e:
+                self._conectado = False
+                logger.error(f"Error procesando change stream de eventos: {e}")
+                self._detener.wait(espera)
+
+    def _despachar(self, cambio):
+        """Convertir un documento de cambio en evento local"""
+        from funciones.chat_functions import serializar_mensaje
+
+        coleccion = cambio.get("ns", {}).get("coll")
+        operacion = cambio.get("operationType")
+        documento = cambio.get("fullDocument")
+
+        if coleccion == "mensajes":
+            if operacion not in ("insert", "update", "replace") or not documento:
+                return
+            campos = cambio.get("updateDescription", {}).get("updatedFields", {})
+            if operacion == "update" and "seq" not in campos:
+                # Cambios sin secuencia (p.ej. renombrar canal) no son eventos de chat
+                notificar_invalidacion_local("mensajes", documento.get("canal"))
+                return
+            if operacion == "insert":
+                accion = "nuevo"
+            elif "mensaje" in campos:
+                accion = "editado"
+            else:
+                accion = "estado"
+            entregar_evento_local(documento.get("canal"), "mensaje", documento.get("seq"), {
+                "accion": accion,
+                "mensaje": serializar_mensaje(documento)
+            })
+
+        elif coleccion == "mensajes_eliminados":
+            if operacion != "insert" or not documento:
+                return
+            entregar_evento_local(documento.get("canal"), "mensaje_eliminado", documento.get("seq"), {
+                "_id": documento.get("mensaje_id"),
+                "canal": documento.get("canal")
+            })
+
+        elif coleccion == "canales":
+            clave = documento.get("nombre") if documento else None
+            notificar_invalidacion_local(coleccion, clave)
+
+        else:
+            # contadores, usuarios, obreros: la clave es el _id del documento
+            clave = cambio.get("documentKey", {}).get("_id")
+            notificar_invalidacion_local(coleccion, str(clave) if clave is not None else None)
+
+
+_BACKENDS = {
+    BroadcasterMemoria.nombre: BroadcasterMemoria,
+    BroadcasterChangeStream.nombre: BroadcasterChangeStream
+}
+
+_broadcaster = BroadcasterMemoria()
+
+def iniciar_broadcaster(backend=None):
+    """Seleccionar e iniciar el broadcaster (una vez por worker, tras el fork)"""
+    global _broadcaster
+    backend = (backend or EVENTOS_BACKEND).strip().lower()
+    clase = _BACKENDS.get(backend)
+    if clase is None:
+        logger.error(f"Backend de eventos desconocido '{backend}', usando memoria")
+        clase = BroadcasterMemoria
+
+    _broadcaster.detener()
+    _broadcaster = clase()
+    _broadcaster.iniciar()
+    logger.info(f"Broadcaster de eventos: {_broadcaster.nombre}")
+    return _broadcaster
+
+def get_broadcaster():
+    """Obtener el broadcaster activo"""
+    return _broadcaster
+
+def publicar_evento(canal, tipo, seq, datos):
+    """Publicar un cambio de mensajes del canal
+
+    Args:
+        canal (str): Canal afectado
+        tipo (str): Nombre del evento SSE ('mensaje', 'mensaje_eliminado')
+        seq (int): Secuencia del cambio, usada como id del evento
+        datos (dict): Contenido serializable del evento
+    """
+    _broadcaster.publicar_evento(canal, tipo, seq, datos)
+
+def publicar_invalidacion(coleccion, clave=None):
+    """Publicar que cambió una colección (o una clave dentro de ella) para invalidar cachés"""
+    _broadcaster.publicar_invalidacion(coleccion, clave)
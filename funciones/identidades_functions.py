@@ -0,0 +1,195 @@
+"""
+Funciones de Identidades
+Índice único de cédula, email y teléfono compartido por moderadores y obreros
+
+Cada valor ocupado es un documento de 'identidades' con _id "<campo>:<valor>",
+así la unicidad entre ambas colecciones la garantiza MongoDB: se reclama la
+identidad (insert) antes de guardar a la persona y se libera si algo falla.
+"""
+
+import logging
+from pymongo.errors import BulkWriteError
+from funciones.database_functions import get_db
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Campos únicos entre moderadores y obreros
+CAMPOS_IDENTIDAD = ('cedula', 'email', 'telefono')
+
+# Texto de cada campo en los mensajes de error
+ETIQUETAS_CAMPOS = {'cedula': 'la cédula', 'email': 'el email', 'telefono': 'el teléfono'}
+
+# Colección de cada tipo de persona
+COLECCIONES_TIPO = {'moderador': 'moderadores', 'obrero': 'obreros'}
+
+# Documento de 'contadores' que marca el backfill como hecho
+CLAVE_INICIALIZACION = "identidades"
+
+def normalizar_valores(persona):
+    """Valores de identidad no vacíos de una persona: {campo: valor}"""
+    valores = {}
+    for campo in CAMPOS_IDENTIDAD:
+        valor = str(persona.get(campo) or '').strip()
+        if campo == 'email':
+            valor = valor.lower()
+        if valor:
+            valores[campo] = valor
+    return valores
+
+def clave_identidad(campo, valor):
+    """_id del documento de identidad"""
+    return f"{campo}:{valor}"
+
+def _documento(campo, valor, tipo, persona_id, nombre):
+    return {
+        "_id": clave_identidad(campo, valor),
+        "campo": campo,
+        "valor": valor,
+        "tipo": tipo,
+        "persona_id": persona_id,
+        "nombre": nombre
+    }
+
+def buscar_duplicados(valores, excluir_id=None):
+    """
+    Buscar quién ocupa cada valor con una sola consulta por _id
+
+    Args:
+        valores (dict): {campo: valor} a comprobar
+        excluir_id (ObjectId): Persona que se está editando (sus valores no cuentan)
+
+    Returns:
+        dict: {campo: {"tipo", "nombre", "persona_id", "valor"}} de los ocupados
+    """
+    if not valores:
+        return {}
+    claves = [clave_identidad(campo, valor) for campo, valor in valores.items()]
+    ocupados = {}
+    for doc in get_db().identidades.find({"_id": {"$in": claves}}):
+        if excluir_id is not None and doc.get("persona_id") == excluir_id:
+            continue
+        ocupados[doc["campo"]] = {
+            "tipo": doc.get("tipo"),
+            "nombre": doc.get("nombre", ""),
+            "persona_id": doc.get("persona_id"),
+            "valor": doc.get("valor")
+        }
+    return ocupados
+
+def reclamar_identidades(persona_id, tipo, nombre, valores):
+    """
+    Reservar los valores para la persona antes de guardarla
+
+    Los que ya le pertenecen se ignoran. Si alguno está ocupado por otra
+    persona se liberan los recién reservados.
+
+    Returns:
+        tuple: (reservados, conflictos) - lista de _id insertados y
+               {campo: ocupante} (vacío si todo quedó reservado)
+    """
+    if not valores:
+        return [], {}
+    documentos = [_documento(campo, valor, tipo, persona_id, nombre) for campo, valor in valores.items()]
+    try:
+        get_db().identidades.insert_many(documentos, ordered=False)
+        return [doc["_id"] for doc in documentos], {}
+    except BulkWriteError as e:
+        errores = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errores):
+            raise
+        fallidos = {documentos[error["index"]]["_id"] for error in errores}
+        reservados = [doc["_id"] for doc in documentos if doc["_id"] not in fallidos]
+
+    conflictos = buscar_duplicados(
+        {campo: valor for campo, valor in valores.items() if clave_identidad(campo, valor) in fallidos},
+        excluir_id=persona_id
+    )
+    if conflictos:
+        liberar_identidades(reservados)
+        return [], conflictos
+    # Los duplicados eran de la propia persona
+    return reservados, {}
+
+def liberar_identidades(claves=None, persona_id=None):
+    """Liberar identidades por _id o todas las de una persona"""
+    filtro = {}
+    if claves is not None:
+        if not claves:
+            return
+        filtro["_id"] = {"$in": list(claves)}
+    if persona_id is not None:
+        filtro["persona_id"] = persona_id
+    if filtro:
+        get_db().identidades.delete_many(filtro)
+
+def sincronizar_identidades(persona_id, tipo, nombre, valores_anteriores, valores_nuevos):
+    """
+    Ajustar las identidades tras actualizar a una persona: liberar las que ya
+    no usa y refrescar el nombre mostrado en los conflictos
+    """
+    db = get_db()
+    sobrantes = [
+        clave_identidad(campo, valor) for campo, valor in valores_anteriores.items()
+        if valores_nuevos.get(campo) != valor
+    ]
+    if sobrantes:
+        db.identidades.delete_many({"_id": {"$in": sobrantes}, "persona_id": persona_id})
+    db.identidades.update_many({"persona_id": persona_id}, {"$set": {"nombre": nombre, "tipo": tipo}})
+
+def mensaje_duplicado(campo, ocupante, tipo_propio=None):
+    """Mensaje de error para un valor ocupado (mismo texto que las validaciones anteriores)"""
+    articulo = "otro" if ocupante["tipo"] == tipo_propio else "un"
+    return f"Ya existe {articulo} {ocupante['tipo']} con {ETIQUETAS_CAMPOS[campo]} '{ocupante['valor']}'"
+
+def primer_conflicto(conflictos):
+    """Conflicto a reportar, en el orden de CAMPOS_IDENTIDAD"""
+    for campo in CAMPOS_IDENTIDAD:
+        if campo in conflictos:
+            return campo, conflictos[campo]
+    return None, None
+
+def inicializar_identidades():
+    """Cargar las identidades de moderadores y obreros existentes (una sola vez)
+
+    Valores repetidos que ya existían se registran para la primera persona y
+    se avisan en el log: no se pueden corregir automáticamente.
+    """
+    db = get_db()
+    if db is None:
+        return False
+    try:
+        if db.contadores.find_one({"_id": CLAVE_INICIALIZACION, "inicializado": True}):
+            return True
+
+        total = repetidos = 0
+        for tipo, coleccion in COLECCIONES_TIPO.items():
+            campos = {"nombre": 1, "apellidos": 1, **{campo: 1 for campo in CAMPOS_IDENTIDAD}}
+            documentos = []
+            for persona in db[coleccion].find({}, campos):
+                nombre = f"{persona.get('nombre', '')} {persona.get('apellidos', '')}"
+                for campo, valor in normalizar_valores(persona).items():
+                    documentos.append(_documento(campo, valor, tipo, persona["_id"], nombre))
+            if not documentos:
+                continue
+            total += len(documentos)
+            try:
+                db.identidades.insert_many(documentos, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") != 11000:
+                        raise
+                    repetidos += 1
+                    # Puede ser la misma persona si un arranque anterior se interrumpió
+                    logger.warning(f"Identidad ya registrada: {documentos[error['index']]['_id']} ({tipo})")
+
+        db.contadores.update_one(
+            {"_id": CLAVE_INICIALIZACION},
+            {"$set": {"inicializado": True, "total": total, "repetidos": repetidos}},
+            upsert=True
+        )
+        logger.info(f"Identidades inicializadas: {total} valores, {repetidos} repetidos")
+        return True
+    except Exception as e:
+        logger.error(f"Error inicializando identidades: {e}")
+        return False
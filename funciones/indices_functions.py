@@ -0,0 +1,280 @@
+"""
+Funciones de Índices
+Registro declarativo de los índices de la aplicación y de las consultas que
+deben cubrir. init_db los aplica al arrancar (create_index es idempotente y
+los índices obsoletos se eliminan) y scripts/reporte_indices.py revisa con
+explain() que ninguna consulta registrada recorra la colección completa.
+"""
+
+import logging
+from pymongo.errors import OperationFailure, PyMongoError
+from funciones.database_functions import RETENCION_ELIMINADOS_DIAS
+from funciones.mantenimiento_functions import RETENCION_SECURITY_LOGS_DIAS
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Código de MongoDB cuando ya existe un índice con las mismas claves y otras opciones
+INDICE_OPCIONES_DISTINTAS = 85
+
+def _indice(coleccion, claves, motivo, **opciones):
+    """Entrada del registro; 'claves' es un campo o una lista de (campo, dirección)"""
+    if isinstance(claves, str):
+        claves = [(claves, 1)]
+    return {"coleccion": coleccion, "claves": claves, "opciones": opciones, "motivo": motivo}
+
+# ==================== REGISTRO DE ÍNDICES ====================
+
+INDICES = [
+    # Chat
+    _indice("canales", "nombre", "Canal por nombre", unique=True),
+    _indice("mensajes", [("canal", 1), ("timestamp", -1), ("_id", -1)],
+            "Página de mensajes por cursor con desempate estable"),
+    _indice("mensajes", [("canal", 1), ("seq", 1)], "Consultas incrementales (?since=)"),
+    _indice("mensajes", [("usuario", 1), ("_id", 1)], "Mensajes de un usuario"),
+    _indice("mensajes", [("mensaje", "text")], "Búsqueda de mensajes (sin tildes, raíces en español)",
+            default_language="spanish"),
+    _indice("mensajes_eliminados", [("canal", 1), ("seq", 1)], "Eliminados para clientes incrementales"),
+    _indice("mensajes_eliminados", "eliminado_en", "Retención de marcas de eliminados",
+            expireAfterSeconds=RETENCION_ELIMINADOS_DIAS * 86400),
+    _indice("lecturas", [("usuario_id", 1), ("canal", 1)], "Marca de lectura por usuario y canal", unique=True),
+
+    # Autenticación
+    _indice("usuarios", "username", "Login de administradores y moderadores", unique=True),
+    _indice("usuarios", "personal_id", "Usuario de un moderador", sparse=True),
+    _indice("tokens_revocados", "expira", "Los tokens revocados expiran con el token", expireAfterSeconds=0),
+    _indice("tokens_revocados", "revocado_en", "Sincronización de revocaciones por fecha"),
+    _indice("limites_tasa", "expira", "Contadores de límite de tasa compartidos", expireAfterSeconds=0),
+    _indice("security_logs", "timestamp", "Retención de logs de seguridad",
+            expireAfterSeconds=RETENCION_SECURITY_LOGS_DIAS * 86400),
+
+    # Personal
+    _indice("moderadores", "email", "Email único de moderadores", unique=True),
+    _indice("moderadores", "cedula", "Edición y eliminación por cédula"),
+    _indice("obreros", "email", "Email único de obreros", unique=True),
+    _indice("obreros", [("cedula", 1), ("activo", 1)], "Login de obreros y edición por cédula"),
+    _indice("moderadores", [("apellidos", 1), ("nombre", 1), ("_id", 1)], "Orden del listado paginado"),
+    _indice("obreros", [("apellidos", 1), ("nombre", 1), ("_id", 1)], "Orden del listado paginado"),
+    _indice("moderadores", [("activo", 1), ("apellidos", 1), ("nombre", 1), ("_id", 1)],
+            "Listado paginado filtrado por ?activo="),
+    _indice("obreros", [("activo", 1), ("apellidos", 1), ("nombre", 1), ("_id", 1)],
+            "Listado paginado filtrado por ?activo="),
+    _indice("moderadores", "busqueda", "Búsqueda por prefijo sin tildes (nombre, apellidos, cédula, email)"),
+    _indice("obreros", "busqueda", "Búsqueda por prefijo sin tildes (nombre, apellidos, cédula, email)"),
+    _indice("identidades", "persona_id", "Liberar o sincronizar las identidades de una persona"),
+
+    # Cuadrillas
+    _indice("cuadrillas", "numero_cuadrilla", "Siguiente número, listado y detalle en reportes"),
+    _indice("cuadrillas", "activo", "Cuadrillas activas"),
+    _indice("cuadrillas", [("moderador.cedula", 1), ("activo", 1)], "Cuadrillas activas de un moderador"),
+    _indice("cuadrillas", [("obreros.cedula", 1), ("activo", 1)], "Cuadrilla activa de un obrero"),
+    _indice("cuadrillas", [("obreros.id", 1), ("activo", 1)], "Disponibilidad de obreros por id"),
+    _indice("asignaciones", "cuadrilla_id", "Liberar los obreros de una cuadrilla"),
+
+    # Reportes
+    _indice("reportes_moderadores", "numero_reporte", "Siguiente número de reporte"),
+    _indice("reportes_moderadores", [("tipo", 1), ("fecha_creacion", -1)], "Listado de reportes"),
+    _indice("reportes_obreros", "numero_reporte", "Siguiente número de reporte"),
+    _indice("reportes_obreros", [("tipo", 1), ("fecha_creacion", -1)], "Listado de reportes"),
+    _indice("reportes_generales", [("tipo", 1), ("numero_reporte", -1)], "Siguiente número de reporte"),
+    _indice("reportes_generales", [("tipo", 1), ("fecha_creacion", -1)], "Listado de reportes"),
+]
+
+# Índices que crearon versiones anteriores y ya no se usan: aplicar_indices los elimina
+OBSOLETOS = [
+    {"coleccion": "mensajes", "indice": "canal_1_timestamp_-1",
+     "motivo": "Cubierto por (canal, timestamp, _id)"},
+    {"coleccion": "usuarios", "indice": "bloqueado_hasta_1",
+     "motivo": "Los bloqueos de login ya no se guardan en el usuario"},
+]
+
+# ==================== CONSULTAS A CUBRIR ====================
+
+# Formas de las consultas de las rutas frecuentes, con valores de ejemplo.
+# El reporte de índices ejecuta explain() sobre cada una.
+CONSULTAS = [
+    {"nombre": "login_obrero", "coleccion": "obreros", "filtro": {"cedula": "12345678", "activo": True}},
+    {"nombre": "obrero_por_cedula", "coleccion": "obreros", "filtro": {"cedula": "12345678"}},
+    {"nombre": "moderador_por_cedula", "coleccion": "moderadores", "filtro": {"cedula": "12345678"}},
+    {"nombre": "pagina_obreros", "coleccion": "obreros", "filtro": {"activo": True},
+     "orden": [("apellidos", 1), ("nombre", 1), ("_id", 1)], "limite": 50},
+    {"nombre": "buscar_obreros", "coleccion": "obreros",
+     "filtro": {"$and": [{"busqueda": {"$regex": "^jose"}}, {"busqueda": {"$regex": "^pe"}}]},
+     "orden": [("apellidos", 1), ("nombre", 1), ("_id", 1)], "limite": 500},
+    {"nombre": "pagina_moderadores", "coleccion": "moderadores", "filtro": {},
+     "orden": [("apellidos", 1), ("nombre", 1), ("_id", 1)], "limite": 50},
+    {"nombre": "pagina_moderadores_activos", "coleccion": "moderadores", "filtro": {"activo": True},
+     "orden": [("apellidos", 1), ("nombre", 1), ("_id", 1)], "limite": 50},
+    {"nombre": "login_usuario", "coleccion": "usuarios", "filtro": {"username": "admin", "activo": True}},
+    {"nombre": "usuario_de_moderador", "coleccion": "usuarios", "filtro": {"personal_id": None}},
+    {"nombre": "identidades_de_persona", "coleccion": "identidades", "filtro": {"persona_id": None}},
+    {"nombre": "siguiente_cuadrilla", "coleccion": "cuadrillas", "filtro": {},
+     "orden": [("numero_cuadrilla", -1)], "limite": 1},
+    {"nombre": "cuadrilla_por_numero", "coleccion": "cuadrillas", "filtro": {"numero_cuadrilla": "1"}},
+    {"nombre": "cuadrillas_activas", "coleccion": "cuadrillas", "filtro": {"activo": True}},
+    {"nombre": "cuadrillas_de_moderador", "coleccion": "cuadrillas",
+     "filtro": {"activo": True, "moderador.cedula": "12345678"}},
+    {"nombre": "cuadrilla_de_obrero", "coleccion": "cuadrillas",
+     "filtro": {"activo": True, "obreros.cedula": "12345678"}},
+    {"nombre": "obrero_en_cuadrilla", "coleccion": "cuadrillas",
+     "filtro": {"activo": True, "obreros.id": None}},
+    {"nombre": "asignaciones_de_cuadrilla", "coleccion": "asignaciones", "filtro": {"cuadrilla_id": None}},
+    {"nombre": "siguiente_reporte_moderadores", "coleccion": "reportes_moderadores", "filtro": {},
+     "orden": [("numero_reporte", -1)], "limite": 1},
+    {"nombre": "listado_reportes_moderadores", "coleccion": "reportes_moderadores",
+     "filtro": {"tipo": "moderadores"}, "orden": [("fecha_creacion", -1)]},
+    {"nombre": "siguiente_reporte_obreros", "coleccion": "reportes_obreros", "filtro": {},
+     "orden": [("numero_reporte", -1)], "limite": 1},
+    {"nombre": "listado_reportes_obreros", "coleccion": "reportes_obreros",
+     "filtro": {"tipo": "obreros"}, "orden": [("fecha_creacion", -1)]},
+    {"nombre": "siguiente_reporte_general", "coleccion": "reportes_generales",
+     "filtro": {"tipo": "general"}, "orden": [("numero_reporte", -1)], "limite": 1},
+    {"nombre": "listado_reportes_generales", "coleccion": "reportes_generales",
+     "filtro": {"tipo": "general"}, "orden": [("fecha_creacion", -1)]},
+    {"nombre": "pagina_mensajes", "coleccion": "mensajes", "filtro": {"canal": "general"},
+     "orden": [("timestamp", -1), ("_id", -1)], "limite": 50},
+    {"nombre": "buscar_mensajes", "coleccion": "mensajes",
+     "filtro": {"$text": {"$search": "limpieza"}, "canal": "general"}},
+    {"nombre": "mensajes_desde", "coleccion": "mensajes", "filtro": {"canal": "general", "seq": {"$gt": 0}},
+     "orden": [("seq", 1)]},
+    {"nombre": "lecturas_de_usuario", "coleccion": "lecturas", "filtro": {"usuario_id": "0"}},
+]
+
+# ==================== APLICACIÓN ====================
+
+def _nombre_indice(claves):
+    """Nombre por defecto que MongoDB da al índice (campo_dir_campo_dir)"""
+    return "_".join(f"{campo}_{direccion}" for campo, direccion in claves)
+
+def _ajustar_ttl(db, indice):
+    """
+    Cambiar la expiración de un índice TTL existente (p.ej. cambió la retención)
+
+    Si el índice existente no es TTL y el servidor no permite convertirlo con
+    collMod, se recrea.
+    """
+    try:
+        db.command({
+            "collMod": indice["coleccion"],
+            "index": {
+                "keyPattern": dict(indice["claves"]),
+                "expireAfterSeconds": indice["opciones"]["expireAfterSeconds"]
+            }
+        })
+    except OperationFailure as e:
+        nombre = _nombre_indice(indice["claves"])
+        logger.warning(f"collMod no convirtió {indice['coleccion']}.{nombre} ({e}), recreándolo")
+        db[indice["coleccion"]].drop_index(nombre)
+        db[indice["coleccion"]].create_index(indice["claves"], **indice["opciones"])
+
+def eliminar_obsoletos(db):
+    """
+    Eliminar los índices de OBSOLETOS que sigan existiendo
+
+    Returns:
+        list: {"coleccion", "indice"} de cada índice eliminado
+    """
+    eliminados = []
+    for obsoleto in OBSOLETOS:
+        coleccion = db[obsoleto["coleccion"]]
+        if obsoleto["indice"] not in coleccion.index_information():
+            continue
+        coleccion.drop_index(obsoleto["indice"])
+        logger.info(f"Índice obsoleto eliminado: {obsoleto['coleccion']}.{obsoleto['indice']}")
+        eliminados.append({"coleccion": obsoleto["coleccion"], "indice": obsoleto["indice"]})
+    return eliminados
+
+def aplicar_indices(db):
+    """
+    Crear los índices del registro que falten y eliminar los obsoletos
+
+    Cada índice se intenta por separado: un fallo (datos duplicados en un
+    índice único, opciones distintas a las de un índice existente) se
+    registra en el log y no impide crear el resto. Los obsoletos se eliminan
+    después, cuando ya existe el índice que los reemplaza.
+
+    Returns:
+        dict: {"aplicados": int, "obsoletos": [{"coleccion", "indice"}],
+               "errores": [{"coleccion", "indice", "error"}]}
+    """
+    aplicados = 0
+    errores = []
+    for indice in INDICES:
+        nombre = _nombre_indice(indice["claves"])
+        try:
+            try:
+                db[indice["coleccion"]].create_index(indice["claves"], **indice["opciones"])
+            except OperationFailure as e:
+                if e.code != INDICE_OPCIONES_DISTINTAS or "expireAfterSeconds" not in indice["opciones"]:
+                    raise
+                _ajustar_ttl(db, indice)
+                logger.info(f"Expiración actualizada en {indice['coleccion']}.{nombre}")
+            aplicados += 1
+        except PyMongoError as e:
+            logger.error(f"No se pudo crear el índice {indice['coleccion']}.{nombre}: {e}")
+            errores.append({"coleccion": indice["coleccion"], "indice": nombre, "error": str(e)})
+
+    try:
+        obsoletos = eliminar_obsoletos(db)
+    except PyMongoError as e:
+        logger.error(f"No se pudieron eliminar los índices obsoletos: {e}")
+        obsoletos = []
+        errores.append({"coleccion": "-", "indice": "obsoletos", "error": str(e)})
+    return {"aplicados": aplicados, "obsoletos": obsoletos, "errores": errores}
+
+# ==================== EXPLAIN ====================
+
+def _etapas(plan):
+    """Etapas de un plan ganador, de la raíz a las hojas"""
+    etapas = []
+    pendientes = [plan]
+    while pendientes:
+        etapa = pendientes.pop()
+        if not isinstance(etapa, dict):
+            continue
+        if etapa.get("stage"):
+            etapas.append(etapa)
+        if "inputStage" in etapa:
+            pendientes.append(etapa["inputStage"])
+        pendientes.extend(etapa.get("inputStages", []))
+        # Consultas sobre colecciones fragmentadas: un plan por shard
+        pendientes.extend(etapa.get("shards", []))
+        if "winningPlan" in etapa:
+            pendientes.append(etapa["winningPlan"])
+    return etapas
+
+def explicar_consulta(db, consulta):
+    """
+    Ejecutar explain() sobre una consulta registrada
+
+    Returns:
+        dict: nombre, colección, etapas del plan, índices usados y si
+              recorre la colección completa (COLLSCAN)
+    """
+    cursor = db[consulta["coleccion"]].find(consulta["filtro"])
+    if consulta.get("orden"):
+        cursor = cursor.sort(consulta["orden"])
+    if consulta.get("limite"):
+        cursor = cursor.limit(consulta["limite"])
+    plan = cursor.explain()
+
+    planificador = plan.get("queryPlanner", {})
+    etapas = _etapas(planificador.get("winningPlan", {}))
+    return {
+        "nombre": consulta["nombre"],
+        "coleccion": consulta["coleccion"],
+        "etapas": [etapa["stage"] for etapa in etapas],
+        "indices": sorted({etapa["indexName"] for etapa in etapas if etapa.get("indexName")}),
+        "coleccion_completa": any(etapa["stage"] == "COLLSCAN" for etapa in etapas),
+        "orden_en_memoria": any(etapa["stage"] == "SORT" for etapa in etapas)
+    }
+
+def explicar_consultas(db):
+    """explain() de todas las consultas registradas"""
+    resultados = []
+    for consulta in CONSULTAS:
+        try:
+            resultados.append(explicar_consulta(db, consulta))
+        except PyMongoError as e:
+            resultados.append({"nombre": consulta["nombre"], "coleccion": consulta["coleccion"], "error": str(e)})
+    return resultados
@@ -0,0 +1,260 @@
+"""
+Funciones de Lecturas
+Marca de lectura por usuario y canal (último mensaje leído), conteo de no leídos
+y resumen de canales para la pantalla principal
+"""
+
+import os
+import logging
+from datetime import datetime
+from flask import request, jsonify
+from pymongo.errors import DuplicateKeyError
+from funciones.database_functions import get_db
+from funciones.chat_functions import codificar_cursor, decodificar_cursor
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Tope del conteo de no leídos: el cliente muestra "999+" y el conteo no recorre todo el canal
+NO_LEIDOS_MAXIMO = int(os.getenv('NO_LEIDOS_MAXIMO', '999'))
+
+# Caracteres del último mensaje mostrados en el resumen de canales
+VISTA_PREVIA_LONGITUD = 80
+
+# ==================== FUNCIONES AUXILIARES ====================
+
+def usuario_actual_id():
+    """ID del usuario autenticado (request.user_data lo fija el middleware)"""
+    return getattr(request, 'user_data', {}).get('user_id')
+
+def filtro_posteriores(canal, timestamp, mensaje_id):
+    """Filtro de mensajes del canal posteriores a (timestamp, _id) sobre el índice (canal, timestamp, _id)"""
+    return {
+        "canal": canal,
+        "timestamp": {"$gte": timestamp},
+        "$or": [{"timestamp": {"$gt": timestamp}}, {"_id": {"$gt": mensaje_id}}]
+    }
+
+def contar_no_leidos(db, canal, lectura):
+    """Contar mensajes del canal posteriores a la marca de lectura (hasta NO_LEIDOS_MAXIMO)"""
+    if lectura:
+        filtro = filtro_posteriores(canal, lectura["timestamp"], lectura["mensaje_id"])
+    else:
+        filtro = {"canal": canal}
+    return db.mensajes.count_documents(filtro, limit=NO_LEIDOS_MAXIMO)
+
+def serializar_lectura(canal, lectura, no_leidos):
+    """Formato JSON de una marca de lectura"""
+    return {
+        "canal": canal,
+        "cursor": codificar_cursor(lectura["timestamp"], lectura["mensaje_id"]) if lectura else None,
+        "mensaje_id": str(lectura["mensaje_id"]) if lectura else None,
+        "timestamp": lectura["timestamp"].isoformat() if lectura else None,
+        "actualizado": lectura["actualizado"].isoformat() if lectura and lectura.get("actualizado") else None,
+        "no_leidos": no_leidos
+    }
+
+# ==================== FUNCIONES DE LECTURAS ====================
+
+def avanzar_lectura(canal):
+    """Avanzar la marca de lectura del usuario en el canal
+
+    Body JSON:
+        cursor (str): Cursor del último mensaje leído (campo 'cursor' de cada mensaje)
+
+    La marca solo avanza: un cursor anterior al guardado se ignora, así los
+    clientes pueden reportar lecturas fuera de orden sin retroceder.
+    """
+    try:
+        db = get_db()
+        if db is None:
+            return jsonify({"error": "Base de datos no disponible"}), 500
+
+        usuario_id = usuario_actual_id()
+        if not usuario_id:
+            return jsonify({"error": "Usuario no identificado"}), 401
+
+        if not request.is_json:
+            return jsonify({"error": "Content-Type debe ser application/json"}), 400
+
+        datos = request.get_json()
+        if not datos:
+            return jsonify({"error": "No se recibieron datos"}), 400
+
+        timestamp, mensaje_id = decodificar_cursor(str(datos.get('cursor', '')).strip())
+        if timestamp is None:
+            return jsonify({"error": "Cursor inválido"}), 400
+
+        # Una sola escritura condicional: solo coincide si la marca guardada es anterior
+        avanzado = True
+        try:
+            db.lecturas.update_one(
+                {
+                    "usuario_id": usuario_id,
+                    "canal": canal,
+                    "$or": [
+                        {"timestamp": {"$lt": timestamp}},
+                        {"timestamp": timestamp, "mensaje_id": {"$lt": mensaje_id}}
+                    ]
+                },
+                {"$set": {
+                    "timestamp": timestamp,
+                    "mensaje_id": mensaje_id,
+                    "actualizado": datetime.now()
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Ya existe una marca igual o posterior
+            avanzado = False
+
+        lectura = db.lecturas.find_one({"usuario_id": usuario_id, "canal": canal})
+        respuesta = serializar_lectura(canal, lectura, contar_no_leidos(db, canal, lectura))
+        respuesta["avanzado"] = avanzado
+        return jsonify(respuesta), 200
+
+    except Exception as e:
+        logger.error(f"Error avanzar lectura '{canal}': {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+def obtener_lectura(canal):
+    """Obtener la marca de lectura y los no leídos del usuario en un canal"""
+    try:
+        db = get_db()
+        if db is None:
+            return jsonify({"error": "Base de datos no disponible"}), 500
+
+        usuario_id = usuario_actual_id()
+        if not usuario_id:
+            return jsonify({"error": "Usuario no identificado"}), 401
+
+        lectura = db.lecturas.find_one({"usuario_id": usuario_id, "canal": canal})
+        return jsonify(serializar_lectura(canal, lectura, contar_no_leidos(db, canal, lectura)))
+
+    except Exception as e:
+        logger.error(f"Error obtener lectura '{canal}': {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+def listar_lecturas():
+    """Marcas de lectura y no leídos del usuario en todos los canales"""
+    try:
+        db = get_db()
+        if db is None:
+            return jsonify({"error": "Base de datos no disponible"}), 500
+
+        usuario_id = usuario_actual_id()
+        if not usuario_id:
+            return jsonify({"error": "Usuario no identificado"}), 401
+
+        lecturas = {
+            lectura["canal"]: lectura
+            for lectura in db.lecturas.find({"usuario_id": usuario_id})
+        }
+        resultado = []
+        for canal in db.canales.find({}, {"_id": 0, "nombre": 1}):
+            nombre = canal["nombre"]
+            lectura = lecturas.get(nombre)
+            resultado.append(serializar_lectura(nombre, lectura, contar_no_leidos(db, nombre, lectura)))
+
+        return jsonify({
+            "lecturas": resultado,
+            "no_leidos_maximo": NO_LEIDOS_MAXIMO
+        })
+
+    except Exception as e:
+        logger.error(f"Error listar lecturas: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
+
+def resumen_canales():
+    """Resumen de canales para la pantalla principal (una sola agregación)
+
+    Por canal: último mensaje (vista previa), última actividad y no leídos
+    del usuario según su marca de lectura.
+    """
+    try:
+        db = get_db()
+        if db is None:
+            return jsonify({"error": "Base de datos no disponible"}), 500
+
+        usuario_id = usuario_actual_id()
+        if not usuario_id:
+            return jsonify({"error": "Usuario no identificado"}), 401
+
+        pipeline = [
+            {"$sort": {"nombre": 1}},
+            {"$lookup": {
+                "from": "lecturas",
+                "let": {"nombre": "$nombre"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$and": [
+                        {"$eq": ["$usuario_id", usuario_id]},
+                        {"$eq": ["$canal", "$$nombre"]}
+                    ]}}},
+                    {"$project": {"_id": 0, "timestamp": 1, "mensaje_id": 1}}
+                ],
+                "as": "lectura"
+            }},
+            {"$set": {"lectura": {"$arrayElemAt": ["$lectura", 0]}}},
+            # El último mensaje lo mantiene enviar/eliminar en el canal: búsqueda por _id
+            {"$lookup": {
+                "from": "mensajes",
+                "localField": "ultimo_mensaje_id",
+                "foreignField": "_id",
+                "as": "ultimo"
+            }},
+            # Sin marca de lectura $$ts es null y todo mensaje cuenta como no leído
+            {"$lookup": {
+                "from": "mensajes",
+                "let": {"nombre": "$nombre", "ts": "$lectura.timestamp", "mid": "$lectura.mensaje_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$and": [
+                        {"$eq": ["$canal", "$$nombre"]},
+                        {"$gte": ["$timestamp", "$$ts"]},
+                        {"$or": [
+                            {"$gt": ["$timestamp", "$$ts"]},
+                            {"$and": [
+                                {"$eq": ["$timestamp", "$$ts"]},
+                                {"$gt": ["$_id", "$$mid"]}
+                            ]}
+                        ]}
+                    ]}}},
+                    {"$limit": NO_LEIDOS_MAXIMO},
+                    {"$count": "total"}
+                ],
+                "as": "no_leidos"
+            }},
+            {"$project": {
+                "_id": 0, "nombre": 1, "descripcion": 1, "creado": 1, "total_mensajes": 1,
+                "ultimo_mensaje_timestamp": 1,
+                "ultimo": {"$arrayElemAt": ["$ultimo", 0]},
+                "no_leidos": {"$ifNull": [{"$arrayElemAt": ["$no_leidos.total", 0]}, 0]}
+            }}
+        ]
+
+        canales = []
+        for canal in db.canales.aggregate(pipeline):
+            ultimo = canal.get("ultimo")
+            ultima_actividad = canal.get("ultimo_mensaje_timestamp") or canal.get("creado")
+            canales.append({
+                "nombre": canal["nombre"],
+                "descripcion": canal.get("descripcion", ""),
+                "ultimo_mensaje": {
+                    "_id": str(ultimo["_id"]),
+                    "usuario": ultimo.get("usuario"),
+                    "vista_previa": (ultimo.get("mensaje") or "")[:VISTA_PREVIA_LONGITUD],
+                    "timestamp": ultimo["timestamp"].isoformat() if isinstance(ultimo.get("timestamp"), datetime) else None
+                } if ultimo else None,
+                "ultima_actividad": ultima_actividad.isoformat() if isinstance(ultima_actividad, datetime) else None,
+                "total_mensajes": canal.get("total_mensajes", 0),
+                "no_leidos": canal["no_leidos"]
+            })
+
+        return jsonify({
+            "canales": canales,
+            "count": len(canales),
+            "no_leidos_maximo": NO_LEIDOS_MAXIMO
+        })
+
+    except Exception as e:
+        logger.error(f"Error resumen canales: {e}")
+        return jsonify({"error": "Error interno del servidor"}), 500
@@ -0,0 +1,271 @@
+"""
+Funciones de Mantenimiento
+Tareas periódicas (archivos de reportes huérfanos, snapshots de
+cuadrillas desactualizados, asignaciones de cuadrillas eliminadas) ejecutadas
+por un único worker elegido con un lease en MongoDB
+"""
+
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import jsonify
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from funciones.database_functions import get_db
+from funciones.metrics_functions import incrementar, observar
+from funciones.asignaciones_functions import limpiar_asignaciones_huerfanas
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Los logs de seguridad los elimina MongoDB con un índice TTL (registro de indices_functions)
+RETENCION_SECURITY_LOGS_DIAS = int(os.getenv('RETENCION_SECURITY_LOGS_DIAS', '30'))
+
+# Planificador: cada cuánto se revisa, duración del lease del líder y si está activo
+MANTENIMIENTO_ACTIVO = os.getenv('MANTENIMIENTO_ACTIVO', 'true').strip().lower() in ('1', 'true', 'si', 'yes')
+MANTENIMIENTO_INTERVALO_SEGUNDOS = float(os.getenv('MANTENIMIENTO_INTERVALO_SEGUNDOS', '30'))
+MANTENIMIENTO_LEASE_SEGUNDOS = float(os.getenv('MANTENIMIENTO_LEASE_SEGUNDOS', '90'))
+
+# Un archivo sin registro se considera huérfano pasado este tiempo (evita borrar uno en generación)
+REPORTES_HUERFANOS_ANTIGUEDAD_SEGUNDOS = int(os.getenv('REPORTES_HUERFANOS_ANTIGUEDAD_SEGUNDOS', '3600'))
+DIRECTORIO_REPORTES = os.path.join("static", "reportes")
+COLECCIONES_REPORTES = ['reportes_moderadores', 'reportes_obreros', 'reportes_generales']
+
+# Colección con el lease del líder ('lider') y el estado de cada tarea
+COLECCION_MANTENIMIENTO = 'mantenimiento'
+CLAVE_LIDER = 'lider'
+
+# Identificador de este worker para el lease
+ID_WORKER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_hilo = None
+_detener = threading.Event()
+_es_lider = False
+
+# ==================== TAREAS ====================
+
+def limpiar_reportes_huerfanos():
+    """Borrar archivos de static/reportes que no pertenecen a ningún reporte registrado"""
+    if not os.path.isdir(DIRECTORIO_REPORTES):
+        return {"eliminados": 0}
+
+    db = get_db()
+    registrados = set()
+    for coleccion in COLECCIONES_REPORTES:
+        for reporte in db[coleccion].find({}, {"pdf_filename": 1, "_id": 0}):
+            if reporte.get("pdf_filename"):
+                registrados.add(reporte["pdf_filename"])
+
+    limite = time.time() - REPORTES_HUERFANOS_ANTIGUEDAD_SEGUNDOS
+    eliminados = 0
+    for nombre in os.listdir(DIRECTORIO_REPORTES):
+        ruta = os.path.join(DIRECTORIO_REPORTES, nombre)
+        if nombre in registrados or not os.path.isfile(ruta):
+            continue
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                eliminados += 1
+        except OSError as e:
+            logger.error(f"Error eliminando reporte huérfano {nombre}: {e}")
+    return {"eliminados": eliminados}
+
+def _snapshot_actual(snapshot, personas):
+    """Snapshot con los datos vigentes de la persona (o el mismo si ya no existe)"""
+    persona = personas.get(snapshot.get("id"))
+    if persona is None:
+        return snapshot
+    return {
+        "id": persona["_id"],
+        "nombre": persona.get("nombre", ""),
+        "apellidos": persona.get("apellidos", ""),
+        "cedula": persona.get("cedula", "")
+    }
+
+def actualizar_snapshots_cuadrillas():
+    """Refrescar nombre/apellidos/cédula guardados en las cuadrillas activas"""
+    db = get_db()
+    cuadrillas = list(db.cuadrillas.find({"activo": True}, {"moderador": 1, "obreros": 1}))
+    if not cuadrillas:
+        return {"actualizadas": 0}
+
+    campos = {"nombre": 1, "apellidos": 1, "cedula": 1}
+    ids_moderadores = {c["moderador"]["id"] for c in cuadrillas if c.get("moderador")}
+    ids_obreros = {o["id"] for c in cuadrillas for o in c.get("obreros", [])}
+    moderadores = {p["_id"]: p for p in db.moderadores.find({"_id": {"$in": list(ids_moderadores)}}, campos)}
+    obreros = {p["_id"]: p for p in db.obreros.find({"_id": {"$in": list(ids_obreros)}}, campos)}
+
+    operaciones = []
+    for cuadrilla in cuadrillas:
+        moderador = cuadrilla.get("moderador")
+        nuevo_moderador = _snapshot_actual(moderador, moderadores) if moderador else moderador
+        nuevos_obreros = [_snapshot_actual(o, obreros) for o in cuadrilla.get("obreros", [])]
+        if nuevo_moderador == moderador and nuevos_obreros == cuadrilla.get("obreros", []):
+            continue
+        # Condicionado al contenido leído: no pisar una edición concurrente
+        operaciones.append(UpdateOne(
+            {"_id": cuadrilla["_id"], "moderador": moderador, "obreros": cuadrilla.get("obreros", [])},
+            {"$set": {"moderador": nuevo_moderador, "obreros": nuevos_obreros}}
+        ))
+
+    if not operaciones:
+        return {"actualizadas": 0}
+    resultado = db.cuadrillas.bulk_write(operaciones, ordered=False)
+    return {"actualizadas": resultado.modified_count}
+
+# Tareas periódicas: nombre -> (función, intervalo en segundos)
+TAREAS = {
+    'reportes_huerfanos': (limpiar_reportes_huerfanos, int(os.getenv('MANT_REPORTES_SEGUNDOS', '3600'))),
+    'snapshots_cuadrillas': (actualizar_snapshots_cuadrillas, int(os.getenv('MANT_SNAPSHOTS_SEGUNDOS', '900'))),
+    'asignaciones_huerfanas': (limpiar_asignaciones_huerfanas, int(os.getenv('MANT_ASIGNACIONES_SEGUNDOS', '3600')))
+}
+
+def ejecutar_tarea(nombre):
+    """
+    Ejecutar una tarea ahora y registrar su resultado y duración
+
+    Returns:
+        dict: Estado guardado de la tarea
+    """
+    funcion, _ = TAREAS[nombre]
+    inicio = time.perf_counter()
+    estado = {"ultima_ejecucion": datetime.utcnow(), "worker": ID_WORKER}
+    try:
+        estado["resultado"] = funcion()
+        estado["error"] = None
+    except Exception as e:
+        logger.error(f"Error en tarea de mantenimiento '{nombre}': {e}")
+        incrementar('mantenimiento_errores')
+        estado["resultado"] = None
+        estado["error"] = str(e)
+    duracion = time.perf_counter() - inicio
+    observar(f'mantenimiento_{nombre}', duracion)
+    estado["duracion_ms"] = round(duracion * 1000, 2)
+
+    try:
+        get_db()[COLECCION_MANTENIMIENTO].update_one(
+            {"_id": f"tarea:{nombre}"}, {"$set": estado}, upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Error guardando estado de la tarea '{nombre}': {e}")
+    return estado
+
+# ==================== PLANIFICADOR ====================
+
+def obtener_liderazgo():
+    """
+    Tomar o renovar el lease de líder
+
+    Si otro worker tiene un lease vigente el filtro no coincide y el upsert
+    choca con el _id existente: DuplicateKeyError significa que no somos líder.
+    """
+    ahora = datetime.utcnow()
+    try:
+        get_db()[COLECCION_MANTENIMIENTO].find_one_and_update(
+            {"_id": CLAVE_LIDER, "$or": [{"propietario": ID_WORKER}, {"vence": {"$lt": ahora}}]},
+            {"$set": {
+                "propietario": ID_WORKER,
+                "vence": ahora + timedelta(seconds=MANTENIMIENTO_LEASE_SEGUNDOS),
+                "renovado": ahora
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+def _tareas_pendientes():
+    """Nombres de las tareas cuyo intervalo ya se cumplió desde la última ejecución"""
+    ultimas = {
+        doc["_id"]: doc.get("ultima_ejecucion")
+        for doc in get_db()[COLECCION_MANTENIMIENTO].find(
+            {"_id": {"$in": [f"tarea:{nombre}" for nombre in TAREAS]}}, {"ultima_ejecucion": 1}
+        )
+    }
+    ahora = datetime.utcnow()
+    return [
+        nombre for nombre, (_, intervalo) in TAREAS.items()
+        if ultimas.get(f"tarea:{nombre}") is None
+        or ultimas[f"tarea:{nombre}"] + timedelta(seconds=intervalo) <= ahora
+    ]
+
+def _ciclo():
+    """Una vuelta del planificador: renovar el lease y, si somos líder, correr lo pendiente"""
+    global _es_lider
+    _es_lider = obtener_liderazgo()
+    if not _es_lider:
+        return
+    for nombre in _tareas_pendientes():
+        if _detener.is_set():
+            return
+        ejecutar_tarea(nombre)
+
+def _planificar():
+    """Bucle del hilo de mantenimiento"""
+    while not _detener.is_set():
+        try:
+            if get_db() is not None:
+                _ciclo()
+        except Exception as e:
+            logger.error(f"Error en el planificador de mantenimiento: {e}")
+        _detener.wait(MANTENIMIENTO_INTERVALO_SEGUNDOS)
+
+def iniciar_mantenimiento():
+    """Iniciar el planificador (una vez por worker)"""
+    global _hilo
+    if get_db() is None:
+        return False
+    if not MANTENIMIENTO_ACTIVO or (_hilo and _hilo.is_alive()):
+        return False
+    _detener.clear()
+    _hilo = threading.Thread(target=_planificar, name='mantenimiento', daemon=True)
+    _hilo.start()
+    return True
+
+def detener_mantenimiento():
+    """Detener el planificador"""
+    _detener.set()
+
+# ==================== ENDPOINT ====================
+
+def api_estado_mantenimiento():
+    """Líder actual y último resultado de cada tarea"""
+    try:
+        documentos = {
+            doc.pop("_id"): doc
+            for doc in get_db()[COLECCION_MANTENIMIENTO].find({})
+        }
+        lider = documentos.get(CLAVE_LIDER) or {}
+
+        tareas = {}
+        for nombre, (_, intervalo) in TAREAS.items():
+            estado = documentos.get(f"tarea:{nombre}", {})
+            ultima = estado.get("ultima_ejecucion")
+            tareas[nombre] = {
+                "intervalo_segundos": intervalo,
+                "ultima_ejecucion": ultima.isoformat() if ultima else None,
+                "duracion_ms": estado.get("duracion_ms"),
+                "resultado": estado.get("resultado"),
+                "error": estado.get("error"),
+                "worker": estado.get("worker")
+            }
+
+        vence = lider.get("vence")
+        return jsonify({
+            "activo": MANTENIMIENTO_ACTIVO,
+            "worker": ID_WORKER,
+            "es_lider": _es_lider,
+            "lider": {
+                "propietario": lider.get("propietario"),
+                "vence": vence.isoformat() if vence else None
+            },
+            "tareas": tareas
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo estado de mantenimiento: {e}")
+        return jsonify({"error": "Error interno"}), 500
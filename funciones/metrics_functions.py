@@ -0,0 +1,60 @@
+"""
+Funciones de Métricas
+Contadores, valores y tiempos en memoria del proceso, expuestos en /metricas
+"""
+
+import logging
+import threading
+from flask import jsonify
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+_contadores = {}
+_valores = {}
+_tiempos = {}
+_lock = threading.Lock()
+
+def incrementar(nombre, cantidad=1):
+    """Sumar 'cantidad' al contador 'nombre'"""
+    with _lock:
+        _contadores[nombre] = _contadores.get(nombre, 0) + cantidad
+
+def establecer(nombre, valor):
+    """Fijar el valor actual de 'nombre' (ocupación, tamaño de cola...)"""
+    with _lock:
+        _valores[nombre] = valor
+
+def observar(nombre, segundos):
+    """Registrar una duración en el resumen 'nombre' (conteo, total y máximo)"""
+    with _lock:
+        tiempo = _tiempos.setdefault(nombre, {"conteo": 0, "total": 0.0, "maximo": 0.0})
+        tiempo["conteo"] += 1
+        tiempo["total"] += segundos
+        tiempo["maximo"] = max(tiempo["maximo"], segundos)
+
+def obtener_metricas():
+    """Copia de todas las métricas del proceso; tiempos en milisegundos"""
+    with _lock:
+        tiempos = {
+            nombre: {
+                "conteo": tiempo["conteo"],
+                "promedio_ms": round(tiempo["total"] * 1000 / tiempo["conteo"], 2) if tiempo["conteo"] else 0,
+                "maximo_ms": round(tiempo["maximo"] * 1000, 2),
+                "total_ms": round(tiempo["total"] * 1000, 2)
+            }
+            for nombre, tiempo in _tiempos.items()
+        }
+        return {
+            "contadores": dict(_contadores),
+            "valores": dict(_valores),
+            "tiempos": tiempos
+        }
+
+def api_metricas():
+    """Métricas del worker que atiende la solicitud"""
+    try:
+        return jsonify(obtener_metricas())
+    except Exception as e:
+        logger.error(f"Error obteniendo métricas: {e}")
+        return jsonify({"error": "Error interno"}), 500
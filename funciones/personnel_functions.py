@@ -4,15 +4,44 @@ Maneja todas las operaciones relacionadas con moderadores y personal
 """
 
 import logging
+import threading
 from datetime import datetime, timezone, timedelta
 from flask import request, jsonify
 from bson import ObjectId
 from funciones.database_functions import get_db
-from funciones.auth_functions import get_creator_info_from_token
+from funciones.auth_functions import (
+    get_creator_info_from_token, invalidar_estado_usuario, generar_credenciales_moderador, hash_password,
+    ServidorOcupadoError
+)
+from funciones.cache_functions import con_etag, clave_version, incrementar_version, obtener_version
+from funciones.chat_functions import parse_limite
+from funciones.busqueda_functions import tokens_busqueda, filtro_personal
+from funciones.asignaciones_functions import liberar_asignaciones
+from funciones.identidades_functions import (
+    normalizar_valores, buscar_duplicados, reclamar_identidades, liberar_identidades,
+    sincronizar_identidades, mensaje_duplicado, primer_conflicto
+)
 
 # Logger para este módulo
 logger = logging.getLogger(__name__)
 
+# Listados paginados: tamaño de página y campos que se pueden pedir con ?fields=
+PERSONAL_LIMITE_DEFECTO = 50
+PERSONAL_LIMITE_MAXIMO = 200
+CAMPOS_LISTADO = (
+    "nombre", "apellidos", "cedula", "email", "telefono", "talla_ropa",
+    "talla_zapatos", "activo", "nivel", "fecha_creacion", "creado_por"
+)
+# Orden de las páginas (índices (apellidos, nombre, _id) y (activo, apellidos, nombre, _id) en el registro de índices)
+ORDEN_LISTADO = [("apellidos", 1), ("nombre", 1), ("_id", 1)]
+# Términos normalizados de búsqueda: internos, no se devuelven en los listados
+PROYECCION_SIN_BUSQUEDA = {"busqueda": 0}
+
+# Totales por (colección, filtro), válidos mientras no cambie la versión de la colección
+CONTEOS_MAXIMO = 256
+_conteos = {}
+_conteos_lock = threading.Lock()
+
 def api_personnel_check_duplicates():
     """
     Endpoint para verificar duplicados de cédula, email y teléfono
@@ -44,77 +73,14 @@ def api_personnel_check_duplicates():
             'detalles': {}
         }
 
-        # Verificar cédula
-        if cedula:
-            query = {"cedula": cedula}
-            if exclude_id:
-                query["_id"] = {"$ne": exclude_id}
-
-            # Buscar en moderadores
-            moderador_cedula = db.moderadores.find_one(query)
-            if moderador_cedula:
-                duplicados['cedula'] = True
-                duplicados['detalles']['cedula'] = {
-                    'tipo': 'moderador',
-                    'nombre': f"{moderador_cedula.get('nombre', '')} {moderador_cedula.get('apellidos', '')}"
-                }
-            else:
-                # Buscar en obreros
-                obrero_cedula = db.obreros.find_one(query)
-                if obrero_cedula:
-                    duplicados['cedula'] = True
-                    duplicados['detalles']['cedula'] = {
-                        'tipo': 'obrero',
-                        'nombre': f"{obrero_cedula.get('nombre', '')} {obrero_cedula.get('apellidos', '')}"
-                    }
-
-        # Verificar email
-        if email:
-            query = {"email": email}
-            if exclude_id:
-                query["_id"] = {"$ne": exclude_id}
-
-            # Buscar en moderadores
-            moderador_email = db.moderadores.find_one(query)
-            if moderador_email:
-                duplicados['email'] = True
-                duplicados['detalles']['email'] = {
-                    'tipo': 'moderador',
-                    'nombre': f"{moderador_email.get('nombre', '')} {moderador_email.get('apellidos', '')}"
-                }
-            else:
-                # Buscar en obreros
-                obrero_email = db.obreros.find_one(query)
-                if obrero_email:
-                    duplicados['email'] = True
-                    duplicados['detalles']['email'] = {
-                        'tipo': 'obrero',
-                        'nombre': f"{obrero_email.get('nombre', '')} {obrero_email.get('apellidos', '')}"
-                    }
-
-        # Verificar teléfono
-        if telefono:
-            query = {"telefono": telefono}
-            if exclude_id:
-                query["_id"] = {"$ne": exclude_id}
-
-            # Buscar en moderadores
-            moderador_telefono = db.moderadores.find_one(query)
-            if moderador_telefono:
-                duplicados['telefono'] = True
-                duplicados['detalles']['telefono'] = {
-                    'tipo': 'moderador',
-                    'nombre': f"{moderador_telefono.get('nombre', '')} {moderador_telefono.get('apellidos', '')}"
-                }
-            else:
-                # Buscar en obreros
-                obrero_telefono = db.obreros.find_one(query)
-                if obrero_telefono:
-                    duplicados['telefono'] = True
-                    duplicados['detalles']['telefono'] = {
-                        'tipo': 'obrero',
-                        'nombre': f"{obrero_telefono.get('nombre', '')} {obrero_telefono.get('apellidos', '')}"
-                    }
+        # Una sola consulta al índice de identidades (moderadores y obreros)
+        valores = normalizar_valores({'cedula': cedula, 'email': email, 'telefono': telefono})
+        for campo, ocupante in buscar_duplicados(valores, excluir_id=exclude_id).items():
+            duplicados[campo] = True
+            duplicados['detalles'][campo] = {
+                'tipo': ocupante['tipo'],
+                'nombre': ocupante['nombre']
+            }
 
         return jsonify({
             "success": True,
@@ -237,33 +203,140 @@ def validate_email(email):
     
     return email_str, None
 
+# ==================== LISTADOS ====================
+
+def _filtro_listado(args):
+    """Filtro de ?q= (prefijo de nombre, apellidos, cédula o email) y ?activo= - retorna (filtro, error)"""
+    filtro = {}
+
+    activo = args.get('activo', '').strip().lower()
+    if activo:
+        if activo not in ('true', 'false', '1', '0'):
+            return None, "El parámetro activo debe ser true o false"
+        filtro["activo"] = activo in ('true', '1')
+
+    # Sin tildes ni mayúsculas, sobre el índice de 'busqueda'
+    filtro.update(filtro_personal(args.get('q', '')))
+    return filtro, None
+
+def _proyeccion_listado(valor):
+    """Proyección de ?fields=nombre,cedula (None = todos) - retorna (proyeccion, error)"""
+    if not valor:
+        return PROYECCION_SIN_BUSQUEDA, None
+    campos = [campo.strip() for campo in valor.split(',') if campo.strip()]
+    invalidos = [campo for campo in campos if campo not in CAMPOS_LISTADO]
+    if invalidos:
+        return None, f"Campos no permitidos: {', '.join(invalidos)}"
+    return {campo: 1 for campo in campos}, None
+
+def contar_personal(coleccion, filtro):
+    """Total de documentos del filtro, recalculado solo cuando cambia la versión de la colección"""
+    version = obtener_version(clave_version(coleccion))
+    clave = (coleccion, repr(sorted(filtro.items())))
+    with _conteos_lock:
+        guardado = _conteos.get(clave)
+        if guardado and guardado[0] == version:
+            return guardado[1]
+
+    total = get_db()[coleccion].count_documents(filtro)
+    with _conteos_lock:
+        if len(_conteos) >= CONTEOS_MAXIMO:
+            _conteos.clear()
+        _conteos[clave] = (version, total)
+    return total
+
+def listar_personal(coleccion, clave_respuesta):
+    """
+    Listado de moderadores u obreros
+
+    Sin parámetros retorna la colección completa (clientes anteriores). Con
+    page, limit, q, activo o fields retorna una página ordenada por
+    apellidos y nombre con el total del filtro.
+
+    Ninguna de las dos respuestas incluye un 'timestamp' por solicitud: con la
+    misma versión de la colección el cuerpo es idéntico (ETag estable).
+    """
+    db = get_db()
+    if db is None:
+        return jsonify({"error": "Base de datos no disponible"}), 500
+
+    args = request.args
+    if not any(args.get(p) for p in ('page', 'limit', 'q', 'activo', 'fields')):
+        personas = list(db[coleccion].find({}, PROYECCION_SIN_BUSQUEDA))
+        for persona in personas:
+            persona["_id"] = str(persona["_id"])
+        logger.info(f"{coleccion} encontrados: {len(personas)}")
+        return jsonify({"success": True, clave_respuesta: personas, "count": len(personas)})
+
+    try:
+        pagina = int(args.get('page') or 1)
+    except ValueError:
+        return jsonify({"error": "El parámetro page debe ser un número entero"}), 400
+    if pagina < 1:
+        return jsonify({"error": "El parámetro page debe ser mayor que 0"}), 400
+
+    limite, error = parse_limite(args.get('limit'), PERSONAL_LIMITE_DEFECTO, PERSONAL_LIMITE_MAXIMO)
+    if error:
+        return jsonify({"error": error}), 400
+    filtro, error = _filtro_listado(args)
+    if error:
+        return jsonify({"error": error}), 400
+    proyeccion, error = _proyeccion_listado(args.get('fields', '').strip())
+    if error:
+        return jsonify({"error": error}), 400
+
+    personas = list(
+        db[coleccion].find(filtro, proyeccion)
+        .sort(ORDEN_LISTADO)
+        .skip((pagina - 1) * limite)
+        .limit(limite)
+    )
+    for persona in personas:
+        persona["_id"] = str(persona["_id"])
+
+    total = contar_personal(coleccion, filtro)
+    return jsonify({
+        "success": True,
+        clave_respuesta: personas,
+        "count": len(personas),
+        "total": total,
+        "page": pagina,
+        "limit": limite,
+        "pages": (total + limite - 1) // limite
+    })
+
+@con_etag(lambda: [clave_version("moderadores")])
 def api_personnel_moderadores():
-    """Personnel - moderators - lista desde base de datos"""
+    """Personnel - moderators - lista desde base de datos (paginada con page/limit/q/activo/fields)"""
     try:
-        db = get_db()
-        if db is None:
-            return jsonify({"error": "Base de datos no disponible"}), 500
-        
-        # Buscar todos los moderadores en la colección
-        moderadores = list(db.moderadores.find({}))
-
-        # Convertir ObjectId a string para JSON
-        for mod in moderadores:
-            mod["_id"] = str(mod["_id"])
-        
-        logger.info(f"Moderadores encontrados: {len(moderadores)}")
-        
-        return jsonify({
-            "success": True,
-            "moderadores": moderadores,
-            "count": len(moderadores),
-            "timestamp": datetime.now().isoformat()
-        })
-        
+        return listar_personal("moderadores", "moderadores")
     except Exception as e:
         logger.error(f"Error obtener moderadores: {e}")
         return jsonify({"error": str(e)}), 500
 
+def credenciales_moderador(nombre, apellidos, cedula):
+    """
+    Usuario, contraseña y hash para el usuario de un moderador
+
+    Se calculan antes de escribir el moderador: con el pool de bcrypt saturado
+    la solicitud responde 503 sin dejar un moderador sin usuario.
+
+    Returns:
+        tuple: (usuario, contraseña, hash) o None si no se pudieron generar
+
+    Raises:
+        ServidorOcupadoError: Si el pool de bcrypt está saturado
+    """
+    usuario, contraseña = generar_credenciales_moderador(nombre, apellidos, cedula)
+    if not usuario or not contraseña:
+        logger.warning(f"⚠️ Error generando credenciales para moderador {nombre}")
+        return None
+    password_hash = hash_password(contraseña)
+    if not password_hash:
+        logger.warning(f"⚠️ Error hasheando contraseña para moderador {nombre}")
+        return None
+    return usuario, contraseña, password_hash
+
 def api_personnel_moderadores_create():
     """Create moderator - guarda en base de datos"""
     try:
@@ -381,26 +454,19 @@ def api_personnel_moderadores_create():
                 }
             }), 400
         
-        # VALIDACIÓN CRUZADA: Verificar que no exista el email en moderadores Y obreros
-        if db.moderadores.find_one({"email": email}):
-            return jsonify({"error": f"Ya existe un moderador con el email '{email}'"}), 400
-        if db.obreros.find_one({"email": email}):
-            return jsonify({"error": f"Ya existe un obrero con el email '{email}'"}), 400
-
-        # VALIDACIÓN CRUZADA: Verificar que no exista la cédula en moderadores Y obreros
-        if db.moderadores.find_one({"cedula": cedula_valida}):
-            return jsonify({"error": f"Ya existe un moderador con la cédula '{cedula_valida}'"}), 400
-        if db.obreros.find_one({"cedula": cedula_valida}):
-            return jsonify({"error": f"Ya existe un obrero con la cédula '{cedula_valida}'"}), 400
-
         # Obtener campos adicionales
         telefono = datos.get('telefono', '').strip()
 
-        # VALIDACIÓN CRUZADA: Verificar que no exista el teléfono en moderadores Y obreros
-        if telefono and db.moderadores.find_one({"telefono": telefono}):
-            return jsonify({"error": f"Ya existe un moderador con el teléfono '{telefono}'"}), 400
-        if telefono and db.obreros.find_one({"telefono": telefono}):
-            return jsonify({"error": f"Ya existe un obrero con el teléfono '{telefono}'"}), 400
+        # VALIDACIÓN CRUZADA: reservar email, cédula y teléfono en el índice de identidades
+        # (único para moderadores y obreros); si la inserción falla se liberan
+        moderador_id = ObjectId()
+        identidades_reservadas, conflictos = reclamar_identidades(
+            moderador_id, 'moderador', f"{nombre} {apellidos}",
+            normalizar_valores({'cedula': cedula_valida, 'email': email, 'telefono': telefono})
+        )
+        if conflictos:
+            campo, ocupante = primer_conflicto(conflictos)
+            return jsonify({"error": mensaje_duplicado(campo, ocupante)}), 400
         
         # FIX: Manejar campos opcionales que pueden ser None/null
         talla_ropa_raw = datos.get('talla_ropa')
@@ -433,12 +499,26 @@ def api_personnel_moderadores_create():
             "fecha_creacion": get_venezuela_time(),
             "creado_por": get_creator_info_from_token()
         }
+        documento_moderador["busqueda"] = tokens_busqueda(documento_moderador)
         
         logger.info(f"📄 DOCUMENTO A GUARDAR: {documento_moderador}")
         logger.info(f"🔑 CEDULA EN DOCUMENTO: '{documento_moderador.get('cedula')}' (tipo: {type(documento_moderador.get('cedula'))})")
         
+        # Credenciales del usuario antes de guardar (503 si bcrypt está saturado)
+        try:
+            credenciales = credenciales_moderador(nombre, apellidos, cedula_valida)
+        except ServidorOcupadoError:
+            liberar_identidades(identidades_reservadas)
+            raise
+
         # Guardar en base de datos
-        resultado = db.moderadores.insert_one(documento_moderador)
+        documento_moderador["_id"] = moderador_id
+        try:
+            resultado = db.moderadores.insert_one(documento_moderador)
+        except Exception:
+            liberar_identidades(identidades_reservadas)
+            raise
+        incrementar_version("moderadores")
         
         logger.info(f"💾 GUARDADO EXITOSO: ID = {resultado.inserted_id}")
         
@@ -452,64 +532,51 @@ def api_personnel_moderadores_create():
 
         # NUEVO: Crear automáticamente usuario correspondiente para el moderador
         try:
-            from funciones.auth_functions import generar_credenciales_moderador, hash_password
-
-            # Generar credenciales automáticas
-            usuario, contraseña = generar_credenciales_moderador(nombre, apellidos, cedula_valida)
-
-            if usuario and contraseña:
-                # Hashear contraseña
-                password_hash = hash_password(contraseña)
-
-                if password_hash:
-                    # Crear entrada en colección usuarios
-                    usuario_data = {
-                        'tipo_usuario': 'moderador',
-                        'username': usuario,
-                        'password': password_hash,
-                        'nombre_completo': f"{nombre} {apellidos}",
-                        'cedula': cedula_valida,
-                        'email': email,
-                        'personal_id': resultado.inserted_id,
-                        'activo': True,
-                        'fecha_creacion': get_venezuela_time(),
-                        'ultimo_acceso': None,
-                        'intentos_fallidos': 0
-                    }
+            if credenciales:
+                usuario, contraseña, password_hash = credenciales
+                # Crear entrada en colección usuarios
+                usuario_data = {
+                    'tipo_usuario': 'moderador',
+                    'username': usuario,
+                    'password': password_hash,
+                    'nombre_completo': f"{nombre} {apellidos}",
+                    'cedula': cedula_valida,
+                    'email': email,
+                    'personal_id': resultado.inserted_id,
+                    'activo': True,
+                    'fecha_creacion': get_venezuela_time(),
+                    'ultimo_acceso': None
+                }
 
-                    resultado_usuario = db.usuarios.insert_one(usuario_data)
-
-                    if resultado_usuario.inserted_id:
-                        logger.info(f"✅ Usuario creado automáticamente para moderador {nombre}: Usuario={usuario}, Contraseña={contraseña}")
-
-                        return jsonify({
-                            "success": True,
-                            "message": "Moderador registrado exitosamente con credenciales automáticas",
-                            "moderador_id": str(resultado.inserted_id),
-                            "credenciales": {
-                                "usuario": usuario,
-                                "contraseña": contraseña
-                            },
-                            "data": {
-                                "nombre": nombre,
-                                "apellidos": apellidos,
-                                "cedula": cedula_valida,
-                                "email": email,
-                                "telefono": telefono,
-                                "talla_ropa": talla_ropa,
-                                "talla_zapatos": talla_zapatos,
-                                "activo": documento_moderador["activo"],
-                                "nivel": documento_moderador["nivel"],
-                                "fecha_creacion": documento_moderador["fecha_creacion"],
-                                "creado_por": documento_moderador["creado_por"]
-                            }
-                        }), 201
-                    else:
-                        logger.warning(f"⚠️ Error creando usuario para moderador {nombre}")
+                resultado_usuario = db.usuarios.insert_one(usuario_data)
+
+                if resultado_usuario.inserted_id:
+                    logger.info(f"✅ Usuario creado automáticamente para moderador {nombre}: Usuario={usuario}, Contraseña={contraseña}")
+
+                    return jsonify({
+                        "success": True,
+                        "message": "Moderador registrado exitosamente con credenciales automáticas",
+                        "moderador_id": str(resultado.inserted_id),
+                        "credenciales": {
+                            "usuario": usuario,
+                            "contraseña": contraseña
+                        },
+                        "data": {
+                            "nombre": nombre,
+                            "apellidos": apellidos,
+                            "cedula": cedula_valida,
+                            "email": email,
+                            "telefono": telefono,
+                            "talla_ropa": talla_ropa,
+                            "talla_zapatos": talla_zapatos,
+                            "activo": documento_moderador["activo"],
+                            "nivel": documento_moderador["nivel"],
+                            "fecha_creacion": documento_moderador["fecha_creacion"],
+                            "creado_por": documento_moderador["creado_por"]
+                        }
+                    }), 201
                 else:
-                    logger.warning(f"⚠️ Error hasheando contraseña para moderador {nombre}")
-            else:
-                logger.warning(f"⚠️ Error generando credenciales para moderador {nombre}")
+                    logger.warning(f"⚠️ Error creando usuario para moderador {nombre}")
         except Exception as e:
             logger.error(f"❌ Error creando usuario automático para moderador {nombre}: {e}")
 
@@ -534,6 +601,8 @@ def api_personnel_moderadores_create():
             }
         }), 201
         
+    except ServidorOcupadoError:
+        raise
     except Exception as e:
         logger.error(f"Error crear moderador: {e}")
         return jsonify({"error": "Error interno del servidor"}), 500
@@ -639,34 +708,19 @@ def api_personnel_moderadores_update():
         if error_cedula:
             return jsonify({"error": error_cedula}), 400
         
-        # VALIDACIÓN CRUZADA: Verificar unicidad solo si se cambió el email
-        if email != moderador_existente.get('email'):
-            # Verificar en moderadores (excluyendo el actual)
-            if db.moderadores.find_one({"email": email, "cedula": {"$ne": cedula_original}}):
-                return jsonify({"error": f"Ya existe otro moderador con el email '{email}'"}), 400
-            # Verificar en obreros
-            if db.obreros.find_one({"email": email}):
-                return jsonify({"error": f"Ya existe un obrero con el email '{email}'"}), 400
-
-        # VALIDACIÓN CRUZADA: Verificar unicidad solo si se cambió la cédula
-        if cedula_valida != cedula_original:
-            # Verificar en moderadores
-            if db.moderadores.find_one({"cedula": cedula_valida}):
-                return jsonify({"error": f"Ya existe otro moderador con la cédula '{cedula_valida}'"}), 400
-            # Verificar en obreros
-            if db.obreros.find_one({"cedula": cedula_valida}):
-                return jsonify({"error": f"Ya existe un obrero con la cédula '{cedula_valida}'"}), 400
-
-        # VALIDACIÓN CRUZADA: Verificar unicidad del teléfono solo si se cambió
+        # VALIDACIÓN CRUZADA: reservar solo los valores que cambian (una inserción al
+        # índice de identidades); los anteriores se liberan tras actualizar
         telefono = datos.get('telefono', '').strip()
-        if telefono and telefono != moderador_existente.get('telefono'):
-            # Verificar en moderadores (excluyendo el actual)
-            if db.moderadores.find_one({"telefono": telefono, "cedula": {"$ne": cedula_original}}):
-                return jsonify({"error": f"Ya existe otro moderador con el teléfono '{telefono}'"}), 400
-            # Verificar en obreros
-            if db.obreros.find_one({"telefono": telefono}):
-                return jsonify({"error": f"Ya existe un obrero con el teléfono '{telefono}'"}), 400
-        
+        valores_anteriores = normalizar_valores(moderador_existente)
+        valores_nuevos = normalizar_valores({'cedula': cedula_valida, 'email': email, 'telefono': telefono})
+        identidades_reservadas, conflictos = reclamar_identidades(
+            moderador_existente["_id"], 'moderador', f"{nombre} {apellidos}",
+            {campo: valor for campo, valor in valores_nuevos.items() if valores_anteriores.get(campo) != valor}
+        )
+        if conflictos:
+            campo, ocupante = primer_conflicto(conflictos)
+            return jsonify({"error": mensaje_duplicado(campo, ocupante, 'moderador')}), 400
+
         # Manejar campos opcionales
         talla_ropa_raw = datos.get('talla_ropa')
         talla_zapatos_raw = datos.get('talla_zapatos')
@@ -695,14 +749,32 @@ def api_personnel_moderadores_update():
             "fecha_modificacion": get_venezuela_time(),
             "modificado_por": "sistema"
         }
+        documento_actualizado["busqueda"] = tokens_busqueda(documento_actualizado)
         
         logger.info(f"Documento a actualizar: {documento_actualizado}")
+
+        # Credenciales nuevas (cédula cambiada o moderador sin usuario) antes de
+        # actualizar (503 si bcrypt está saturado)
+        usuario_existente = db.usuarios.find_one({"personal_id": moderador_existente["_id"]})
+        credenciales = None
+        if not usuario_existente or cedula_valida != cedula_original:
+            try:
+                credenciales = credenciales_moderador(nombre, apellidos, cedula_valida)
+            except ServidorOcupadoError:
+                liberar_identidades(identidades_reservadas)
+                raise
         
         # Actualizar en base de datos
-        resultado = db.moderadores.update_one(
-            {"cedula": cedula_original},
-            {"$set": documento_actualizado}
-        )
+        try:
+            resultado = db.moderadores.update_one(
+                {"cedula": cedula_original},
+                {"$set": documento_actualizado}
+            )
+        except Exception:
+            liberar_identidades(identidades_reservadas)
+            raise
+        if resultado.modified_count:
+            incrementar_version("moderadores")
         
         if resultado.modified_count == 0:
             logger.warning("No se modificó ningún documento - posiblemente datos idénticos")
@@ -710,15 +782,17 @@ def api_personnel_moderadores_update():
             if resultado.matched_count > 0:
                 logger.info("Moderador encontrado pero sin cambios")
             else:
+                liberar_identidades(identidades_reservadas)
                 return jsonify({"error": "No se encontró el moderador para actualizar"}), 404
+
+        sincronizar_identidades(
+            moderador_existente["_id"], 'moderador', f"{nombre} {apellidos}", valores_anteriores, valores_nuevos
+        )
         
         logger.info(f"Moderador actualizado exitosamente: {nombre} ({email})")
 
         # NUEVO: Actualizar usuario correspondiente si existe, o crearlo si no existe
         try:
-            # Buscar usuario existente por personal_id
-            usuario_existente = db.usuarios.find_one({"personal_id": moderador_existente["_id"]})
-
             if usuario_existente:
                 # Actualizar usuario existente
                 update_data_usuario = {
@@ -729,16 +803,11 @@ def api_personnel_moderadores_update():
                 }
 
                 # Si la cédula cambió, regenerar credenciales
-                if cedula_valida != cedula_original:
-                    from funciones.auth_functions import generar_credenciales_moderador, hash_password
-                    nuevo_usuario, nueva_contraseña = generar_credenciales_moderador(nombre, apellidos, cedula_valida)
-
-                    if nuevo_usuario and nueva_contraseña:
-                        nuevo_password_hash = hash_password(nueva_contraseña)
-                        if nuevo_password_hash:
-                            update_data_usuario['username'] = nuevo_usuario
-                            update_data_usuario['password'] = nuevo_password_hash
-                            logger.info(f"✅ Credenciales actualizadas para moderador {nombre}: Usuario={nuevo_usuario}, Contraseña={nueva_contraseña}")
+                if credenciales:
+                    nuevo_usuario, nueva_contraseña, nuevo_password_hash = credenciales
+                    update_data_usuario['username'] = nuevo_usuario
+                    update_data_usuario['password'] = nuevo_password_hash
+                    logger.info(f"✅ Credenciales actualizadas para moderador {nombre}: Usuario={nuevo_usuario}, Contraseña={nueva_contraseña}")
 
                 resultado_update_usuario = db.usuarios.update_one(
                     {"personal_id": moderador_existente["_id"]},
@@ -750,40 +819,35 @@ def api_personnel_moderadores_update():
                 else:
                     logger.info(f"ℹ️ Usuario no requería actualizaciones para moderador {nombre}")
 
-            else:
+            elif credenciales:
                 # Usuario no existe, crearlo
-                from funciones.auth_functions import generar_credenciales_moderador, hash_password
-
-                usuario, contraseña = generar_credenciales_moderador(nombre, apellidos, cedula_valida)
-
-                if usuario and contraseña:
-                    password_hash = hash_password(contraseña)
-
-                    if password_hash:
-                        usuario_data = {
-                            'tipo_usuario': 'moderador',
-                            'username': usuario,
-                            'password': password_hash,
-                            'nombre_completo': f"{nombre} {apellidos}",
-                            'cedula': cedula_valida,
-                            'email': email,
-                            'personal_id': moderador_existente["_id"],
-                            'activo': True,
-                            'fecha_creacion': get_venezuela_time(),
-                            'ultimo_acceso': None,
-                            'intentos_fallidos': 0
-                        }
+                usuario, contraseña, password_hash = credenciales
+                usuario_data = {
+                    'tipo_usuario': 'moderador',
+                    'username': usuario,
+                    'password': password_hash,
+                    'nombre_completo': f"{nombre} {apellidos}",
+                    'cedula': cedula_valida,
+                    'email': email,
+                    'personal_id': moderador_existente["_id"],
+                    'activo': True,
+                    'fecha_creacion': get_venezuela_time(),
+                    'ultimo_acceso': None
+                }
 
-                        resultado_nuevo_usuario = db.usuarios.insert_one(usuario_data)
+                resultado_nuevo_usuario = db.usuarios.insert_one(usuario_data)
 
-                        if resultado_nuevo_usuario.inserted_id:
-                            logger.info(f"✅ Usuario creado automáticamente para moderador actualizado {nombre}: Usuario={usuario}, Contraseña={contraseña}")
+                if resultado_nuevo_usuario.inserted_id:
+                    logger.info(f"✅ Usuario creado automáticamente para moderador actualizado {nombre}: Usuario={usuario}, Contraseña={contraseña}")
 
         except Exception as e:
             logger.error(f"❌ Error sincronizando usuario para moderador actualizado {nombre}: {e}")
 
+        # Las sesiones del moderador vuelven a consultar su estado activo
+        invalidar_estado_usuario(personal_id=moderador_existente["_id"])
+
         # Obtener documento actualizado para respuesta
-        moderador_actualizado = db.moderadores.find_one({"cedula": cedula_valida}, {"_id": 0})
+        moderador_actualizado = db.moderadores.find_one({"cedula": cedula_valida}, {"_id": 0, "busqueda": 0})
         
         return jsonify({
             "success": True,
@@ -795,6 +859,8 @@ def api_personnel_moderadores_update():
             }
         }), 200
         
+    except ServidorOcupadoError:
+        raise
     except Exception as e:
         logger.error(f"Error actualizar moderador: {e}")
         return jsonify({"error": "Error interno del servidor"}), 500
@@ -904,6 +970,9 @@ def api_personnel_moderadores_delete():
         
         # Eliminar de base de datos
         resultado = db.moderadores.delete_one({"cedula": cedula})
+        if resultado.deleted_count:
+            incrementar_version("moderadores")
+            liberar_identidades(persona_id=moderador_existente["_id"])
 
         if resultado.deleted_count == 0:
             logger.warning("No se eliminó ningún documento")
@@ -919,6 +988,8 @@ def api_personnel_moderadores_delete():
         except Exception as e:
             logger.error(f"❌ Error eliminando usuario asociado al moderador {moderador_eliminado['nombre']} {moderador_eliminado['apellidos']}: {e}")
 
+        invalidar_estado_usuario(personal_id=moderador_existente["_id"])
+
         logger.info(f"Moderador eliminado exitosamente: {moderador_eliminado['nombre']} {moderador_eliminado['apellidos']}")
         
         return jsonify({
@@ -934,29 +1005,11 @@ def api_personnel_moderadores_delete():
 
 # ==================== FUNCIONES DE OBREROS ====================
 
+@con_etag(lambda: [clave_version("obreros")])
 def api_personnel_obreros():
-    """Personnel - obreros - lista desde base de datos"""
+    """Personnel - obreros - lista desde base de datos (paginada con page/limit/q/activo/fields)"""
     try:
-        db = get_db()
-        if db is None:
-            return jsonify({"error": "Base de datos no disponible"}), 500
-
-        # Buscar todos los obreros en la colección
-        obreros = list(db.obreros.find({}))
-
-        # Convertir ObjectId a string para JSON
-        for obrero in obreros:
-            obrero["_id"] = str(obrero["_id"])
-
-        logger.info(f"Obreros encontrados: {len(obreros)}")
-
-        return jsonify({
-            "success": True,
-            "obreros": obreros,
-            "count": len(obreros),
-            "timestamp": datetime.now().isoformat()
-        })
-
+        return listar_personal("obreros", "obreros")
     except Exception as e:
         logger.error(f"Error obtener obreros: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1078,26 +1131,19 @@ def api_personnel_obreros_create():
                 }
             }), 400
 
-        # VALIDACIÓN CRUZADA: Verificar que no exista el email en obreros Y moderadores
-        if db.obreros.find_one({"email": email}):
-            return jsonify({"error": f"Ya existe un obrero con el email '{email}'"}), 400
-        if db.moderadores.find_one({"email": email}):
-            return jsonify({"error": f"Ya existe un moderador con el email '{email}'"}), 400
-
-        # VALIDACIÓN CRUZADA: Verificar que no exista la cédula en obreros Y moderadores
-        if db.obreros.find_one({"cedula": cedula_valida}):
-            return jsonify({"error": f"Ya existe un obrero con la cédula '{cedula_valida}'"}), 400
-        if db.moderadores.find_one({"cedula": cedula_valida}):
-            return jsonify({"error": f"Ya existe un moderador con la cédula '{cedula_valida}'"}), 400
-
         # Obtener campos adicionales
         telefono = datos.get('telefono', '').strip()
 
-        # VALIDACIÓN CRUZADA: Verificar que no exista el teléfono en obreros Y moderadores
-        if telefono and db.obreros.find_one({"telefono": telefono}):
-            return jsonify({"error": f"Ya existe un obrero con el teléfono '{telefono}'"}), 400
-        if telefono and db.moderadores.find_one({"telefono": telefono}):
-            return jsonify({"error": f"Ya existe un moderador con el teléfono '{telefono}'"}), 400
+        # VALIDACIÓN CRUZADA: reservar email, cédula y teléfono en el índice de identidades
+        # (único para moderadores y obreros); si la inserción falla se liberan
+        obrero_id = ObjectId()
+        identidades_reservadas, conflictos = reclamar_identidades(
+            obrero_id, 'obrero', f"{nombre} {apellidos}",
+            normalizar_valores({'cedula': cedula_valida, 'email': email, 'telefono': telefono})
+        )
+        if conflictos:
+            campo, ocupante = primer_conflicto(conflictos)
+            return jsonify({"error": mensaje_duplicado(campo, ocupante)}), 400
 
         # Manejar campos opcionales que pueden ser None/null
         talla_ropa_raw = datos.get('talla_ropa')
@@ -1130,12 +1176,19 @@ def api_personnel_obreros_create():
             "fecha_creacion": get_venezuela_time(),
             "creado_por": get_creator_info_from_token()
         }
+        documento_obrero["busqueda"] = tokens_busqueda(documento_obrero)
 
         logger.info(f"📄 DOCUMENTO A GUARDAR: {documento_obrero}")
         logger.info(f"🔑 CEDULA EN DOCUMENTO: '{documento_obrero.get('cedula')}' (tipo: {type(documento_obrero.get('cedula'))})")
 
         # Guardar en base de datos
-        resultado = db.obreros.insert_one(documento_obrero)
+        documento_obrero["_id"] = obrero_id
+        try:
+            resultado = db.obreros.insert_one(documento_obrero)
+        except Exception:
+            liberar_identidades(identidades_reservadas)
+            raise
+        incrementar_version("obreros")
 
         logger.info(f"💾 GUARDADO EXITOSO: ID = {resultado.inserted_id}")
 
@@ -1252,33 +1305,18 @@ def api_personnel_obreros_update():
         if error_cedula:
             return jsonify({"error": error_cedula}), 400
 
-        # VALIDACIÓN CRUZADA: Verificar unicidad solo si se cambió el email
-        if email != obrero_existente.get('email'):
-            # Verificar en obreros (excluyendo el actual)
-            if db.obreros.find_one({"email": email, "cedula": {"$ne": cedula_original}}):
-                return jsonify({"error": f"Ya existe otro obrero con el email '{email}'"}), 400
-            # Verificar en moderadores
-            if db.moderadores.find_one({"email": email}):
-                return jsonify({"error": f"Ya existe un moderador con el email '{email}'"}), 400
-
-        # VALIDACIÓN CRUZADA: Verificar unicidad solo si se cambió la cédula
-        if cedula_valida != cedula_original:
-            # Verificar en obreros
-            if db.obreros.find_one({"cedula": cedula_valida}):
-                return jsonify({"error": f"Ya existe otro obrero con la cédula '{cedula_valida}'"}), 400
-            # Verificar en moderadores
-            if db.moderadores.find_one({"cedula": cedula_valida}):
-                return jsonify({"error": f"Ya existe un moderador con la cédula '{cedula_valida}'"}), 400
-
-        # VALIDACIÓN CRUZADA: Verificar unicidad del teléfono solo si se cambió
+        # VALIDACIÓN CRUZADA: reservar solo los valores que cambian (una inserción al
+        # índice de identidades); los anteriores se liberan tras actualizar
         telefono = datos.get('telefono', '').strip()
-        if telefono and telefono != obrero_existente.get('telefono'):
-            # Verificar en obreros (excluyendo el actual)
-            if db.obreros.find_one({"telefono": telefono, "cedula": {"$ne": cedula_original}}):
-                return jsonify({"error": f"Ya existe otro obrero con el teléfono '{telefono}'"}), 400
-            # Verificar en moderadores
-            if db.moderadores.find_one({"telefono": telefono}):
-                return jsonify({"error": f"Ya existe un moderador con el teléfono '{telefono}'"}), 400
+        valores_anteriores = normalizar_valores(obrero_existente)
+        valores_nuevos = normalizar_valores({'cedula': cedula_valida, 'email': email, 'telefono': telefono})
+        identidades_reservadas, conflictos = reclamar_identidades(
+            obrero_existente["_id"], 'obrero', f"{nombre} {apellidos}",
+            {campo: valor for campo, valor in valores_nuevos.items() if valores_anteriores.get(campo) != valor}
+        )
+        if conflictos:
+            campo, ocupante = primer_conflicto(conflictos)
+            return jsonify({"error": mensaje_duplicado(campo, ocupante, 'obrero')}), 400
 
         # Manejar campos opcionales
         talla_ropa_raw = datos.get('talla_ropa')
@@ -1308,14 +1346,22 @@ def api_personnel_obreros_update():
             "fecha_modificacion": get_venezuela_time(),
             "modificado_por": "sistema"
         }
+        documento_actualizado["busqueda"] = tokens_busqueda(documento_actualizado)
 
         logger.info(f"Documento a actualizar: {documento_actualizado}")
 
         # Actualizar en base de datos
-        resultado = db.obreros.update_one(
-            {"cedula": cedula_original},
-            {"$set": documento_actualizado}
-        )
+        try:
+            resultado = db.obreros.update_one(
+                {"cedula": cedula_original},
+                {"$set": documento_actualizado}
+            )
+        except Exception:
+            liberar_identidades(identidades_reservadas)
+            raise
+        if resultado.modified_count:
+            incrementar_version("obreros")
+            invalidar_estado_usuario(user_id=obrero_existente["_id"])
 
         if resultado.modified_count == 0:
             logger.warning("No se modificó ningún documento - posiblemente datos idénticos")
@@ -1323,12 +1369,17 @@ def api_personnel_obreros_update():
             if resultado.matched_count > 0:
                 logger.info("Obrero encontrado pero sin cambios")
             else:
+                liberar_identidades(identidades_reservadas)
                 return jsonify({"error": "No se encontró el obrero para actualizar"}), 404
 
+        sincronizar_identidades(
+            obrero_existente["_id"], 'obrero', f"{nombre} {apellidos}", valores_anteriores, valores_nuevos
+        )
+
         logger.info(f"Obrero actualizado exitosamente: {nombre} ({email})")
 
         # Obtener documento actualizado para respuesta
-        obrero_actualizado = db.obreros.find_one({"cedula": cedula_valida}, {"_id": 0})
+        obrero_actualizado = db.obreros.find_one({"cedula": cedula_valida}, {"_id": 0, "busqueda": 0})
 
         return jsonify({
             "success": True,
@@ -1449,6 +1500,12 @@ def api_personnel_obreros_delete():
 
         # Eliminar de base de datos
         resultado = db.obreros.delete_one({"cedula": cedula})
+        if resultado.deleted_count:
+            incrementar_version("obreros")
+            liberar_identidades(persona_id=obrero_existente["_id"])
+            # Sin cuadrillas activas no debería tener asignación; se libera por si quedó una
+            liberar_asignaciones(claves=[obrero_existente["_id"]])
+            invalidar_estado_usuario(user_id=obrero_existente["_id"])
 
         if resultado.deleted_count == 0:
             logger.warning("No se eliminó ningún documento")
@@ -0,0 +1,327 @@
+"""
+Funciones de Límite de Tasa
+Contadores de ventana deslizante por clave (IP, usuario, cédula) con
+almacén intercambiable:
+
+- memoria: contadores en el proceso (un worker o límites aproximados por worker)
+- mongo: contadores compartidos en la colección TTL 'limites_tasa'
+
+y cubetas de tokens por usuario y ruta para el resto de la API
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify
+from pymongo import ReturnDocument
+from funciones.database_functions import get_db
+from funciones.metrics_functions import incrementar, establecer
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Almacén de contadores: 'memoria' o 'mongo'
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memoria').strip().lower()
+
+# Proxies de confianza delante de la app (Render agrega uno): la IP del cliente
+# es la entrada de X-Forwarded-For que añadió el último de ellos
+RATE_LIMIT_PROXIES = int(os.getenv('RATE_LIMIT_PROXIES', '1'))
+
+def ip_cliente():
+    """IP del cliente según X-Forwarded-For y los proxies de confianza"""
+    ruta = request.access_route
+    if RATE_LIMIT_PROXIES and len(ruta) >= RATE_LIMIT_PROXIES:
+        return ruta[-RATE_LIMIT_PROXIES]
+    return request.remote_addr
+
+# ==================== ALMACENES ====================
+
+class AlmacenMemoria:
+    """Contadores por (clave, ventana) en un diccionario del proceso"""
+
+    nombre = 'memoria'
+
+    # Cada cuántas escrituras se purgan las ventanas viejas
+    PURGA_CADA = 1000
+
+    def __init__(self):
+        self._contadores = {}
+        self._lock = threading.Lock()
+        self._escrituras = 0
+
+    def contar(self, clave, ventana):
+        """Retorna (conteo de la ventana actual, conteo de la anterior)"""
+        with self._lock:
+            ventanas = self._contadores.get(clave, {})
+            return ventanas.get(ventana, 0), ventanas.get(ventana - 1, 0)
+
+    def incrementar(self, clave, ventana, duracion):
+        with self._lock:
+            ventanas = self._contadores.setdefault(clave, {})
+            ventanas[ventana] = ventanas.get(ventana, 0) + 1
+            for vieja in [v for v in ventanas if v < ventana - 1]:
+                del ventanas[vieja]
+            self._escrituras += 1
+            if self._escrituras % self.PURGA_CADA == 0:
+                self._purgar()
+            return ventanas[ventana]
+
+    def reiniciar(self, clave):
+        with self._lock:
+            self._contadores.pop(clave, None)
+
+    def _purgar(self):
+        """Eliminar claves sin ventanas recientes (ventana = segundos // duración, varía por límite)"""
+        ahora = time.time()
+        for clave in list(self._contadores):
+            duracion = clave[1]
+            actual = int(ahora // duracion)
+            if all(v < actual - 1 for v in self._contadores[clave]):
+                del self._contadores[clave]
+
+
+class AlmacenMongo:
+    """Contadores compartidos entre workers: un documento por (clave, ventana) con TTL"""
+
+    nombre = 'mongo'
+    coleccion = 'limites_tasa'
+
+    def _col(self):
+        # El índice TTL de 'expira' está en el registro de indices_functions
+        return get_db()[self.coleccion]
+
+    @staticmethod
+    def _id(clave, ventana):
+        nombre, duracion, valor = clave
+        return f"{nombre}:{duracion}:{valor}:{ventana}"
+
+    def contar(self, clave, ventana):
+        ids = [self._id(clave, ventana), self._id(clave, ventana - 1)]
+        conteos = {doc["_id"]: doc.get("n", 0) for doc in self._col().find({"_id": {"$in": ids}})}
+        return conteos.get(ids[0], 0), conteos.get(ids[1], 0)
+
+    def incrementar(self, clave, ventana, duracion):
+        doc = self._col().find_one_and_update(
+            {"_id": self._id(clave, ventana)},
+            {
+                "$inc": {"n": 1},
+                "$setOnInsert": {"expira": datetime.utcnow() + timedelta(seconds=2 * duracion)}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["n"]
+
+    def reiniciar(self, clave):
+        nombre, duracion, valor = clave
+        ventana = int(time.time() // duracion)
+        self._col().delete_many({"_id": {"$in": [self._id(clave, ventana), self._id(clave, ventana - 1)]}})
+
+
+_BACKENDS = {
+    AlmacenMemoria.nombre: AlmacenMemoria,
+    AlmacenMongo.nombre: AlmacenMongo
+}
+
+if RATE_LIMIT_BACKEND not in _BACKENDS:
+    logger.error(f"Backend de límites desconocido '{RATE_LIMIT_BACKEND}', usando memoria")
+_almacen = _BACKENDS.get(RATE_LIMIT_BACKEND, AlmacenMemoria)()
+
+def get_almacen():
+    """Obtener el almacén de contadores activo"""
+    return _almacen
+
+# ==================== VENTANA DESLIZANTE ====================
+
+class VentanaDeslizante:
+    """
+    Límite de 'limite' eventos por 'ventana_segundos' y clave
+
+    Aproxima la ventana deslizante con dos ventanas fijas: el conteo de la
+    anterior pesa según cuánto de ella sigue dentro de la ventana actual.
+    Memoria constante por clave y dos lecturas por consulta.
+    """
+
+    def __init__(self, nombre, limite, ventana_segundos):
+        self.nombre = nombre
+        self.limite = limite
+        self.ventana_segundos = ventana_segundos
+
+    def _clave(self, valor):
+        return (self.nombre, self.ventana_segundos, valor)
+
+    def _estado(self, valor):
+        ahora = time.time()
+        ventana = int(ahora // self.ventana_segundos)
+        fraccion = (ahora % self.ventana_segundos) / self.ventana_segundos
+        actual, anterior = get_almacen().contar(self._clave(valor), ventana)
+        return actual, anterior, fraccion
+
+    def estimado(self, valor):
+        """Eventos contados en los últimos 'ventana_segundos'"""
+        actual, anterior, fraccion = self._estado(valor)
+        return anterior * (1 - fraccion) + actual
+
+    def espera(self, valor):
+        """
+        Segundos hasta que 'valor' pueda registrar otro evento (0 si ya puede)
+        """
+        actual, anterior, fraccion = self._estado(valor)
+        if anterior * (1 - fraccion) + actual < self.limite:
+            return 0
+
+        if actual < self.limite:
+            # Basta con que la ventana anterior pese menos
+            fraccion_necesaria = 1 - (self.limite - actual) / anterior
+            segundos = (fraccion_necesaria - fraccion) * self.ventana_segundos
+        else:
+            # Hay que pasar a la siguiente ventana y que la actual pese menos
+            fraccion_necesaria = 1 - self.limite / actual
+            segundos = (1 - fraccion + fraccion_necesaria) * self.ventana_segundos
+        return max(1, math.ceil(segundos))
+
+    def registrar(self, valor):
+        """Contar un evento de 'valor' y retornar los eventos restantes en la ventana"""
+        ventana = int(time.time() // self.ventana_segundos)
+        get_almacen().incrementar(self._clave(valor), ventana, self.ventana_segundos)
+        return max(0, self.limite - math.ceil(self.estimado(valor)))
+
+    def reiniciar(self, valor):
+        """Olvidar los eventos de 'valor' (p.ej. tras un login correcto)"""
+        get_almacen().reiniciar(self._clave(valor))
+
+# ==================== CUBETA DE TOKENS POR RUTA ====================
+
+# Presupuestos: nombre -> (capacidad de ráfaga, tokens recargados por segundo).
+# Se pueden cambiar con RATE_LIMIT_<NOMBRE>="capacidad,recarga" (p.ej. RATE_LIMIT_LECTURA="60,1")
+PRESUPUESTOS = {
+    'lectura': (60, 1.0),
+    'escritura': (20, 0.5),
+    'stream': (10, 0.2),
+    'reportes': (5, 1 / 30),
+    'sensible': (5, 1 / 60)
+}
+
+for _nombre in PRESUPUESTOS:
+    _valor = os.getenv(f'RATE_LIMIT_{_nombre.upper()}')
+    if _valor:
+        try:
+            _capacidad, _recarga = _valor.split(',')
+            PRESUPUESTOS[_nombre] = (int(_capacidad), float(_recarga))
+        except ValueError:
+            logger.error(f"RATE_LIMIT_{_nombre.upper()} inválido: '{_valor}'")
+
+class CubetasTokens:
+    """
+    Cubetas de tokens en memoria por (ruta, usuario)
+
+    Cada solicitud consume un token; la cubeta se recarga de forma continua
+    hasta su capacidad. Son por worker: con varios workers el límite efectivo
+    se multiplica por su número.
+    """
+
+    # Cada cuántas consultas se eliminan las cubetas llenas (inactivas)
+    PURGA_CADA = 5000
+
+    def __init__(self):
+        self._cubetas = {}
+        self._lock = threading.Lock()
+        self._consultas = 0
+
+    def consumir(self, clave, capacidad, recarga):
+        """
+        Tomar un token de la cubeta 'clave'
+
+        Returns:
+            float: 0 si se concedió, o segundos hasta que haya un token
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, ultima = self._cubetas.get(clave, (capacidad, ahora))
+            tokens = min(capacidad, tokens + (ahora - ultima) * recarga)
+            if tokens >= 1:
+                self._cubetas[clave] = (tokens - 1, ahora)
+                espera = 0
+            else:
+                self._cubetas[clave] = (tokens, ahora)
+                espera = (1 - tokens) / recarga
+
+            self._consultas += 1
+            if self._consultas % self.PURGA_CADA == 0:
+                self._purgar(ahora)
+            return espera
+
+    def _purgar(self, ahora):
+        """Eliminar cubetas que ya estarían llenas: volver a crearlas da el mismo resultado"""
+        for clave, (tokens, ultima) in list(self._cubetas.items()):
+            capacidad, recarga = PRESUPUESTOS.get(clave[0], (0, 0))
+            if recarga and tokens + (ahora - ultima) * recarga >= capacidad:
+                del self._cubetas[clave]
+        establecer('rate_limit_cubetas', len(self._cubetas))
+
+
+_cubetas = CubetasTokens()
+
+def _identidad_solicitud():
+    """Usuario del JWT verificado o, en rutas sin autenticación, la IP del cliente"""
+    user_data = getattr(request, 'user_data', None)
+    if user_data and user_data.get('user_id'):
+        return f"usuario:{user_data['user_id']}"
+    return f"ip:{ip_cliente()}"
+
+def consumir_presupuesto(presupuesto, identidad=None, endpoint=None):
+    """
+    Descontar la solicitud actual del presupuesto de su usuario y ruta
+
+    Args:
+        presupuesto (str): Clave de PRESUPUESTOS
+        identidad (str): Usuario o IP ya resuelto por quien llama (opcional)
+        endpoint (str): Endpoint ya resuelto por quien llama (opcional)
+
+    Returns:
+        Response: 429 con Retry-After si se agotó, None si puede continuar
+    """
+    capacidad, recarga = PRESUPUESTOS[presupuesto]
+    clave = (presupuesto, endpoint or request.endpoint, identidad or _identidad_solicitud())
+    espera = _cubetas.consumir(clave, capacidad, recarga)
+    if not espera:
+        incrementar(f'rate_limit_permitidos_{presupuesto}')
+        return None
+
+    incrementar(f'rate_limit_rechazados_{presupuesto}')
+    respuesta = jsonify({
+        'success': False,
+        'message': 'Demasiadas solicitudes, intente de nuevo más tarde',
+        'code': 'RATE_LIMITED'
+    })
+    respuesta.status_code = 429
+    respuesta.headers['Retry-After'] = str(max(1, math.ceil(espera)))
+    return respuesta
+
+def middleware_limitar_tasa(presupuesto):
+    """
+    Decorator que limita las solicitudes por usuario y ruta con una cubeta de tokens
+
+    Va debajo de middleware_verificar_autenticacion para leer el usuario del
+    JWT (o usar middleware_acceso, que lo incluye). Al agotar el presupuesto
+    responde 429 con Retry-After.
+
+    Args:
+        presupuesto (str): Clave de PRESUPUESTOS que define ráfaga y recarga
+    """
+    if presupuesto not in PRESUPUESTOS:
+        raise ValueError(f"Presupuesto de tasa desconocido: '{presupuesto}'")
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            limitado = consumir_presupuesto(presupuesto)
+            if limitado is not None:
+                return limitado
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,122 @@
+"""
+Funciones de Registro de Seguridad
+Escritor en segundo plano para 'security_logs': los eventos se encolan en la
+solicitud y un hilo los guarda por lotes con insert_many
+"""
+
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from funciones.database_functions import get_db
+from funciones.metrics_functions import incrementar, establecer, observar
+
+# Logger para este módulo
+logger = logging.getLogger(__name__)
+
+# Eventos en espera como máximo; si la cola está llena el evento se descarta (y se cuenta)
+SECURITY_LOG_COLA_MAXIMA = int(os.getenv('SECURITY_LOG_COLA_MAXIMA', '5000'))
+# Se escribe al juntar este número de eventos o al pasar este intervalo desde el primero
+SECURITY_LOG_LOTE = int(os.getenv('SECURITY_LOG_LOTE', '200'))
+SECURITY_LOG_INTERVALO_SEGUNDOS = float(os.getenv('SECURITY_LOG_INTERVALO_SEGUNDOS', '2'))
+# Espera máxima al vaciar la cola al apagar el proceso
+SECURITY_LOG_ESPERA_CIERRE_SEGUNDOS = float(os.getenv('SECURITY_LOG_ESPERA_CIERRE_SEGUNDOS', '5'))
+
+_cola = queue.Queue(maxsize=SECURITY_LOG_COLA_MAXIMA)
+_detener = threading.Event()
+_hilo = None
+_hilo_lock = threading.Lock()
+
+def encolar_evento(evento):
+    """
+    Encolar un documento para 'security_logs' sin esperar a MongoDB
+
+    Returns:
+        bool: False si la cola estaba llena y el evento se descartó
+    """
+    _iniciar_escritor()
+    try:
+        _cola.put_nowait(evento)
+    except queue.Full:
+        incrementar('security_logs_descartados')
+        return False
+    establecer('security_logs_cola', _cola.qsize())
+    return True
+
+def _iniciar_escritor():
+    """Arrancar el hilo escritor la primera vez (por proceso, también tras un fork)"""
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return
+    with _hilo_lock:
+        if _hilo is not None and _hilo.is_alive():
+            return
+        _detener.clear()
+        _hilo = threading.Thread(target=_escribir_en_bucle, name='security-logs', daemon=True)
+        _hilo.start()
+
+def _escribir_lote(lote):
+    """Guardar un lote; si falla se descarta para no bloquear ni crecer sin límite"""
+    if not lote:
+        return
+    inicio = time.perf_counter()
+    try:
+        get_db()['security_logs'].insert_many(lote, ordered=False)
+        incrementar('security_logs_escritos', len(lote))
+    except Exception as e:
+        incrementar('security_logs_descartados', len(lote))
+        logger.error(f"Error guardando {len(lote)} eventos de seguridad: {e}")
+    finally:
+        observar('security_logs_insert', time.perf_counter() - inicio)
+        establecer('security_logs_cola', _cola.qsize())
+
+def _escribir_en_bucle():
+    """Juntar eventos hasta completar un lote o vencer el intervalo y escribirlos"""
+    lote = []
+    limite = None
+    while True:
+        espera = SECURITY_LOG_INTERVALO_SEGUNDOS if limite is None else max(0, limite - time.monotonic())
+        try:
+            lote.append(_cola.get(timeout=espera))
+            if limite is None:
+                limite = time.monotonic() + SECURITY_LOG_INTERVALO_SEGUNDOS
+        except queue.Empty:
+            pass
+
+        deteniendo = _detener.is_set()
+        if deteniendo:
+            # Al apagar se toma todo lo pendiente
+            while True:
+                try:
+                    lote.append(_cola.get_nowait())
+                except queue.Empty:
+                    break
+
+        if lote and (deteniendo or len(lote) >= SECURITY_LOG_LOTE or time.monotonic() >= limite):
+            for i in range(0, len(lote), SECURITY_LOG_LOTE):
+                _escribir_lote(lote[i:i + SECURITY_LOG_LOTE])
+            lote = []
+            limite = None
+
+        if deteniendo:
+            return
+
+def vaciar_registros():
+    """Escribir los eventos pendientes y detener el hilo escritor (al apagar)"""
+    _detener.set()
+    hilo = _hilo
+    if hilo is not None and hilo.is_alive():
+        hilo.join(SECURITY_LOG_ESPERA_CIERRE_SEGUNDOS)
+    else:
+        pendientes = []
+        while True:
+            try:
+                pendientes.append(_cola.get_nowait())
+            except queue.Empty:
+                break
+        for i in range(0, len(pendientes), SECURITY_LOG_LOTE):
+            _escribir_lote(pendientes[i:i + SECURITY_LOG_LOTE])
+
+atexit.register(vaciar_registros)
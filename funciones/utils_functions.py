@@ -6,7 +6,9 @@ Funciones auxiliares, helpers y endpoints de información del sistema
 import logging
 from datetime import datetime
 from flask import jsonify
-from funciones.database_functions import get_db_status
+from funciones.database_functions import obtener_estado_bd, ESTADO_BD_MAXIMO_SEGUNDOS
+from funciones.eventos_functions import total_suscriptores
+from funciones.cache_functions import con_etag, clave_version
 
 # Logger para este módulo
 logger = logging.getLogger(__name__)
@@ -38,19 +40,30 @@ def pagina_inicio():
             "endpoints": {
                 "GET /": "Información del servidor",
                 "GET /verificar": "Estado del servidor",
+                "GET /healthz": "Sonda de vida (sin BD)",
+                "GET /readyz": "Sonda de disponibilidad (ping a la BD en caché)",
+                "GET /estadisticas": "Estadísticas de canales y mensajes (instantánea en caché)",
+                "GET /metricas": "Métricas internas del worker (solo admin)",
                 "GET /canales": "Listar canales",
+                "GET /canales/resumen": "Canales con último mensaje, última actividad y no leídos",
                 "POST /crear_canal": "Crear canal",
                 "GET /canal/<nombre>": "Info de canal",
                 "PUT /canal/<nombre>": "Editar canal",
                 "DELETE /canal/<nombre>": "Eliminar canal",
                 "POST /enviar": "Enviar mensaje",
-                "GET /mensajes/<canal>": "Obtener mensajes",
+                "GET /mensajes/<canal>": "Obtener mensajes (paginado: limit, before, after)",
+                "GET /mensajes/<canal>?since=<cursor>": "Cambios desde el cursor (nuevos, editados, eliminados)",
+                "GET /stream/<canal>": "Eventos en vivo del canal (SSE, Last-Event-ID)",
                 # NUEVOS ENDPOINTS
                 "PUT /mensaje/<id>": "Editar mensaje propio",
                 "DELETE /mensaje/<id>": "Eliminar mensaje propio",
-                "PUT /mensaje/<id>/estado": "Actualizar estado de mensaje"
+                "PUT /mensaje/<id>/estado": "Actualizar estado de mensaje",
+                "PUT /mensajes/estado": "Actualizar estado en lote (ids, o canal + hasta=<cursor>)",
+                "GET /lecturas": "Marcas de lectura y no leídos del usuario por canal",
+                "GET /lecturas/<canal>": "Marca de lectura y no leídos en un canal",
+                "PUT /lecturas/<canal>": "Avanzar marca de lectura (cursor del último mensaje leído)"
             },
-            "database": get_db_status()
+            "database": obtener_estado_bd()[0]
         })
     except Exception as e:
         logger.error(f"Error inicio: {e}")
@@ -63,12 +76,42 @@ def verificar_conexion():
             "status": "ok",
             "timestamp": datetime.now().isoformat()
         }
-        info.update(get_db_status())
+        info.update(obtener_estado_bd()[0])
         return jsonify(info)
     except Exception as e:
         logger.error(f"Error verificar: {e}")
         return jsonify({"error": str(e)}), 500
 
+def healthz():
+    """Sonda de vida: solo confirma que el proceso responde, sin tocar la BD"""
+    return jsonify({"status": "ok"}), 200
+
+def readyz():
+    """Sonda de disponibilidad según el último ping a la BD (en caché)"""
+    datos, edad = obtener_estado_bd()
+    lista = datos.get("status") == "conectada" and edad <= ESTADO_BD_MAXIMO_SEGUNDOS
+    return jsonify({
+        "status": "ok" if lista else "no_disponible",
+        "database": datos.get("status"),
+        "antiguedad_segundos": round(edad, 1)
+    }), 200 if lista else 503
+
+def estadisticas():
+    """Estadísticas de canales y mensajes desde la instantánea en caché"""
+    try:
+        datos, edad = obtener_estado_bd()
+        return jsonify({
+            "canales": datos.get("canales"),
+            "mensajes": datos.get("mensajes"),
+            "ultima_actividad": datos.get("ultima_actividad"),
+            "suscriptores_stream": total_suscriptores(),
+            "database": datos.get("status"),
+            "antiguedad_segundos": round(edad, 1)
+        })
+    except Exception as e:
+        logger.error(f"Error estadisticas: {e}")
+        return jsonify({"error": "Error interno"}), 500
+
 def api_auth_status():
     """Authentication status"""
     return jsonify({
@@ -77,15 +120,17 @@ def api_auth_status():
         "timestamp": datetime.now().isoformat()
     })
 
+@con_etag(lambda: [clave_version("canales")])
 def api_channels_list():
     """List channels - modern endpoint"""
     try:
         from funciones.database_functions import get_db
+        from funciones.chat_functions import PROYECCION_CANAL
         db = get_db()
         if db is None:
             return jsonify({"error": "Base de datos no disponible"}), 500
         
-        canales = list(db.canales.find({}, {"_id": 0}))
+        canales = list(db.canales.find({}, PROYECCION_CANAL))
         return jsonify({
             "success": True,
             "channels": canales,
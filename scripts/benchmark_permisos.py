@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - VERIFICACIÓN DE PERMISOS POR SOLICITUD
+CORPOTACHIRA - Empresa de Limpieza
+
+Compara el costo por solicitud de los middlewares apilados
+(autenticación + permisos + límite de tasa) con middleware_acceso sobre una
+mezcla representativa de rutas. Mide solo los decorators: la vista no hace
+nada y no se consulta MongoDB (réplica de revocaciones ya sincronizada).
+
+Uso:
+    python scripts/benchmark_permisos.py [iteraciones]
+"""
+
+import sys
+import os
+import time
+import warnings
+from datetime import datetime
+
+# Presupuestos altos para que el límite de tasa cuente pero no rechace
+for _nombre in ('LECTURA', 'ESCRITURA'):
+    os.environ[f'RATE_LIMIT_{_nombre}'] = '1000000000,1000000'
+
+# Agregar path del proyecto para importar funciones
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from flask import Flask
+from funciones import auth_functions
+from funciones.auth_functions import (
+    generar_token_jwt,
+    middleware_verificar_autenticacion,
+    middleware_verificar_permisos,
+    middleware_acceso
+)
+from funciones.rate_limit_functions import middleware_limitar_tasa
+
+# Los middlewares apilados están obsoletos: aquí solo sirven de referencia
+warnings.simplefilter('ignore', DeprecationWarning)
+
+# Mezcla de rutas: (nombre, método, niveles, presupuesto, tipo de usuario, peso)
+RUTAS = [
+    ('mensajes', 'GET', ['admin', 'moderador', 'obrero'], 'lectura', 'obrero', 5),
+    ('canales', 'GET', ['admin', 'moderador', 'obrero'], 'lectura', 'moderador', 2),
+    ('enviar', 'POST', ['admin', 'moderador'], 'escritura', 'moderador', 2),
+    ('obreros', 'GET', ['admin', 'moderador'], 'lectura', 'admin', 1),
+    ('eliminar_moderador', 'DELETE', ['admin'], 'escritura', 'moderador', 1)
+]
+
+def vista():
+    return 'ok'
+
+def construir_vistas():
+    """Vistas decoradas de las dos formas para cada ruta"""
+    vistas = {}
+    for nombre, _, niveles, presupuesto, _, _ in RUTAS:
+        antes = middleware_verificar_autenticacion()(
+            middleware_verificar_permisos(niveles)(
+                middleware_limitar_tasa(presupuesto)(vista)))
+        despues = middleware_acceso(niveles, presupuesto)(vista)
+        vistas[nombre] = (antes, despues)
+    return vistas
+
+def medir(app, funcion, metodo, token, iteraciones):
+    """Microsegundos por llamada dentro de un contexto de solicitud"""
+    with app.test_request_context('/', method=metodo, headers={'Authorization': f'Bearer {token}'}):
+        funcion()  # calentar la caché de tokens
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            funcion()
+        return (time.perf_counter() - inicio) / iteraciones * 1e6
+
+def main():
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    # Réplica de revocaciones ya sincronizada: sin hilos ni consultas durante la medición
+    auth_functions.REVOCACIONES_INTERVALO_SEGUNDOS = float('inf')
+    auth_functions._revocados_estado.update(desde=datetime.utcnow(), intentado=time.monotonic())
+
+    app = Flask(__name__)
+    vistas = construir_vistas()
+    tokens = {
+        tipo: generar_token_jwt({
+            '_id': ObjectId(), 'username': tipo, 'tipo_usuario': tipo,
+            'nombre_completo': 'Benchmark', 'cedula': '12345678'
+        })
+        for tipo in ('admin', 'moderador', 'obrero')
+    }
+
+    print(f"⏱️ Benchmark de permisos ({iteraciones} iteraciones por ruta)")
+    print(f"{'ruta':<20}{'antes (µs)':>12}{'después (µs)':>14}{'mejora':>9}")
+
+    total_antes = total_despues = total_peso = 0
+    for nombre, metodo, _, _, tipo, peso in RUTAS:
+        antes, despues = vistas[nombre]
+        us_antes = medir(app, antes, metodo, tokens[tipo], iteraciones)
+        us_despues = medir(app, despues, metodo, tokens[tipo], iteraciones)
+        print(f"{nombre:<20}{us_antes:>12.2f}{us_despues:>14.2f}{us_antes / us_despues:>8.2f}x")
+        total_antes += us_antes * peso
+        total_despues += us_despues * peso
+        total_peso += peso
+
+    print(f"{'mezcla ponderada':<20}{total_antes / total_peso:>12.2f}{total_despues / total_peso:>14.2f}"
+          f"{total_antes / total_despues:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,8 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from funciones.database_functions import get_db
+from funciones.indices_functions import aplicar_indices
+from funciones.mantenimiento_functions import RETENCION_SECURITY_LOGS_DIAS
 
 def configurar_coleccion_usuarios():
     """
@@ -72,9 +74,9 @@ def configurar_coleccion_usuarios():
         print("\n🔐 Configurando colección 'security_logs'...")
         security_logs = db['security_logs']
 
-        # Índice para timestamp (limpieza automática)
-        security_logs.create_index("timestamp")
-        print("✅ Índice creado en security_logs: timestamp")
+        # Índice TTL para timestamp (limpieza automática), del registro de índices
+        aplicar_indices(db)
+        print(f"✅ Índice TTL creado en security_logs: timestamp ({RETENCION_SECURITY_LOGS_DIAS} días)")
 
         # Índice para event_type (consultas por tipo)
         security_logs.create_index("event_type")
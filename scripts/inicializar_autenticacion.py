@@ -20,6 +20,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from funciones.database_functions import get_db
+from funciones.indices_functions import aplicar_indices
 from funciones.auth_functions import (
     crear_usuario_admin_inicial,
     sincronizar_usuarios_con_personal,
@@ -120,7 +121,7 @@ def configurar_coleccion_usuarios():
 
         # Configurar colección de logs de seguridad
         security_logs = db['security_logs']
-        security_logs.create_index("timestamp")
+        aplicar_indices(db)
         security_logs.create_index("event_type")
         security_logs.create_index("user_id")
 
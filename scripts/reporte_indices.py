@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+REPORTE DE ÍNDICES - CONSULTAS FRECUENTES
+CORPOTACHIRA - Empresa de Limpieza
+
+Aplica el registro de índices (funciones/indices_functions.py) y ejecuta
+explain() sobre cada consulta registrada. Marca las que recorren la
+colección completa (COLLSCAN) y las que ordenan en memoria (SORT).
+
+Uso:
+    python scripts/reporte_indices.py
+
+Termina con código 1 si alguna consulta hace COLLSCAN.
+"""
+
+import sys
+import os
+
+# Agregar path del proyecto para importar funciones
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from funciones.database_functions import init_db, get_db
+from funciones.indices_functions import INDICES, OBSOLETOS, aplicar_indices, explicar_consultas
+
+def reporte_indices():
+    """
+    Imprime el plan de cada consulta registrada
+
+    Returns:
+        bool: True si ninguna consulta recorre la colección completa
+    """
+    db = get_db()
+
+    # Idempotente: repetirlo tras init_db solo sirve para mostrar los fallos
+    print(f"🔧 Aplicando {len(INDICES)} índices del registro ({len(OBSOLETOS)} obsoletos)...")
+    resultado = aplicar_indices(db)
+    print(f"✅ Índices aplicados: {resultado['aplicados']}")
+    for obsoleto in resultado["obsoletos"]:
+        print(f"🗑️  Obsoleto eliminado: {obsoleto['coleccion']}.{obsoleto['indice']}")
+    for error in resultado["errores"]:
+        print(f"❌ {error['coleccion']}.{error['indice']}: {error['error']}")
+
+    print("\n🔍 Plan de las consultas registradas:")
+    escaneos = 0
+    for consulta in explicar_consultas(db):
+        if "error" in consulta:
+            print(f"❌ {consulta['nombre']} ({consulta['coleccion']}): {consulta['error']}")
+            continue
+
+        if consulta["coleccion_completa"]:
+            escaneos += 1
+            marca = "❌ COLLSCAN"
+        elif consulta["orden_en_memoria"]:
+            marca = "⚠️  SORT en memoria"
+        else:
+            marca = "✅"
+        indices = ", ".join(consulta["indices"]) or "-"
+        print(f"{marca} {consulta['nombre']} ({consulta['coleccion']})")
+        print(f"    etapas: {' <- '.join(consulta['etapas'])} | índices: {indices}")
+
+    print("\n" + "=" * 60)
+    if escaneos:
+        print(f"❌ {escaneos} consultas recorren la colección completa")
+        return False
+    print("🎉 Todas las consultas registradas usan índices")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 CORPOTACHIRA - Reporte de índices")
+    print("=" * 60)
+
+    load_dotenv()
+    if not init_db():
+        print("❌ No se pudo conectar a MongoDB (MONGO_URI)")
+        sys.exit(1)
+
+    if not reporte_indices():
+        sys.exit(1)
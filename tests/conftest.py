@@ -0,0 +1,63 @@
+"""
+Configuración de pruebas
+La app se importa sin MONGO_URI y cada prueba usa una base mongomock vacía
+
+Dependencias: pip install -r requirements-dev.txt
+"""
+
+import os
+import sys
+
+os.environ['MONGO_URI'] = ''
+os.environ.setdefault('MANTENIMIENTO_ACTIVO', 'false')
+os.environ.setdefault('BCRYPT_COSTO', '4')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from funciones import database_functions
+
+database_functions.client = mongomock.MongoClient()
+database_functions.db = database_functions.client.chat_db
+
+import chat_backend
+from funciones import auth_functions, cache_functions, personnel_functions, rate_limit_functions
+from funciones.auth_functions import generar_token_jwt
+
+@pytest.fixture(autouse=True)
+def db(monkeypatch):
+    """Base de datos vacía y estado en memoria (límites, cachés) reiniciado"""
+    cliente = mongomock.MongoClient()
+    base = cliente.chat_db
+    monkeypatch.setattr(database_functions, 'client', cliente)
+    monkeypatch.setattr(database_functions, 'db', base)
+    monkeypatch.setattr(rate_limit_functions, '_almacen', rate_limit_functions.AlmacenMemoria())
+    monkeypatch.setattr(rate_limit_functions, '_cubetas', rate_limit_functions.CubetasTokens())
+    monkeypatch.setattr(cache_functions, '_versiones', {})
+    monkeypatch.setattr(personnel_functions, '_conteos', {})
+    monkeypatch.setattr(auth_functions, '_tokens_verificados', auth_functions.OrderedDict())
+    monkeypatch.setattr(auth_functions, '_estado_usuarios', {})
+    return base
+
+@pytest.fixture
+def app():
+    chat_backend.app.testing = True
+    return chat_backend.app
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+@pytest.fixture
+def encabezados():
+    """Authorization con un JWT válido para un usuario del tipo indicado"""
+    def crear(tipo='admin', **datos):
+        usuario = {
+            '_id': ObjectId(), 'username': tipo, 'tipo_usuario': tipo,
+            'nombre_completo': 'Prueba Usuario', 'cedula': '12345678'
+        }
+        usuario.update(datos)
+        return {'Authorization': f"Bearer {generar_token_jwt(usuario)}"}
+    return crear
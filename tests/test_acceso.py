@@ -0,0 +1,29 @@
+"""
+Pruebas de middleware_acceso
+"""
+
+import pytest
+from funciones.auth_functions import middleware_verificar_autenticacion, middleware_verificar_permisos
+
+def test_sin_token(cliente):
+    respuesta = cliente.get('/canales')
+    assert respuesta.status_code == 401
+    assert respuesta.get_json()['code'] == 'NO_TOKEN'
+
+def test_nivel_insuficiente(cliente, encabezados):
+    respuesta = cliente.post('/enviar', json={'canal': 'general', 'mensaje': 'hola'}, headers=encabezados('obrero'))
+    assert respuesta.status_code == 403
+    datos = respuesta.get_json()
+    assert datos['required_levels'] == ['admin', 'moderador']
+    assert datos['your_level'] == 'obrero'
+
+def test_token_invalido(cliente):
+    respuesta = cliente.get('/canales', headers={'Authorization': 'Bearer x.y.z'})
+    assert respuesta.status_code == 401
+    assert respuesta.get_json()['code'] == 'INVALID_TOKEN'
+
+def test_middlewares_apilados_obsoletos():
+    with pytest.warns(DeprecationWarning):
+        middleware_verificar_autenticacion()
+    with pytest.warns(DeprecationWarning):
+        middleware_verificar_permisos(['admin'])
@@ -0,0 +1,132 @@
+"""
+Pruebas del índice de obreros asignados a cuadrillas
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from bson import ObjectId
+from funciones import cuadrilla_functions
+from funciones.asignaciones_functions import (
+    asignar_obreros, liberar_asignaciones, limpiar_asignaciones_huerfanas, ObrerosAsignadosError
+)
+
+def crear_obreros(db, cantidad):
+    ids = [ObjectId() for _ in range(cantidad)]
+    db.obreros.insert_many([
+        {"_id": i, "nombre": f"Obrero{n}", "apellidos": "Prueba", "cedula": f"{1000000 + n}", "email": f"o{n}@x.com", "activo": True}
+        for n, i in enumerate(ids)
+    ])
+    return ids
+
+def envejecer(db):
+    """Asignaciones fuera del margen de las creaciones en curso"""
+    db.asignaciones.update_many({}, {"$set": {"asignado_en": datetime.utcnow() - timedelta(hours=2)}})
+
+def test_asignar_es_idempotente_para_la_misma_cuadrilla(db):
+    obreros = crear_obreros(db, 2)
+    cuadrilla = ObjectId()
+    assert asignar_obreros(cuadrilla, 'Cuadrilla-N°1', obreros) == obreros
+    assert asignar_obreros(cuadrilla, 'Cuadrilla-N°1', [str(o) for o in obreros]) == []
+    assert db.asignaciones.count_documents({"cuadrilla_id": cuadrilla}) == 2
+
+def test_conflicto_no_deja_reservas_parciales(db):
+    ocupado, libre = crear_obreros(db, 2)
+    primera = ObjectId()
+    asignar_obreros(primera, 'Cuadrilla-N°1', [ocupado])
+
+    segunda = ObjectId()
+    with pytest.raises(ObrerosAsignadosError) as error:
+        asignar_obreros(segunda, 'Cuadrilla-N°2', [libre, ocupado])
+    assert [(a["_id"], a["cuadrilla_id"]) for a in error.value.asignaciones] == [(ocupado, primera)]
+    assert db.asignaciones.count_documents({"cuadrilla_id": segunda}) == 0
+    assert db.asignaciones.find_one({"_id": ocupado})["cuadrilla_id"] == primera
+
+def test_liberar_conserva_los_que_siguen(db):
+    obreros = crear_obreros(db, 3)
+    cuadrilla = ObjectId()
+    asignar_obreros(cuadrilla, 'Cuadrilla-N°1', obreros)
+    liberar_asignaciones(cuadrilla, conservar=[str(obreros[0])])
+    assert [a["_id"] for a in db.asignaciones.find()] == [obreros[0]]
+
+def test_limpiar_huerfanas(db):
+    obreros = crear_obreros(db, 2)
+    activa, borrada = ObjectId(), ObjectId()
+    db.cuadrillas.insert_one({"_id": activa, "activo": True})
+    asignar_obreros(activa, 'Cuadrilla-N°1', obreros[:1])
+    asignar_obreros(borrada, 'Cuadrilla-N°2', obreros[1:])
+    envejecer(db)
+    assert limpiar_asignaciones_huerfanas() == {"liberadas": 1}
+    assert [a["_id"] for a in db.asignaciones.find()] == obreros[:1]
+
+def test_limpiar_huerfanas_de_obreros_eliminados(db):
+    obreros = crear_obreros(db, 2)
+    cuadrilla = ObjectId()
+    db.cuadrillas.insert_one({"_id": cuadrilla, "activo": True})
+    asignar_obreros(cuadrilla, 'Cuadrilla-N°1', obreros)
+    db.obreros.delete_one({"_id": obreros[1]})
+    envejecer(db)
+    assert limpiar_asignaciones_huerfanas() == {"liberadas": 1}
+    assert [a["_id"] for a in db.asignaciones.find()] == obreros[:1]
+
+# ==================== API ====================
+
+@pytest.fixture
+def personal(db):
+    moderador = ObjectId()
+    db.moderadores.insert_one({"_id": moderador, "nombre": "Ana", "apellidos": "Ruiz", "cedula": "9999999", "email": "a@x.com"})
+    return moderador, crear_obreros(db, 6)
+
+def datos_cuadrilla(moderador, obreros):
+    return {
+        "actividad": "Limpieza", "moderador_id": str(moderador),
+        "obreros_ids": [str(o) for o in obreros], "creado_por": "admin"
+    }
+
+def test_obrero_ocupado_rechazado_antes_de_reservar(db, cliente, encabezados, personal):
+    moderador, obreros = personal
+    h = encabezados()
+    assert cliente.post('/api/personnel/cuadrillas/', json=datos_cuadrilla(moderador, obreros[:4]), headers=h).status_code == 201
+
+    respuesta = cliente.post('/api/personnel/cuadrillas/', json=datos_cuadrilla(moderador, obreros[2:6]), headers=h)
+    assert respuesta.status_code == 400
+    assert 'Obrero2 Prueba (CI: 1000002) en Cuadrilla-N°1' in respuesta.get_json()['error']
+    assert db.asignaciones.count_documents({}) == 4
+
+def test_creacion_simultanea_responde_409(db, cliente, encabezados, personal, monkeypatch):
+    """La comprobación previa no ve la otra cuadrilla; el índice sí"""
+    moderador, obreros = personal
+    h = encabezados()
+    assert cliente.post('/api/personnel/cuadrillas/', json=datos_cuadrilla(moderador, obreros[:4]), headers=h).status_code == 201
+
+    monkeypatch.setattr(cuadrilla_functions, 'obreros_asignados', lambda *args, **kwargs: [])
+    respuesta = cliente.post('/api/personnel/cuadrillas/', json=datos_cuadrilla(moderador, obreros[2:6]), headers=h)
+    assert respuesta.status_code == 409
+    assert 'Cuadrilla-N°1' in respuesta.get_json()['error']
+    assert db.cuadrillas.count_documents({}) == 1
+    # Los obreros libres que alcanzó a reservar la segunda se liberaron
+    assert sorted(a["_id"] for a in db.asignaciones.find()) == sorted(obreros[:4])
+
+def test_eliminar_obrero_libera_su_asignacion(db, cliente, encabezados, personal):
+    """Asignación que quedó de una escritura interrumpida: la cuadrilla ya no está activa"""
+    _, obreros = personal
+    asignar_obreros(ObjectId(), 'Cuadrilla-N°9', obreros[:1])
+    respuesta = cliente.delete('/api/personnel/obreros/', json={"cedula": "1000000"}, headers=encabezados())
+    assert respuesta.status_code == 200
+    assert db.asignaciones.count_documents({}) == 0
+
+def test_limpieza_entre_asignacion_y_cuadrilla(db, cliente, encabezados, personal, monkeypatch):
+    """Sin transacción la limpieza puede correr antes de insertar la cuadrilla"""
+    moderador, obreros = personal
+    original = cuadrilla_functions.asignar_obreros
+
+    def asignar_y_limpiar(*args, **kwargs):
+        asignados = original(*args, **kwargs)
+        assert limpiar_asignaciones_huerfanas() == {"liberadas": 0}
+        return asignados
+
+    monkeypatch.setattr(cuadrilla_functions, 'asignar_obreros', asignar_y_limpiar)
+    h = encabezados()
+    assert cliente.post('/api/personnel/cuadrillas/', json=datos_cuadrilla(moderador, obreros[:4]), headers=h).status_code == 201
+    assert db.asignaciones.count_documents({}) == 4
+    # Las reservas siguen protegiendo a los obreros de la nueva cuadrilla
+    assert cliente.post('/api/personnel/cuadrillas/', json=datos_cuadrilla(moderador, obreros[2:6]), headers=h).status_code == 400
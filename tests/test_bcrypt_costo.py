@@ -0,0 +1,61 @@
+"""
+Pruebas del costo de bcrypt: calibración y rehash tras el login
+"""
+
+import time
+import bcrypt
+import pytest
+from bson import ObjectId
+from funciones import auth_functions
+from funciones.auth_functions import calibrar_costo_bcrypt, actualizar_hash_si_necesario, costo_hash
+
+class Cronometro:
+    """perf_counter que avanza 'paso' segundos en cada medición (inicio, fin)"""
+
+    def __init__(self, paso):
+        self.lecturas = 0
+        self.paso = paso
+
+    def perf_counter(self):
+        self.lecturas += 1
+        return (self.lecturas // 2) * self.paso
+
+def crear_usuario(db, costo):
+    usuario = {
+        "_id": ObjectId(), "username": "ana",
+        "password": bcrypt.hashpw(b'secreta', bcrypt.gensalt(rounds=costo)).decode('utf-8')
+    }
+    db.usuarios.insert_one(usuario)
+    return usuario
+
+@pytest.mark.parametrize('medido_ms, esperado', [(10_000, 12), (1, 16), (60, 14)])
+def test_calibracion_nunca_baja_de_12(monkeypatch, medido_ms, esperado):
+    monkeypatch.setattr(auth_functions, 'BCRYPT_COSTO', None)
+    monkeypatch.setattr(auth_functions, 'BCRYPT_OBJETIVO_MS', 250)
+    monkeypatch.setattr(auth_functions, '_bcrypt_costo', auth_functions._bcrypt_costo)
+    monkeypatch.setattr(auth_functions.bcrypt, 'hashpw', lambda *args: b'')
+    monkeypatch.setattr(auth_functions, 'time', Cronometro(medido_ms / 1000))
+    assert calibrar_costo_bcrypt() == esperado
+
+def test_rehash_sube_el_costo(db, monkeypatch):
+    monkeypatch.setattr(auth_functions, '_bcrypt_costo', 5)
+    usuario = crear_usuario(db, 4)
+    assert actualizar_hash_si_necesario(usuario, 'secreta')
+
+    for _ in range(100):
+        nuevo = db.usuarios.find_one({"_id": usuario["_id"]})["password"]
+        if nuevo != usuario["password"]:
+            break
+        time.sleep(0.02)
+    assert costo_hash(nuevo) == 5
+    assert bcrypt.checkpw(b'secreta', nuevo.encode('utf-8'))
+
+@pytest.mark.parametrize('costo', [5, 6])
+def test_rehash_no_baja_ni_repite_el_costo(db, monkeypatch, costo):
+    monkeypatch.setattr(auth_functions, '_bcrypt_costo', 5)
+    usuario = crear_usuario(db, costo)
+    assert not actualizar_hash_si_necesario(usuario, 'secreta')
+
+def test_hash_desconocido_no_se_toca(monkeypatch):
+    monkeypatch.setattr(auth_functions, '_bcrypt_costo', 5)
+    assert not actualizar_hash_si_necesario({"_id": ObjectId(), "password": "texto-plano"}, 'secreta')
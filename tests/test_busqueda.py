@@ -0,0 +1,41 @@
+"""
+Pruebas de la búsqueda de personal (/api/search)
+"""
+
+from funciones import busqueda_functions
+from funciones.busqueda_functions import tokens_busqueda
+
+def insertar(db, *apellidos):
+    obreros = [
+        {"nombre": "Ana", "apellidos": a, "cedula": f"{2000000 + n}", "email": f"a{n}@x.com", "activo": True}
+        for n, a in enumerate(apellidos)
+    ]
+    for obrero in obreros:
+        obrero["busqueda"] = tokens_busqueda(obrero)
+    db.obreros.insert_many(obreros)
+
+def buscar(cliente, encabezados, **parametros):
+    respuesta = cliente.get('/api/search', query_string={'q': 'ana', 'tipo': 'obreros', **parametros}, headers=encabezados())
+    assert respuesta.status_code == 200
+    return respuesta.get_json()
+
+def test_total_limitado_a_los_candidatos_ordenados(db, cliente, encabezados, monkeypatch):
+    monkeypatch.setattr(busqueda_functions, 'BUSQUEDA_CANDIDATOS_MAXIMO', 4)
+    # El que debe ir primero se inserta al final
+    insertar(db, "Zea", "Ruiz", "Pardo", "Mora", "Leon", "Aaa")
+
+    datos = buscar(cliente, encabezados, limit=2)
+    assert datos["resultados"][0]["apellidos"] == "Aaa"
+    assert (datos["total"], datos["total_coincidencias"], datos["pages"]) == (4, 6, 2)
+
+    # La última página anunciada tiene resultados
+    datos = buscar(cliente, encabezados, limit=2, page=2)
+    assert [r["apellidos"] for r in datos["resultados"]] == ["Mora", "Pardo"]
+
+def test_coincidencia_exacta_primero(db, cliente, encabezados):
+    insertar(db, "Anaya", "Zea")
+    db.obreros.insert_one({"nombre": "Anabel", "apellidos": "Abad", "cedula": "3000000",
+                           "busqueda": tokens_busqueda({"nombre": "Anabel", "apellidos": "Abad"})})
+    datos = buscar(cliente, encabezados)
+    assert [r["apellidos"] for r in datos["resultados"]] == ["Anaya", "Zea", "Abad"]
+    assert all("busqueda" not in r for r in datos["resultados"])
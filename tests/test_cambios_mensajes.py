@@ -0,0 +1,128 @@
+"""
+Pruebas del sondeo incremental (?since=) de mensajes
+"""
+
+import threading
+from datetime import datetime, timedelta
+import pytest
+from funciones import chat_functions
+
+CANAL = 'general'
+
+def enviar(cliente, encabezados, texto):
+    respuesta = cliente.post('/enviar', json={'canal': CANAL, 'mensaje': texto, 'usuario': 'ana'}, headers=encabezados)
+    assert respuesta.status_code == 201
+    return respuesta.get_json()['mensaje_id']
+
+def cambios(cliente, encabezados, desde):
+    respuesta = cliente.get(f'/mensajes/{CANAL}', query_string={'since': desde}, headers=encabezados)
+    assert respuesta.status_code == 200
+    return respuesta
+
+@pytest.fixture
+def asentado(monkeypatch):
+    """Sin margen: toda secuencia asignada cuenta como escrita"""
+    monkeypatch.setattr(chat_functions, 'CAMBIOS_MARGEN_SEGUNDOS', 0)
+
+def test_since_mezcla_ediciones_y_eliminaciones(cliente, encabezados, asentado):
+    h = encabezados()
+    primero = enviar(cliente, h, 'uno')
+    segundo = enviar(cliente, h, 'dos')
+    tercero = enviar(cliente, h, 'tres')
+    cursor = cambios(cliente, h, 0).get_json()['cursor']
+    assert cursor == '3'
+
+    assert cliente.put(f'/mensaje/{primero}', json={'usuario': 'ana', 'mensaje': 'uno editado'}, headers=h).status_code == 200
+    assert cliente.delete(f'/mensaje/{segundo}', query_string={'usuario': 'ana'}, headers=h).status_code == 200
+    assert cliente.put(f'/mensaje/{tercero}/estado', json={'estado': 'leido'}, headers=h).status_code == 200
+
+    datos = cambios(cliente, h, cursor).get_json()
+    assert [(m['_id'], m['mensaje'], m['estado']) for m in datos['mensajes']] == [
+        (primero, 'uno editado', 'editado'),
+        (tercero, 'tres', 'leido')
+    ]
+    assert datos['eliminados'] == [{'_id': segundo, 'seq': 5}]
+    assert datos['cursor'] == '6'
+    assert 'seq_fecha' not in datos['mensajes'][0]
+
+    # Un mensaje editado y luego eliminado solo aparece como eliminado
+    assert cambios(cliente, h, 6).get_json() == {
+        'mensajes': [], 'eliminados': [], 'cursor': '6', 'has_more': False, 'limit': 50
+    }
+
+def test_since_paginado_por_limite(cliente, encabezados, asentado):
+    h = encabezados()
+    for texto in ('a', 'b', 'c'):
+        enviar(cliente, h, texto)
+    datos = cliente.get(f'/mensajes/{CANAL}', query_string={'since': 0, 'limit': 2}, headers=h).get_json()
+    assert [m['mensaje'] for m in datos['mensajes']] == ['a', 'b']
+    assert datos['has_more'] is True
+    assert datos['cursor'] == '2'
+    datos = cliente.get(f'/mensajes/{CANAL}', query_string={'since': 2, 'limit': 2}, headers=h).get_json()
+    assert [m['mensaje'] for m in datos['mensajes']] == ['c']
+    assert datos['has_more'] is False
+
+@pytest.mark.parametrize('valor', ['abc', '-1', '1.5'])
+def test_since_invalido(cliente, encabezados, valor):
+    respuesta = cliente.get(f'/mensajes/{CANAL}', query_string={'since': valor}, headers=encabezados())
+    assert respuesta.status_code == 400
+
+def test_escritura_confirmada_tarde_no_se_pierde(app, db, cliente, encabezados, monkeypatch):
+    """Dos escritores: el que obtuvo la secuencia menor confirma después del otro"""
+    h = encabezados()
+    enviar(cliente, h, 'previo')
+    db.mensajes.update_many({}, {"$set": {"seq_fecha": datetime.utcnow() - timedelta(minutes=5)}})
+    monkeypatch.setattr(chat_functions, 'CAMBIOS_MARGEN_SEGUNDOS', 60)
+
+    asignada = threading.Event()
+    continuar = threading.Event()
+    original = chat_functions.siguiente_secuencia
+    lentas = []
+
+    def secuencia_lenta(clave, cantidad=1):
+        seq = original(clave, cantidad)
+        if not lentas:
+            lentas.append(seq)
+            asignada.set()
+            continuar.wait(5)
+        return seq
+
+    monkeypatch.setattr(chat_functions, 'siguiente_secuencia', secuencia_lenta)
+    lento = threading.Thread(target=lambda: enviar(app.test_client(), h, 'lento'))
+    lento.start()
+    try:
+        assert asignada.wait(5)
+        enviar(cliente, h, 'rapido')
+
+        # Se ve la secuencia 3 pero la 2 sigue en vuelo: el cursor no la supera
+        respuesta = cambios(cliente, h, 1)
+        datos = respuesta.get_json()
+        assert [m['mensaje'] for m in datos['mensajes']] == ['rapido']
+        assert datos['cursor'] == '1'
+        assert respuesta.headers['Cache-Control'] == 'no-store'
+        assert 'ETag' not in respuesta.headers
+
+        listado = cliente.get(f'/mensajes/{CANAL}', headers=h)
+        assert listado.get_json()['cursor_cambios'] == '1'
+        assert 'ETag' not in listado.headers
+    finally:
+        continuar.set()
+        lento.join(5)
+
+    datos = cambios(cliente, h, 1).get_json()
+    assert [m['mensaje'] for m in datos['mensajes']] == ['lento', 'rapido']
+    assert datos['cursor'] == '1'
+
+    # Pasado el margen el cursor avanza y la respuesta vuelve a tener ETag
+    monkeypatch.setattr(chat_functions, 'CAMBIOS_MARGEN_SEGUNDOS', 0)
+    respuesta = cambios(cliente, h, 1)
+    assert respuesta.get_json()['cursor'] == '3'
+    assert 'ETag' in respuesta.headers
+
+def test_cursor_alcanza_secuencias_sin_documento(cliente, encabezados, asentado):
+    """Renombrar un canal avanza el contador sin escribir mensajes"""
+    h = encabezados()
+    enviar(cliente, h, 'uno')
+    chat_functions.siguiente_secuencia(chat_functions.clave_secuencia_canal(CANAL))
+    datos = cambios(cliente, h, 1).get_json()
+    assert datos['cursor'] == '2'
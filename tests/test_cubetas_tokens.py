@@ -0,0 +1,67 @@
+"""
+Pruebas de las cubetas de tokens por usuario y ruta
+"""
+
+import pytest
+from funciones import rate_limit_functions
+from funciones.rate_limit_functions import CubetasTokens
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self):
+        return self.ahora
+
+    def time(self):
+        return self.ahora
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(rate_limit_functions, 'time', reloj)
+    return reloj
+
+def test_rafaga_y_recarga(reloj):
+    cubetas = CubetasTokens()
+    clave = ('lectura', 'ruta', 'usuario:1')
+    assert [cubetas.consumir(clave, 3, 1.0) for _ in range(3)] == [0, 0, 0]
+    assert cubetas.consumir(clave, 3, 1.0) == pytest.approx(1.0)
+
+    reloj.ahora += 0.5
+    assert cubetas.consumir(clave, 3, 1.0) == pytest.approx(0.5)
+    reloj.ahora += 0.5
+    assert cubetas.consumir(clave, 3, 1.0) == 0
+
+def test_recarga_no_supera_la_capacidad(reloj):
+    cubetas = CubetasTokens()
+    clave = ('lectura', 'ruta', 'usuario:1')
+    cubetas.consumir(clave, 2, 1.0)
+    reloj.ahora += 3600
+    assert [cubetas.consumir(clave, 2, 1.0) for _ in range(2)] == [0, 0]
+    assert cubetas.consumir(clave, 2, 1.0) > 0
+
+def test_cubetas_por_usuario(reloj):
+    cubetas = CubetasTokens()
+    assert cubetas.consumir(('escritura', 'ruta', 'usuario:1'), 1, 0.5) == 0
+    assert cubetas.consumir(('escritura', 'ruta', 'usuario:1'), 1, 0.5) == pytest.approx(2.0)
+    assert cubetas.consumir(('escritura', 'ruta', 'usuario:2'), 1, 0.5) == 0
+
+def test_purga_cubetas_llenas(reloj, monkeypatch):
+    monkeypatch.setattr(CubetasTokens, 'PURGA_CADA', 2)
+    cubetas = CubetasTokens()
+    cubetas.consumir(('lectura', 'ruta', 'usuario:1'), 60, 1.0)
+    reloj.ahora += 120
+    cubetas.consumir(('lectura', 'ruta', 'usuario:2'), 60, 1.0)
+    assert list(cubetas._cubetas) == [('lectura', 'ruta', 'usuario:2')]
+
+def test_ruta_responde_429_con_retry_after(cliente, encabezados, monkeypatch):
+    monkeypatch.setitem(rate_limit_functions.PRESUPUESTOS, 'lectura', (2, 0.1))
+    h = encabezados()
+    assert [cliente.get('/canales', headers=h).status_code for _ in range(2)] == [200, 200]
+    respuesta = cliente.get('/canales', headers=h)
+    assert respuesta.status_code == 429
+    assert respuesta.get_json()['code'] == 'RATE_LIMITED'
+    assert 1 <= int(respuesta.headers['Retry-After']) <= 10
+    # Otro usuario tiene su propia cubeta
+    assert cliente.get('/canales', headers=encabezados()).status_code == 200
@@ -0,0 +1,51 @@
+"""
+Pruebas de la actualización de estado en lote (PUT /mensajes/estado)
+"""
+
+from datetime import datetime, timedelta
+from bson import ObjectId
+from funciones.chat_functions import codificar_cursor, clave_secuencia_canal
+from funciones.database_functions import obtener_secuencia
+
+CANAL = 'general'
+
+def insertar(db, *estados):
+    """Un mensaje por estado (None = sin campo estado), en orden de timestamp"""
+    inicio = datetime(2024, 5, 1, 12, 0)
+    documentos = []
+    for n, estado in enumerate(estados):
+        documento = {"_id": ObjectId(), "canal": CANAL, "mensaje": f"m{n}", "usuario": "ana",
+                     "timestamp": inicio + timedelta(minutes=n), "seq": n + 1}
+        if estado is not None:
+            documento["estado"] = estado
+        documentos.append(documento)
+    db.mensajes.insert_many(documentos)
+    return documentos
+
+def estados(db):
+    return [m.get("estado") for m in db.mensajes.find().sort("timestamp", 1)]
+
+def test_canal_no_retrocede_estados(db, cliente, encabezados):
+    documentos = insertar(db, 'leido', None, 'editado', 'enviado', 'entregado')
+    ultimo = documentos[-1]
+    hasta = codificar_cursor(ultimo["timestamp"], ultimo["_id"])
+
+    datos = cliente.put('/mensajes/estado', json={'estado': 'entregado', 'canal': CANAL, 'hasta': hasta},
+                        headers=encabezados()).get_json()
+    assert datos["actualizados"] == 3
+    assert str(documentos[0]["_id"]) not in datos["resultados"]
+    assert estados(db) == ['leido', 'entregado', 'entregado', 'entregado', 'entregado']
+    # Solo los tres que avanzaron consumieron secuencia
+    assert obtener_secuencia(clave_secuencia_canal(CANAL)) == 3
+
+def test_ids_ya_avanzados_sin_cambios(db, cliente, encabezados):
+    leido, enviado = insertar(db, 'leido', 'enviado')
+    datos = cliente.put('/mensajes/estado', json={'estado': 'entregado', 'ids': [str(leido["_id"]), str(enviado["_id"])]},
+                        headers=encabezados()).get_json()
+    assert datos["resultados"] == {str(leido["_id"]): "sin_cambios", str(enviado["_id"]): "actualizado"}
+    assert estados(db) == ['leido', 'entregado']
+
+def test_editado_no_se_asigna_en_lote(db, cliente, encabezados):
+    mensaje, = insertar(db, 'enviado')
+    respuesta = cliente.put('/mensajes/estado', json={'estado': 'editado', 'ids': [str(mensaje["_id"])]}, headers=encabezados())
+    assert respuesta.status_code == 400
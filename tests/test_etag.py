@@ -0,0 +1,64 @@
+"""
+Pruebas de GET condicional (ETag / 304)
+"""
+
+from flask import Flask, jsonify
+from funciones.cache_functions import con_etag, clave_version, incrementar_version
+
+def crear_app(llamadas, cache_control=None):
+    app = Flask(__name__)
+
+    @app.route('/datos')
+    @con_etag(lambda: [clave_version("pruebas")])
+    def datos():
+        llamadas.append(1)
+        respuesta = jsonify({"n": len(llamadas)})
+        if cache_control:
+            respuesta.headers['Cache-Control'] = cache_control
+        return respuesta
+
+    return app.test_client()
+
+def test_304_sin_ejecutar_la_vista():
+    llamadas = []
+    cliente = crear_app(llamadas)
+    primera = cliente.get('/datos')
+    assert primera.status_code == 200
+    assert primera.headers['Cache-Control'] == 'private, no-cache'
+    etag = primera.headers['ETag']
+
+    segunda = cliente.get('/datos', headers={'If-None-Match': etag})
+    assert segunda.status_code == 304
+    assert segunda.headers['ETag'] == etag
+    assert segunda.data == b''
+    assert len(llamadas) == 1
+
+def test_escritura_cambia_el_etag():
+    llamadas = []
+    cliente = crear_app(llamadas)
+    etag = cliente.get('/datos').headers['ETag']
+    incrementar_version("pruebas")
+    respuesta = cliente.get('/datos', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+
+def test_etag_depende_de_los_parametros():
+    cliente = crear_app([])
+    assert cliente.get('/datos?page=1').headers['ETag'] != cliente.get('/datos?page=2').headers['ETag']
+
+def test_vista_no_store_sin_etag():
+    cliente = crear_app([], cache_control='no-store')
+    respuesta = cliente.get('/datos')
+    assert respuesta.status_code == 200
+    assert 'ETag' not in respuesta.headers
+    assert respuesta.headers['Cache-Control'] == 'no-store'
+
+def test_listado_de_canales(cliente, encabezados):
+    h = encabezados()
+    etag = cliente.get('/canales', headers=h).headers['ETag']
+    assert cliente.get('/canales', headers={**h, 'If-None-Match': etag}).status_code == 304
+
+    assert cliente.post('/crear_canal', json={'nombre': 'obras', 'descripcion': ''}, headers=h).status_code == 201
+    respuesta = cliente.get('/canales', headers={**h, 'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert [c['nombre'] for c in respuesta.get_json()['canales']] == ['obras']
@@ -0,0 +1,67 @@
+"""
+Pruebas del índice de identidades (cédula, email y teléfono únicos entre moderadores y obreros)
+"""
+
+from bson import ObjectId
+from funciones.identidades_functions import reclamar_identidades, liberar_identidades, clave_identidad
+
+def obrero(cedula, email, **extra):
+    return {'nombre': 'Luis', 'apellidos': 'Pérez', 'cedula': cedula, 'email': email, **extra}
+
+def test_reclamar_reserva_todos_los_valores(db):
+    persona = ObjectId()
+    reservados, conflictos = reclamar_identidades(persona, 'obrero', 'Luis Pérez', {'cedula': '1234567', 'email': 'l@x.com'})
+    assert conflictos == {}
+    assert sorted(reservados) == ['cedula:1234567', 'email:l@x.com']
+    assert db.identidades.count_documents({'persona_id': persona}) == 2
+
+def test_conflicto_libera_lo_reservado(db):
+    ana = ObjectId()
+    reclamar_identidades(ana, 'moderador', 'Ana Ruiz', {'cedula': '1234567'})
+
+    otro = ObjectId()
+    reservados, conflictos = reclamar_identidades(otro, 'obrero', 'Luis Pérez', {
+        'cedula': '1234567', 'email': 'l@x.com', 'telefono': '04140000000'
+    })
+    assert reservados == []
+    assert conflictos == {'cedula': {'tipo': 'moderador', 'nombre': 'Ana Ruiz', 'persona_id': ana, 'valor': '1234567'}}
+    # Email y teléfono se reservaron y se liberaron al detectar el conflicto
+    assert db.identidades.count_documents({'persona_id': otro}) == 0
+    assert db.identidades.find_one({'_id': clave_identidad('cedula', '1234567')})['persona_id'] == ana
+
+def test_valores_propios_no_son_conflicto(db):
+    persona = ObjectId()
+    reclamar_identidades(persona, 'obrero', 'Luis Pérez', {'cedula': '1234567'})
+    reservados, conflictos = reclamar_identidades(persona, 'obrero', 'Luis Pérez', {'cedula': '1234567', 'email': 'l@x.com'})
+    assert conflictos == {}
+    assert reservados == ['email:l@x.com']
+
+def test_liberar_por_persona(db):
+    persona = ObjectId()
+    reclamar_identidades(persona, 'obrero', 'Luis Pérez', {'cedula': '1234567', 'email': 'l@x.com'})
+    liberar_identidades([])
+    assert db.identidades.count_documents({}) == 2
+    liberar_identidades(persona_id=persona)
+    assert db.identidades.count_documents({}) == 0
+
+def test_cedula_repetida_entre_colecciones(db, cliente, encabezados):
+    h = encabezados()
+    assert cliente.post('/api/personnel/obreros/', json=obrero('1234567', 'luis@x.com'), headers=h).status_code == 201
+
+    respuesta = cliente.post('/api/personnel/moderadores/', json=obrero('1234567', 'otro@x.com'), headers=h)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['error'] == "Ya existe un obrero con la cédula '1234567'"
+    assert db.identidades.find_one({'_id': 'email:otro@x.com'}) is None
+
+    respuesta = cliente.post('/api/personnel/obreros/', json=obrero('7654321', 'LUIS@x.com'), headers=h)
+    assert respuesta.status_code == 400
+    assert 'el email' in respuesta.get_json()['error']
+
+def test_fallo_al_guardar_libera_identidades(db, cliente, encabezados, monkeypatch):
+    def fallar(*args, **kwargs):
+        raise RuntimeError("escritura rechazada")
+
+    monkeypatch.setattr(type(db.obreros), 'insert_one', fallar)
+    respuesta = cliente.post('/api/personnel/obreros/', json=obrero('1234567', 'luis@x.com'), headers=encabezados())
+    assert respuesta.status_code == 500
+    assert db.identidades.count_documents({}) == 0
@@ -0,0 +1,21 @@
+"""
+Pruebas del registro de índices
+"""
+
+from funciones.indices_functions import aplicar_indices
+
+def test_aplicar_elimina_obsoletos(db):
+    db.mensajes.create_index([("canal", 1), ("timestamp", -1)])
+    db.usuarios.create_index("bloqueado_hasta", partialFilterExpression={"bloqueado_hasta": {"$exists": True}})
+
+    resultado = aplicar_indices(db)
+
+    assert sorted(o["indice"] for o in resultado["obsoletos"]) == ["bloqueado_hasta_1", "canal_1_timestamp_-1"]
+    assert "canal_1_timestamp_-1" not in db.mensajes.index_information()
+    assert "canal_1_timestamp_-1__id_-1" in db.mensajes.index_information()
+    assert "bloqueado_hasta_1" not in db.usuarios.index_information()
+    # La retención de security_logs ahora está en el registro
+    assert db.security_logs.index_information()["timestamp_1"]["expireAfterSeconds"] > 0
+
+    # Repetirlo no vuelve a eliminar nada
+    assert aplicar_indices(db)["obsoletos"] == []
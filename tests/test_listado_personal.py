@@ -0,0 +1,27 @@
+"""
+Pruebas del listado de personal
+"""
+
+def crear(db, *personas):
+    db.obreros.insert_many([
+        {"nombre": nombre, "apellidos": apellidos, "cedula": str(n), "email": f"o{n}@x.com",
+         "activo": activo, "busqueda": [nombre.lower()]}
+        for n, (nombre, apellidos, activo) in enumerate(personas)
+    ])
+
+def test_sin_parametros_conserva_la_respuesta_anterior(db, cliente, encabezados):
+    crear(db, ("Ana", "Zea", True), ("Luis", "Arco", False))
+    datos = cliente.get('/api/personnel/obreros/', headers=encabezados()).get_json()
+    assert datos["count"] == 2
+    assert "timestamp" not in datos
+    assert "page" not in datos
+    assert all("busqueda" not in o for o in datos["obreros"])
+    # Misma versión, mismo cuerpo
+    assert cliente.get('/api/personnel/obreros/', headers=encabezados()).get_json() == datos
+
+def test_filtro_activo_ordenado(db, cliente, encabezados):
+    crear(db, ("Ana", "Zea", True), ("Luis", "Arco", False), ("Eva", "Beltran", True))
+    datos = cliente.get('/api/personnel/obreros/', query_string={'activo': 'true'}, headers=encabezados()).get_json()
+    assert [o["apellidos"] for o in datos["obreros"]] == ["Beltran", "Zea"]
+    assert datos["total"] == 2
+    assert "timestamp" not in datos
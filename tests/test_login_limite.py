@@ -0,0 +1,23 @@
+"""
+Pruebas del límite de login por IP
+"""
+
+from funciones import auth_functions
+from funciones.rate_limit_functions import VentanaDeslizante
+
+def login(cliente, cedula):
+    return cliente.post('/api/auth/login/obrero', json={'cedula': cedula})
+
+def test_ip_cuenta_solo_fallos(db, cliente, monkeypatch):
+    monkeypatch.setattr(auth_functions, '_limite_login_ip', VentanaDeslizante('login_ip', 2, 60))
+    db.obreros.insert_one({'nombre': 'Ana', 'apellidos': 'Ruiz', 'cedula': '1234567', 'activo': True})
+
+    # Los logins correctos de una oficina compartida no agotan el límite
+    for _ in range(5):
+        assert login(cliente, '1234567').status_code == 200
+
+    assert login(cliente, '7000001').status_code == 401
+    assert login(cliente, '7000002').status_code == 401
+    respuesta = login(cliente, '1234567')
+    assert respuesta.status_code == 429
+    assert respuesta.get_json()['code'] == 'RATE_LIMITED'
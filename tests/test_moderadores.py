@@ -0,0 +1,30 @@
+"""
+Pruebas del usuario que se crea junto con cada moderador
+"""
+
+from funciones import personnel_functions
+from funciones.auth_functions import ServidorOcupadoError
+
+DATOS = {"nombre": "Ana", "apellidos": "Ruiz", "cedula": "12345678", "email": "ana@x.com", "telefono": "04141234567"}
+
+def test_crear_moderador_con_usuario(db, cliente, encabezados):
+    respuesta = cliente.post('/api/personnel/moderadores/', json=DATOS, headers=encabezados())
+    assert respuesta.status_code == 201, respuesta.get_json()
+    assert respuesta.get_json()["credenciales"]["usuario"] == "A12345678"
+    assert db.usuarios.count_documents({"username": "A12345678"}) == 1
+
+def test_bcrypt_saturado_no_deja_moderador_sin_usuario(db, cliente, encabezados, monkeypatch):
+    def ocupado(password):
+        raise ServidorOcupadoError()
+
+    original = personnel_functions.hash_password
+    monkeypatch.setattr(personnel_functions, 'hash_password', ocupado)
+    respuesta = cliente.post('/api/personnel/moderadores/', json=DATOS, headers=encabezados())
+    assert respuesta.status_code == 503
+    assert 'Retry-After' in respuesta.headers
+    assert db.moderadores.count_documents({}) == 0
+    assert db.usuarios.count_documents({}) == 0
+
+    # La cédula y el email quedaron libres: el reintento funciona
+    monkeypatch.setattr(personnel_functions, 'hash_password', original)
+    assert cliente.post('/api/personnel/moderadores/', json=DATOS, headers=encabezados()).status_code == 201
@@ -0,0 +1,88 @@
+"""
+Pruebas de la paginación por cursor de GET /mensajes/<canal>
+"""
+
+import base64
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from funciones.chat_functions import codificar_cursor, decodificar_cursor
+
+CANAL = 'general'
+
+def insertar(db, cantidad, timestamp):
+    """Mensajes con el mismo timestamp: solo _id los ordena"""
+    ids = [ObjectId() for _ in range(cantidad)]
+    db.mensajes.insert_many([
+        {"_id": i, "canal": CANAL, "mensaje": f"m{n}", "usuario": "ana", "timestamp": timestamp, "seq": n + 1}
+        for n, i in enumerate(ids)
+    ])
+    return [str(i) for i in ids]
+
+def test_cursor_ida_y_vuelta():
+    fecha = datetime(2024, 5, 1, 12, 30, 15, 123000)
+    mensaje_id = ObjectId()
+    assert decodificar_cursor(codificar_cursor(fecha, mensaje_id)) == (fecha, mensaje_id)
+
+def test_cursor_sin_timestamp():
+    assert codificar_cursor(None, ObjectId()) is None
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'no-es-base64!!',
+    base64.urlsafe_b64encode(b'sin separador').decode(),
+    base64.urlsafe_b64encode(b'2024-13-45T00:00:00|' + str(ObjectId()).encode()).decode(),
+    base64.urlsafe_b64encode(b'2024-05-01T00:00:00|no-es-objectid').decode(),
+    base64.urlsafe_b64encode('é'.encode('latin-1')).decode()
+])
+def test_cursor_malformado(cursor):
+    assert decodificar_cursor(cursor) == (None, None)
+
+def test_cursor_malformado_responde_400(cliente, encabezados):
+    respuesta = cliente.get(f'/mensajes/{CANAL}', query_string={'before': 'basura'}, headers=encabezados())
+    assert respuesta.status_code == 400
+
+def test_before_y_after_juntos(cliente, encabezados):
+    respuesta = cliente.get(f'/mensajes/{CANAL}', query_string={'before': 'a', 'after': 'b'}, headers=encabezados())
+    assert respuesta.status_code == 400
+
+def test_paginas_hacia_atras_con_timestamps_iguales(db, cliente, encabezados):
+    ids = insertar(db, 5, datetime(2024, 5, 1, 12, 0, 0))
+    h = encabezados()
+
+    vistos = []
+    parametros = {'limit': 2}
+    while True:
+        datos = cliente.get(f'/mensajes/{CANAL}', query_string=parametros, headers=h).get_json()
+        # Cada página en orden cronológico; las páginas van de la más nueva a la más vieja
+        vistos = [m['_id'] for m in datos['mensajes']] + vistos
+        if not datos['has_more']:
+            break
+        parametros = {'limit': 2, 'before': datos['next_cursor']}
+
+    assert vistos == ids
+
+def test_paginas_hacia_adelante_con_timestamps_iguales(db, cliente, encabezados):
+    ids = insertar(db, 5, datetime(2024, 5, 1, 12, 0, 0))
+    h = encabezados()
+    primero = cliente.get(f'/mensajes/{CANAL}', query_string={'limit': 5}, headers=h).get_json()['mensajes'][0]
+
+    vistos = [primero['_id']]
+    parametros = {'limit': 2, 'after': primero['cursor']}
+    while True:
+        datos = cliente.get(f'/mensajes/{CANAL}', query_string=parametros, headers=h).get_json()
+        vistos += [m['_id'] for m in datos['mensajes']]
+        if not datos['has_more']:
+            break
+        parametros = {'limit': 2, 'after': datos['next_cursor']}
+
+    assert vistos == ids
+
+@pytest.mark.parametrize('limite', ['0', '-3', 'diez'])
+def test_limite_invalido(cliente, encabezados, limite):
+    respuesta = cliente.get(f'/mensajes/{CANAL}', query_string={'limit': limite}, headers=encabezados())
+    assert respuesta.status_code == 400
+
+def test_limite_se_recorta_al_maximo(cliente, encabezados):
+    datos = cliente.get(f'/mensajes/{CANAL}', query_string={'limit': 5000}, headers=encabezados()).get_json()
+    assert datos['limit'] == 200
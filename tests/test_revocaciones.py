@@ -0,0 +1,72 @@
+"""
+Pruebas de la réplica en memoria de tokens revocados
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from funciones import auth_functions
+from funciones.auth_functions import token_revocado
+
+class ColeccionCaida:
+    """tokens_revocados con find (sincronización) y opcionalmente find_one fallando"""
+
+    def __init__(self, coleccion, find_one_falla=False):
+        self.coleccion = coleccion
+        self.find_one_falla = find_one_falla
+
+    def find(self, *args, **kwargs):
+        raise RuntimeError("BD no disponible")
+
+    def find_one(self, *args, **kwargs):
+        if self.find_one_falla:
+            raise RuntimeError("BD no disponible")
+        return self.coleccion.find_one(*args, **kwargs)
+
+@pytest.fixture(autouse=True)
+def replica(monkeypatch):
+    """Réplica vacía y nunca sincronizada, como en un worker recién iniciado"""
+    monkeypatch.setattr(auth_functions, '_revocados', {})
+    monkeypatch.setattr(auth_functions, '_revocados_estado', {"desde": None, "intentado": None, "refrescando": False})
+
+def revocar(db, jti):
+    db.tokens_revocados.insert_one({
+        "_id": jti, "revocado_en": datetime.utcnow(), "expira": datetime.utcnow() + timedelta(hours=1)
+    })
+
+def caer_bd(monkeypatch, db, find_one_falla=False):
+    caida = ColeccionCaida(db.tokens_revocados, find_one_falla)
+    monkeypatch.setattr(auth_functions, 'get_db', lambda: {'tokens_revocados': caida})
+
+def test_sincroniza_y_usa_la_replica(db):
+    revocar(db, 'revocado')
+    assert token_revocado({'jti': 'revocado'})
+    assert not token_revocado({'jti': 'vigente'})
+    assert auth_functions._revocados_estado["desde"] is not None
+    assert 'revocado' in auth_functions._revocados
+
+def test_sin_sincronizar_consulta_la_bd(db, monkeypatch):
+    revocar(db, 'revocado')
+    caer_bd(monkeypatch, db)
+    assert token_revocado({'jti': 'revocado'})
+    assert not token_revocado({'jti': 'vigente'})
+    # El fallo no marca la réplica como sincronizada
+    assert auth_functions._revocados_estado["desde"] is None
+
+def test_sin_bd_se_rechaza_el_token(db, cliente, encabezados, monkeypatch):
+    caer_bd(monkeypatch, db, find_one_falla=True)
+    with pytest.raises(RuntimeError):
+        token_revocado({'jti': 'cualquiera'})
+    respuesta = cliente.get('/canales', headers=encabezados())
+    assert respuesta.status_code == 500
+    assert respuesta.get_json()['code'] == 'AUTH_ERROR'
+
+def test_reintenta_hasta_sincronizar(db, monkeypatch):
+    monkeypatch.setattr(auth_functions, 'REVOCACIONES_INTERVALO_SEGUNDOS', 0)
+    caer_bd(monkeypatch, db)
+    token_revocado({'jti': 'x'})
+    assert auth_functions._revocados_estado["desde"] is None
+
+    monkeypatch.setattr(auth_functions, 'get_db', lambda: db)
+    revocar(db, 'revocado')
+    assert token_revocado({'jti': 'revocado'})
+    assert auth_functions._revocados_estado["desde"] is not None
@@ -0,0 +1,80 @@
+"""
+Pruebas del stream SSE de mensajes
+"""
+
+from funciones import chat_functions, eventos_functions
+from funciones.chat_functions import EntregasSSE
+
+CANAL = 'general'
+
+def eventos_sse(cuerpo):
+    """Bloques del stream como dicts {campo: valor}"""
+    bloques = []
+    for bloque in cuerpo.decode('utf-8').split('\n\n'):
+        campos = dict(linea.split(': ', 1) for linea in bloque.splitlines() if ': ' in linea and not linea.startswith(':'))
+        if 'event' in campos:
+            bloques.append(campos)
+    return bloques
+
+def test_entregas_descarta_repetidas_no_menores(monkeypatch):
+    monkeypatch.setattr(chat_functions, 'CAMBIOS_MARGEN_SEGUNDOS', 60)
+    entregas = EntregasSSE(3)
+    assert entregas.registrar(5) == 3
+    assert entregas.entregada(5)
+    # La 4 se confirmó después de la 5: no se descarta
+    assert not entregas.entregada(4)
+    assert entregas.registrar(4) == 3
+
+def test_entregas_estable_avanza_tras_margen(monkeypatch):
+    monkeypatch.setattr(chat_functions, 'CAMBIOS_MARGEN_SEGUNDOS', 60)
+    entregas = EntregasSSE(0)
+    entregas.registrar(2, antiguedad=120)
+    entregas.registrar(3)
+    assert entregas.avanzar() == 2
+    monkeypatch.setattr(chat_functions, 'CAMBIOS_MARGEN_SEGUNDOS', 0)
+    assert entregas.avanzar() == 3
+
+def test_entregas_recuerda_un_maximo(monkeypatch):
+    monkeypatch.setattr(chat_functions, 'SSE_ENTREGAS_RECORDADAS', 2)
+    entregas = EntregasSSE(0)
+    for seq in (1, 2, 3):
+        entregas.registrar(seq)
+    assert not entregas.entregada(1)
+    assert entregas.entregada(3)
+
+def test_stream_entrega_evento_menor_que_llega_tarde(cliente, encabezados, monkeypatch):
+    monkeypatch.setattr(chat_functions, 'SSE_DURACION_MAXIMA_SEGUNDOS', 0.2)
+    monkeypatch.setattr(chat_functions, 'SSE_HEARTBEAT_SEGUNDOS', 0.05)
+    monkeypatch.setattr(chat_functions, 'CAMBIOS_MARGEN_SEGUNDOS', 60)
+    respuesta = cliente.get(f'/stream/{CANAL}', headers=encabezados(), buffered=False)
+    assert respuesta.status_code == 200
+
+    # Ya suscrito: llegan la 2, la 1 (confirmada tarde) y la 2 repetida
+    for seq in (2, 1, 2):
+        eventos_functions.entregar_evento_local(CANAL, 'mensaje', seq, {'seq': seq})
+    bloques = eventos_sse(b''.join(respuesta.response))
+    respuesta.close()
+
+    assert [b['data'] for b in bloques] == ['{"seq": 2}', '{"seq": 1}']
+    # Dentro del margen el punto de reanudación no pasa del inicial
+    assert {b['id'] for b in bloques} == {'0'}
+    assert eventos_functions.total_suscriptores() == 0
+
+def test_stream_reanuda_desde_last_event_id(cliente, encabezados, monkeypatch):
+    monkeypatch.setattr(chat_functions, 'SSE_DURACION_MAXIMA_SEGUNDOS', 0)
+    monkeypatch.setattr(chat_functions, 'CAMBIOS_MARGEN_SEGUNDOS', 0)
+    h = encabezados()
+    for texto in ('uno', 'dos', 'tres'):
+        cliente.post('/enviar', json={'canal': CANAL, 'mensaje': texto, 'usuario': 'ana'}, headers=h)
+
+    respuesta = cliente.get(f'/stream/{CANAL}', headers={**h, 'Last-Event-ID': '1'})
+    bloques = eventos_sse(respuesta.data)
+    assert [b['id'] for b in bloques] == ['2', '3']
+    assert ['dos' in b['data'] for b in bloques] == [True, False]
+
+def test_stream_saturado_responde_503(cliente, encabezados, monkeypatch):
+    monkeypatch.setattr(chat_functions, 'SSE_MAXIMO_CONEXIONES', 0)
+    respuesta = cliente.get(f'/stream/{CANAL}', headers=encabezados())
+    assert respuesta.status_code == 503
+    assert respuesta.headers['Retry-After'] == str(chat_functions.SSE_REINTENTAR_SEGUNDOS)
+    assert respuesta.get_json()['code'] == 'STREAM_SATURADO'
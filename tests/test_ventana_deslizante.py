@@ -0,0 +1,78 @@
+"""
+Pruebas de la ventana deslizante (límites de login)
+"""
+
+import pytest
+from funciones import rate_limit_functions
+from funciones.rate_limit_functions import VentanaDeslizante, AlmacenMemoria, AlmacenMongo
+
+INICIO = 60 * 1000
+
+class Reloj:
+    """Sustituye al módulo time de rate_limit_functions"""
+
+    def __init__(self, ahora):
+        self.ahora = ahora
+
+    def time(self):
+        return self.ahora
+
+    def monotonic(self):
+        return self.ahora
+
+@pytest.fixture(params=[AlmacenMemoria, AlmacenMongo])
+def reloj(request, monkeypatch):
+    reloj = Reloj(INICIO)
+    monkeypatch.setattr(rate_limit_functions, 'time', reloj)
+    monkeypatch.setattr(rate_limit_functions, '_almacen', request.param())
+    return reloj
+
+def test_bloquea_al_llegar_al_limite(reloj):
+    ventana = VentanaDeslizante('prueba', 10, 60)
+    restantes = [ventana.registrar('ip') for _ in range(10)]
+    assert restantes == list(range(9, -1, -1))
+    assert ventana.estimado('ip') == 10
+    # La ventana actual pesa entera: hay que esperar a la siguiente
+    assert ventana.espera('ip') == 60
+
+def test_ventana_anterior_pesa_segun_lo_que_queda(reloj):
+    ventana = VentanaDeslizante('prueba', 10, 60)
+    for _ in range(10):
+        ventana.registrar('ip')
+
+    reloj.ahora = INICIO + 60 + 15
+    assert ventana.estimado('ip') == pytest.approx(7.5)
+    assert ventana.espera('ip') == 0
+
+    reloj.ahora = INICIO + 60 + 30
+    for _ in range(5):
+        ventana.registrar('ip')
+    assert ventana.estimado('ip') == pytest.approx(10)
+    # Basta con que la anterior pese un poco menos
+    assert ventana.espera('ip') == 1
+    reloj.ahora += 6
+    assert ventana.espera('ip') == 0
+
+def test_espera_si_la_actual_supera_el_limite(reloj):
+    ventana = VentanaDeslizante('prueba', 4, 60)
+    reloj.ahora = INICIO + 30
+    for _ in range(8):
+        ventana.registrar('ip')
+    # Siguiente ventana con la actual pesando la mitad: 30 s + 30 s
+    assert ventana.espera('ip') == 60
+
+def test_claves_y_reinicio_independientes(reloj):
+    ventana = VentanaDeslizante('prueba', 2, 60)
+    ventana.registrar('a')
+    ventana.registrar('a')
+    assert ventana.espera('a') > 0
+    assert ventana.espera('b') == 0
+    ventana.reiniciar('a')
+    assert ventana.estimado('a') == 0
+
+def test_ventanas_viejas_no_cuentan(reloj):
+    ventana = VentanaDeslizante('prueba', 2, 60)
+    ventana.registrar('ip')
+    ventana.registrar('ip')
+    reloj.ahora = INICIO + 120
+    assert ventana.estimado('ip') == 0